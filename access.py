@@ -0,0 +1,73 @@
+"""Foydalanuvchining kirish konteksti: obuna, blok, ism va admin belgisi.
+
+O'quvchi amali oldin require_payment -> check_subscription, keyin
+is_user_blocked, keyin load_profile ni chaqirardi - har biri alohida so'rov.
+access(update) ularning hammasini bitta Access qatorida qaytaradi:
+- blok (blocklist) va admin belgisi - xotiradan;
+- obuna (subscription_cache) va ism (user_profiles) issiq bo'lsa - DB'siz,
+  aks holda ikkalasi bitta JOIN so'rovi bilan o'qiladi va keshlarga yoziladi;
+  profili yo'q foydalanuvchi PROFILE_MISSING_TTL soniya missing_profiles da
+  eslab qolinadi (save_profile uni o'chiradi).
+Natija update obyektining o'zida saqlanadi: bitta update davomida qayta
+chaqirilsa (masalan, require_payment va keyin handler) hech narsa o'qilmaydi.
+"""
+import time
+from typing import NamedTuple
+
+from config import ADMIN_IDS, user_profiles, missing_profiles
+from blocklist import block_list
+from database import query_db
+from subscriptions import subscription_cache
+
+ACCESS_QUERY = (
+    "SELECT u.student_name, s.end_date, s.end_ts FROM (SELECT ? AS chat_id) k "
+    "LEFT JOIN users u ON u.chat_id = k.chat_id "
+    "LEFT JOIN subscriptions s ON s.user_id = k.chat_id AND s.is_active = 1"
+)
+
+class Access(NamedTuple):
+    user_id: int
+    is_admin: bool
+    active: bool
+    end_date: str
+    blocked: bool
+    student_name: str
+
+    @property
+    def subscription(self):
+        """check_subscription bilan bir xil ko'rinish"""
+        return {"active": self.active, "end_date": self.end_date if self.active else None}
+
+def load_access(user_id):
+    """Keshlardan, yetmaganini bitta so'rov bilan"""
+    user_id = int(user_id)
+    sub = subscription_cache.get(user_id)
+    name = user_profiles.get(user_id)
+    known = name is not None or user_id in missing_profiles
+    if sub is None or not known:
+        generation = subscription_cache.generation()
+        rows = query_db(ACCESS_QUERY, (str(user_id),), fetch=True)
+        db_name, end_date, end_ts = rows[0] if rows else (None, None, None)
+        if db_name is not None:
+            name = db_name
+            user_profiles[user_id] = db_name
+        elif rows is not None:
+            missing_profiles[user_id] = True
+        if sub is None:
+            # Muddati o'tgan obunani faolsizlantirish - subscription_sweeper ishi
+            if rows is not None and end_ts and end_ts > time.time():
+                subscription_cache.put(user_id, end_ts, end_date, generation)
+                sub = {"active": True, "end_date": end_date}
+            else:
+                if rows is not None:
+                    subscription_cache.put(user_id, None, None, generation)
+                sub = {"active": False, "end_date": None}
+    return Access(user_id, user_id in ADMIN_IDS, sub["active"], sub["end_date"], block_list.is_blocked(user_id), name)
+
+def access(update):
+    """message yoki callback_query yuborgan foydalanuvchi uchun Access (update davomida keshlanadi)"""
+    ctx = getattr(update, "_access", None)
+    if ctx is None:
+        ctx = load_access(update.from_user.id)
+        update._access = ctx
+    return ctx
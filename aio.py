@@ -0,0 +1,218 @@
+"""asyncio runtime (BOT_ASYNC=1): AsyncTeleBot va bitta event loop.
+
+Update'lar AsyncTeleBot polling'i orqali keladi, handler odatdagidek topiladi
+(router yoki callback_query_handler'lar), keyin:
+- handlerning async varianti bo'lsa (@async_variant) - loop'da bajariladi,
+  DB so'rovlari db_executor.acall() orqali thread'larga chiqariladi;
+- bo'lmasa sinxron handler AIO_HANDLER_THREADS ta thread pool'ida ishlaydi.
+Sinxron `bot.send_message(...)` va boshqa chaqiruvlar ham loop'dagi aiohttp
+sessiyasi orqali ketadi - barcha Bot API so'rovlari bitta ulanish pool'ida.
+Ikkala yo'ldagi send* so'rovlari outbound navbati (limitlar) orqali o'tadi.
+Bir chat update'lari kelgan tartibda, turli chatlar parallel (lanes.py kabi).
+
+aiohttp faqat shu rejim uchun kerak: pip install aiohttp
+"""
+import asyncio
+import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot import apihelper
+
+from config import AIO_HANDLER_THREADS
+from lanes import update_chat_id
+from outbound import outbound
+
+logger = logging.getLogger(__name__)
+
+_variants = {}  # sinxron handler -> async(abot, update_obj)
+
+def async_variant(handler):
+    """Sinxron handlerning asyncio runtime'dagi o'rinbosari:
+
+        @async_variant(handle_quiz_answer)
+        async def handle_quiz_answer_async(abot, call): ...
+    """
+    def decorator(coro):
+        _variants[handler] = coro
+        return coro
+    return decorator
+
+async def gather_limited(coros, limit):
+    """Korutinlarni bir vaqtda ko'pi bilan limit tadan bajaradi (natijalar tartibda)"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+    return await asyncio.gather(*(run(c) for c in coros), return_exceptions=True)
+
+class AsyncRuntime:
+    def __init__(self, bot, router, handler_threads=16):
+        self.bot = bot
+        self.router = router
+        self.handler_threads = max(1, int(handler_threads))
+        self.abot = None
+        self.loop = None
+        self._helper = None
+        self._request = None  # asl asyncio_helper._process_request
+        self._loop_thread = None
+        self._handlers = None
+        self._tails = {}  # chat_id -> shu chatning oxirgi task'i
+        self._stopping = None
+        self.updates = 0
+        self.async_calls = 0
+        self.thread_calls = 0
+        self.api_calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    # --- handler topish va bajarish ---
+
+    def _resolve(self, update):
+        """(handler, message/call) yoki None - sinxron rejimdagi tartib bilan"""
+        if update.message is not None:
+            route = self.router.resolve(update.message)
+            return (route.callback, update.message) if route else None
+        call = update.callback_query
+        if call is not None:
+            for handler in self.bot.callback_query_handlers:
+                if self.bot._test_message_handler(handler, call):
+                    return handler["function"], call
+        return None
+
+    async def _process(self, update):
+        found = self._resolve(update)
+        if found is None:
+            return
+        handler, obj = found
+        variant = _variants.get(handler)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if variant is not None:
+                self.async_calls += 1
+                await variant(self.abot, obj)
+            else:
+                self.thread_calls += 1
+                await self.loop.run_in_executor(self._handlers, handler, obj)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"aio: {getattr(handler, '__name__', handler)} xatolik bilan tugadi")
+        finally:
+            self.in_flight -= 1
+
+    async def _after(self, previous, update):
+        if previous is not None:
+            await asyncio.wait((previous,))
+        await self._process(update)
+
+    def _schedule(self, update):
+        key = update_chat_id(update)
+        task = self.loop.create_task(self._after(self._tails.get(key), update))
+        self._tails[key] = task
+
+        def forget(done):
+            if self._tails.get(key) is done:
+                del self._tails[key]
+        task.add_done_callback(forget)
+
+    async def process_new_updates(self, updates):
+        # AsyncTeleBot polling'i shu metodni chaqiradi
+        for update in updates:
+            self.updates += 1
+            self._schedule(update)
+
+    # --- sinxron bot chaqiruvlari -> loop ---
+
+    def _bridge(self, token, method_name, method="get", params=None, files=None):
+        """outbound transport'i: sinxron so'rov loop'dagi aiohttp sessiyasida bajariladi"""
+        if threading.current_thread() is self._loop_thread:
+            raise RuntimeError(f"{method_name}: async handler ichida sinxron bot chaqiruvi (abot ishlating)")
+        self.api_calls += 1
+        future = asyncio.run_coroutine_threadsafe(
+            self._request(token, method_name, method, params, files), self.loop
+        )
+        try:
+            return future.result()
+        except self._helper.ApiTelegramException as e:
+            # Handlerlar sinxron telebot istisnolarini kutadi
+            raise apihelper.ApiTelegramException(method_name, e.result, e.result_json) from None
+
+    # --- ishga tushirish ---
+
+    def run(self, background=()):
+        """Loop'ni ishga tushiradi; SIGINT/SIGTERM kelguncha qaytmaydi.
+
+        background - abot ni qabul qiladigan korutin funksiyalar (masalan quiz dispatcher).
+        """
+        try:
+            from telebot import asyncio_helper
+            from telebot.async_telebot import AsyncTeleBot
+        except ImportError as e:
+            raise RuntimeError("BOT_ASYNC=1 uchun aiohttp kerak: pip install aiohttp") from e
+        self._helper = asyncio_helper
+        if apihelper.API_URL:
+            asyncio_helper.API_URL = apihelper.API_URL
+        asyncio.run(self._main(AsyncTeleBot, background))
+
+    async def _main(self, async_bot_class, background):
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.current_thread()
+        self._stopping = asyncio.Event()
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                self.loop.add_signal_handler(sig, self._stopping.set)
+        self.abot = async_bot_class(self.bot.token, parse_mode=self.bot.parse_mode)
+        self.abot.process_new_updates = self.process_new_updates
+        self._handlers = ThreadPoolExecutor(self.handler_threads, thread_name_prefix="aio-handler")
+        # Sinxron chaqiruvlar: outbound -> _bridge -> loop; async chaqiruvlar: outbound -> loop
+        outbound.install()
+        transport, outbound.transport = outbound.transport, self._bridge
+        self._request = self._helper._process_request
+        self._helper._process_request = outbound.wrap_async(self._request)
+        try:
+            await self.abot.delete_webhook()
+        except Exception as e:
+            logger.warning(f"Webhook o'chirishda xatolik (ehtimol webhook yo'q): {e}")
+        tasks = [asyncio.create_task(fn(self.abot)) for fn in background]
+        polling = asyncio.create_task(self.abot.infinity_polling(timeout=20, request_timeout=30))
+        logger.info(f"⚡ Asyncio runtime: {self.handler_threads} ta handler thread")
+        try:
+            await self._stopping.wait()
+        finally:
+            for task in (polling, *tasks):
+                task.cancel()
+            await asyncio.gather(polling, *tasks, return_exceptions=True)
+            # Boshlangan handlerlar tugashini kutamiz (ular hali bot'ga murojaat qiladi)
+            if self._tails:
+                await asyncio.wait(list(self._tails.values()))
+            await self.loop.run_in_executor(None, self._handlers.shutdown)
+            outbound.transport = transport
+            self._helper._process_request = self._request
+            await self.abot.close_session()
+            logger.info("⚡ Asyncio runtime to'xtadi")
+
+    def stop(self):
+        if self.loop is not None and self._stopping is not None:
+            self.loop.call_soon_threadsafe(self._stopping.set)
+
+    def stats(self):
+        return {
+            "updates": self.updates,
+            "async_handlers": self.async_calls,
+            "thread_handlers": self.thread_calls,
+            "api_calls": self.api_calls,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "errors": self.errors,
+        }
+
+runtime = None  # ishlayotgan AsyncRuntime (/stats uchun)
+
+def run_async(bot, router, background=()):
+    global runtime
+    runtime = AsyncRuntime(bot, router, AIO_HANDLER_THREADS)
+    runtime.run(background)
@@ -0,0 +1,96 @@
+"""Eski natijalar uchun arxiv bazasi (ATTACH qilingan alohida fayl).
+
+Asosiy `results` jadvalida faqat oxirgi RESULTS_HOT_DAYS kunlik natijalar
+qoladi; eskilari compact_results() orqali `archive.results` ga ko'chiriladi.
+To'liq tarix kerak bo'lgan so'rovlar har bir ulanishda yaratiladigan
+`all_results` TEMP view'idan o'qiydi (main.results UNION ALL archive.results),
+WHERE shartlari ikkala jadvalning indekslariga tushadi.
+
+results jadvaliga yangi ustun qo'shilsa, RESULT_COLUMNS va arxiv sxemasi ham
+yangilanishi kerak.
+"""
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+RESULT_COLUMNS = "id, student_name, username, tg_id, test_id, correct_count, incorrect_count, date, date_ts"
+
+def attach(conn, path):
+    """Arxivni ulanishga biriktiradi va all_results view'ini yaratadi (main.results mavjud bo'lishi kerak)"""
+    conn.execute("ATTACH DATABASE ? AS archive", (path,))
+    conn.execute("PRAGMA archive.journal_mode=WAL;")
+    _ensure_schema(conn)
+    conn.execute(
+        f"CREATE TEMP VIEW IF NOT EXISTS all_results AS "
+        f"SELECT {RESULT_COLUMNS} FROM main.results UNION ALL SELECT {RESULT_COLUMNS} FROM archive.results"
+    )
+
+def _ensure_schema(conn):
+    """archive.results va uning indekslari (asosiy jadvaldagi bilan bir xil)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS archive.results (
+            id INTEGER PRIMARY KEY,
+            student_name TEXT,
+            username TEXT,
+            tg_id TEXT,
+            test_id TEXT,
+            correct_count INTEGER,
+            incorrect_count INTEGER,
+            date TEXT,
+            date_ts INTEGER
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_results_tg_test ON results (tg_id, test_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_results_username_test ON results (username, test_id, date) WHERE username IS NOT NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_results_test ON results (test_id, date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_results_date_ts ON results (date_ts)")
+    conn.commit()
+
+def compact_results(conn, hot_days, chunk_size=500, pause=0.05):
+    """date_ts < (hozir - hot_days) bo'lgan natijalarni arxivga ko'chiradi, ko'chirilganlar sonini qaytaradi.
+
+    WAL rejimida bir nechta bazali tranzaksiya bazalar kesimida atomar emas, shuning
+    uchun avval arxivga yoziladi (INSERT OR IGNORE - qayta ishga tushirish xavfsiz),
+    keyin asosiy jadvaldan o'chiriladi. Oraliqda to'xtab qolsa, qatorlar vaqtincha
+    ikkala joyda bo'ladi va keyingi ishga tushishda tozalanadi.
+    """
+    cutoff = int(time.time()) - hot_days * 86400
+    moved = 0
+    while True:
+        ids = [r[0] for r in conn.execute(
+            "SELECT id FROM main.results WHERE date_ts < ? ORDER BY date_ts LIMIT ?", (cutoff, chunk_size)
+        ).fetchall()]
+        if not ids:
+            break
+        marks = ", ".join("?" * len(ids))
+        conn.execute(
+            f"INSERT OR IGNORE INTO archive.results ({RESULT_COLUMNS}) "
+            f"SELECT {RESULT_COLUMNS} FROM main.results WHERE id IN ({marks})", ids
+        )
+        conn.commit()
+        conn.execute(f"DELETE FROM main.results WHERE id IN ({marks})", ids)
+        conn.commit()
+        moved += len(ids)
+        if pause:
+            time.sleep(pause)
+    if moved:
+        logger.info(f"🗄 {moved} ta eski natija arxivga ko'chirildi")
+    return moved
+
+def start_compaction(connect, hot_days, interval=6 * 3600):
+    """Har `interval` soniyada compact_results() ni ishga tushiradigan fon thread"""
+    def run():
+        while True:
+            conn = connect()
+            try:
+                compact_results(conn, hot_days)
+            except Exception:
+                logger.exception("Natijalarni arxivlashda xatolik")
+            finally:
+                conn.close()
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name="results-compaction", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,112 @@
+"""Bloklangan foydalanuvchilar to'plami (jarayon ichida).
+
+is_user_blocked har safar blocked_users jadvaliga so'rov yuborardi - har bir
+test/uyga vazifa boshlanishida, viktorina javobida va adminning
+foydalanuvchilar ro'yxatidagi har bir qator uchun. Ro'yxat kichik va faqat
+admin bloklaganda yoki blokdan ochganda o'zgaradi, shuning uchun chat_id'lar
+bir marta o'qiladi (ishga tushishda yoki birinchi tekshiruvda) va keyin
+tekshiruv O(1), DB'siz.
+
+O'qishda DB xatosi bo'lsa natija keshlanmaydi (keyingi tekshiruv qayta
+o'qiydi) va oxirgi muvaffaqiyatli o'qilgan to'plam ishlatiladi. Umuman
+o'qilmagan bo'lsa tekshiruv "bloklangan" deb javob beradi; load() esa
+ishga tushishda xato ko'taradi.
+
+Jadval faqat block()/unblock() orqali o'zgartiriladi: yozuv tranzaksiyada,
+to'plam commit'dan keyin yangilanadi. Klasterda boshqa jarayonlar to'plamni
+cache_versions orqali qayta o'qiydi.
+"""
+import threading
+
+from cluster import cache_versions
+from database import query_db, transaction
+
+BLOCK_USER = (
+    "INSERT OR REPLACE INTO blocked_users (chat_id, username, student_name, blocked_at, blocked_by, reason) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+class BlockList:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids = None  # bloklangan chat_id'lar (str); None - hali o'qilmagan
+        self._last = None  # oxirgi muvaffaqiyatli o'qilgan to'plam (DB xatosida shu ishlatiladi)
+        self._generation = 0
+        self.loads = 0
+        self.errors = 0
+        self.checks = 0
+
+    def _snapshot(self):
+        with self._lock:
+            ids = self._ids
+            if ids is not None:
+                return ids
+            generation = self._generation
+        rows = query_db("SELECT chat_id FROM blocked_users", fetch=True)
+        with self._lock:
+            self.loads += 1
+            if rows is None:
+                self.errors += 1
+                return self._last
+            loaded = frozenset(str(row[0]) for row in rows)
+            self._last = loaded
+            # O'qish paytida block/unblock bo'lgan bo'lsa eskirgan nusxani saqlamaymiz
+            if self._generation == generation:
+                self._ids = loaded
+        return loaded
+
+    def load(self):
+        """Ishga tushishda: to'plamni oldindan o'qib qo'yadi"""
+        return len(self.ids())
+
+    def is_blocked(self, chat_id):
+        self.checks += 1
+        ids = self._snapshot()
+        # Ro'yxat hech o'qilmagan bo'lsa bloklangan deb hisoblanadi
+        return ids is None or str(chat_id) in ids
+
+    def ids(self):
+        """Bloklangan chat_id'lar (frozenset, str)"""
+        ids = self._snapshot()
+        if ids is None:
+            raise RuntimeError("blocked_users jadvalini o'qib bo'lmadi")
+        return ids
+
+    def _changed(self, chat_id, blocked):
+        with self._lock:
+            self._generation += 1
+            if self._ids is not None:
+                self._ids = self._ids | {chat_id} if blocked else self._ids - {chat_id}
+            if self._last is not None:
+                self._last = self._last | {chat_id} if blocked else self._last - {chat_id}
+        if cache_versions.enabled:
+            cache_versions.bump("blocked_users")
+
+    def block(self, chat_id, username, student_name, blocked_at, blocked_by, reason):
+        chat_id = str(chat_id)
+        with transaction() as conn:
+            conn.execute(BLOCK_USER, (chat_id, username, student_name, blocked_at, blocked_by, reason))
+        self._changed(chat_id, True)
+
+    def unblock(self, chat_id):
+        chat_id = str(chat_id)
+        with transaction() as conn:
+            conn.execute("DELETE FROM blocked_users WHERE chat_id = ?", (chat_id,))
+        self._changed(chat_id, False)
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._ids = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "blocked": len(self._ids) if self._ids is not None else "-",
+                "checks": self.checks,
+                "loads": self.loads,
+                "errors": self.errors,
+            }
+
+block_list = BlockList()
+cache_versions.register("blocked_users", block_list.invalidate)
@@ -0,0 +1,176 @@
+"""Faol to'lov kartalari halqasi (consistent hashing).
+
+get_card_for_user har "💳 Hisobni to'ldirish" bosilganda bot_cards ni o'qirdi
+va o'quvchilarni faqat birinchi ikki faol karta orasida toq/juft bo'yicha
+bo'lardi; admin kartalarni boshqarganda get_db_id_by_visible_id ham shu
+ro'yxatni qayta o'qirdi. CardRing faol kartalarni bir marta o'qiydi va har
+bir karta uchun CARD_RING_REPLICAS * weight ta virtual nuqtani halqaga
+qo'yadi; o'quvchi user_id xeshidan keyingi birinchi nuqtaning kartasiga
+tushadi. Nuqtalar kartaning DB id'sidan hisoblanadi, shuning uchun karta
+qo'shilganda faqat yangi kartaga o'tadigan ulush (taxminan uning vazni /
+jami vazn) ko'chadi, qolganlar o'z kartasida qoladi.
+
+bot_cards faqat add/set_active/set_weight/delete orqali o'zgartiriladi:
+halqa commit'dan keyin qayta quriladi, klasterda boshqa jarayonlar uni
+cache_versions orqali qayta o'qiydi.
+"""
+import bisect
+import hashlib
+import threading
+from typing import NamedTuple
+
+from config import CARD_RING_REPLICAS
+from cluster import cache_versions
+from database import query_db, transaction
+
+MAX_WEIGHT = 20
+
+ACTIVE_CARDS = (
+    "SELECT id, card_number, card_owner, bank_name, weight FROM bot_cards "
+    "WHERE is_active = 1 ORDER BY id ASC"
+)
+
+class Card(NamedTuple):
+    id: int
+    visible_id: int  # faol kartalar orasidagi tartib raqami (1, 2, 3...)
+    card_number: str
+    card_owner: str
+    bank_name: str
+    weight: int
+
+def _point(key):
+    """Jarayonlar orasida barqaror 64-bit xesh (hash() har jarayonda boshqacha)"""
+    return int.from_bytes(hashlib.blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+class Ring(NamedTuple):
+    cards: tuple
+    points: list  # tartiblangan xeshlar
+    owners: list  # points[i] nuqtasining kartasi
+
+    @classmethod
+    def build(cls, cards, replicas):
+        nodes = sorted(
+            (_point(f"{card.id}:{i}"), card)
+            for card in cards
+            for i in range(replicas * card.weight)
+        )
+        return cls(tuple(cards), [p for p, _ in nodes], [c for _, c in nodes])
+
+    def lookup(self, user_id):
+        if not self.points:
+            return None
+        index = bisect.bisect(self.points, _point(user_id))
+        return self.owners[index % len(self.owners)]
+
+class CardRing:
+    def __init__(self, replicas=160):
+        self.replicas = max(1, replicas)
+        self._lock = threading.Lock()
+        self._ring = None  # None - hali o'qilmagan
+        self._generation = 0
+        self.loads = 0
+        self.lookups = 0
+        self._assigned = {}  # card id -> lookup'lar soni
+
+    def _snapshot(self):
+        with self._lock:
+            ring = self._ring
+            if ring is not None:
+                return ring
+            generation = self._generation
+        rows = query_db(ACTIVE_CARDS, fetch=True)
+        cards = [
+            Card(card_id, visible_id, number, owner, bank, min(max(weight or 1, 1), MAX_WEIGHT))
+            for visible_id, (card_id, number, owner, bank, weight) in enumerate(rows or [], 1)
+        ]
+        ring = Ring.build(cards, self.replicas)
+        with self._lock:
+            self.loads += 1
+            # O'qishda xatolik bo'lsa yoki shu orada kartalar o'zgargan bo'lsa saqlamaymiz
+            if rows is not None and self._generation == generation:
+                self._ring = ring
+        return ring
+
+    def load(self):
+        """Ishga tushishda: halqani oldindan quradi, faol kartalar sonini qaytaradi"""
+        return len(self._snapshot().cards)
+
+    def cards(self):
+        """Faol kartalar (Card), id bo'yicha tartibda"""
+        return self._snapshot().cards
+
+    def card_for(self, user_id):
+        """O'quvchining kartasi (Card) yoki None - faol karta yo'q"""
+        card = self._snapshot().lookup(user_id)
+        with self._lock:
+            self.lookups += 1
+            if card is not None:
+                self._assigned[card.id] = self._assigned.get(card.id, 0) + 1
+        return card
+
+    def find(self, card_id):
+        """DB id bo'yicha faol karta yoki None"""
+        return next((card for card in self.cards() if card.id == card_id), None)
+
+    def db_id(self, visible_id):
+        """Ko'rinadigan ID (1, 2, 3...) -> DB id yoki None"""
+        cards = self.cards()
+        if visible_id <= 0 or visible_id > len(cards):
+            return None
+        return cards[visible_id - 1].id
+
+    def _changed(self):
+        with self._lock:
+            self._generation += 1
+            self._ring = None
+        if cache_versions.enabled:
+            cache_versions.bump("bot_cards")
+        self.load()
+
+    def add(self, card_number, card_owner, bank_name, weight=1):
+        """Yangi faol karta; DB id sini qaytaradi"""
+        with transaction() as conn:
+            card_id = conn.execute(
+                "INSERT INTO bot_cards (card_number, card_owner, bank_name, weight) VALUES (?, ?, ?, ?)",
+                (card_number, card_owner, bank_name, weight)
+            ).lastrowid
+        self._changed()
+        return card_id
+
+    def set_active(self, card_id, active):
+        with transaction() as conn:
+            conn.execute("UPDATE bot_cards SET is_active = ? WHERE id = ?", (1 if active else 0, card_id))
+        self._changed()
+
+    def set_weight(self, card_id, weight):
+        with transaction() as conn:
+            conn.execute("UPDATE bot_cards SET weight = ? WHERE id = ?", (weight, card_id))
+        self._changed()
+
+    def delete(self, card_id):
+        with transaction() as conn:
+            conn.execute("DELETE FROM bot_cards WHERE id = ?", (card_id,))
+        self._changed()
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._ring = None
+
+    def stats(self):
+        with self._lock:
+            ring = self._ring
+            assigned = dict(self._assigned)
+        if ring is None:
+            return {"cards": "-", "points": "-", "lookups": self.lookups, "loads": self.loads}
+        return {
+            "cards": len(ring.cards),
+            "points": len(ring.points),
+            "lookups": self.lookups,
+            "loads": self.loads,
+            # ko'rinadigan ID: vazn / berilgan kartalar soni
+            "by_card": ", ".join(f"{c.visible_id}:{c.weight}/{assigned.get(c.id, 0)}" for c in ring.cards) or "-",
+        }
+
+card_ring = CardRing(CARD_RING_REPLICAS)
+cache_versions.register("bot_cards", card_ring.invalidate)
@@ -0,0 +1,79 @@
+"""Testlar katalogi uchun jarayon ichidagi kesh (read-through).
+
+Katalog kichik va faqat admin test/uyga vazifa qo'shganda yoki o'chirganda
+o'zgaradi, shuning uchun butun jadval bir marta o'qiladi va invalidate()
+chaqirilgunga qadar xotiradan beriladi. Yo'q test_id ham so'rovsiz aniqlanadi.
+O'qishda DB xatosi bo'lsa bo'sh katalog keshlanmaydi - keyingi chaqiruv qayta o'qiydi.
+Ko'p jarayonli rejimda invalidate boshqa worker'larga cache_versions orqali yetadi.
+"""
+import logging
+import sqlite3
+import threading
+
+from cluster import cache_versions
+from repository import load_all
+
+logger = logging.getLogger(__name__)
+
+class TestCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tests = None  # test_id -> repository.Test (created_at bo'yicha tartibda)
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _snapshot(self):
+        with self._lock:
+            tests = self._tests
+            if tests is not None:
+                self.hits += 1
+                return tests
+            self.misses += 1
+            generation = self._generation
+        # DB dan lock'siz o'qiymiz; shu orada invalidate() bo'lsa natija saqlanmaydi
+        try:
+            loaded = {t.test_id: t for t in load_all("tests")}
+        except sqlite3.Error:
+            logger.exception("Testlar katalogini o'qib bo'lmadi")
+            return {}
+        with self._lock:
+            if self._generation == generation:
+                self._tests = loaded
+        return loaded
+
+    def get(self, test_id):
+        """Test (repository.Test) yoki None"""
+        return self._snapshot().get(test_id)
+
+    def list(self, homework=False):
+        """Oddiy testlar (created_at ASC) yoki uyga vazifalar"""
+        return [t for t in self._snapshot().values() if bool(t.is_homework == 1) == homework]
+
+    def invalidate(self):
+        with self._lock:
+            self._tests = None
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "tests": len(self._tests) if self._tests is not None else "-",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0,
+                "invalidations": self.invalidations,
+            }
+
+test_catalog = TestCatalog()
+cache_versions.register("tests", test_catalog.invalidate)
+
+def get_test(test_id):
+    return test_catalog.get(test_id)
+
+def invalidate_tests():
+    """tests jadvali o'zgargandan keyin chaqiriladi (klasterda - barcha jarayonlarda)"""
+    cache_versions.bump("tests")
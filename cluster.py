@@ -0,0 +1,228 @@
+"""Ko'p jarayonli rejim (CLUSTER_WORKERS > 0): worker'lar, lider lease'i va keshlar.
+
+    CLUSTER_WORKERS=4 python main.py
+
+Asosiy jarayon update'larni qabul qilib navbatga yozadi (update_queue.py) va
+CLUSTER_WORKERS ta worker jarayonini ishga tushiradi (BOT_ROLE=worker,
+WORKER_INDEX=i); yiqilgan worker qayta ishga tushiriladi. Har bir worker o'z
+bo'limidagi chatlarni ishlaydi - handlerlar turli CPU yadrolarida.
+
+Jarayonlar orasida umumiy narsalar asosiy SQLite bazasida:
+- user_state va answered_quizzes - state_entries (STATE_PERSIST majburiy yoqiladi);
+  chat holati faqat o'z worker'ida o'zgaradi, boshqa chat holatini o'chirish
+  forget_state() orqali egasiga yuboriladi;
+- leases - bitta jarayon lider (masalan viktorina dispatcher'i), muddati
+  tugasa boshqasi oladi;
+- cache_versions - jarayon ichidagi kesh (test katalogi va h.k.) bir joyda
+  invalidate qilinsa, boshqalar CACHE_SYNC_INTERVAL ichida o'zinikini tashlaydi.
+"""
+import logging
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+from config import (
+    user_state, CLUSTER_WORKERS, BOT_ROLE, WORKER_INDEX, CACHE_SYNC_INTERVAL, LEASE_TTL
+)
+from database import query_db, transaction
+
+logger = logging.getLogger(__name__)
+
+ENABLED = CLUSTER_WORKERS > 0
+IS_WORKER = ENABLED and BOT_ROLE == "worker"
+PROCESS_ID = f"{BOT_ROLE}-{WORKER_INDEX}-{os.getpid()}"
+
+class Lease:
+    """leases jadvalidagi nomli qulf: bir vaqtda bitta egasi, ttl soniyada yangilanadi"""
+
+    def __init__(self, name, holder=PROCESS_ID, ttl=LEASE_TTL):
+        self.name = name
+        self.holder = holder
+        self.ttl = max(3, int(ttl))
+        self._valid_until = 0.0
+        self._acquired = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.acquisitions = 0
+
+    @property
+    def held(self):
+        return time.monotonic() < self._valid_until
+
+    def try_acquire(self):
+        """Bo'sh yoki muddati o'tgan bo'lsa oladi, o'ziniki bo'lsa yangilaydi"""
+        now = time.time()
+        started = time.monotonic()
+        with transaction() as conn:
+            cur = conn.execute(
+                "UPDATE leases SET holder = ?, expires_ts = ? WHERE name = ? AND (holder = ? OR expires_ts < ?)",
+                (self.holder, now + self.ttl, self.name, self.holder, now),
+            )
+            if cur.rowcount == 0:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO leases (name, holder, expires_ts) VALUES (?, ?, ?)",
+                    (self.name, self.holder, now + self.ttl),
+                )
+            got = cur.rowcount == 1
+        if got:
+            if not self.held:
+                self.acquisitions += 1
+                logger.info(f"👑 {self.name}: lider - {self.holder}")
+            # Yozuvdagidan biroz oldin tugaydi - soatlar farqi va kechikish uchun zaxira
+            self._valid_until = started + self.ttl * 0.8
+            self._acquired.set()
+        else:
+            self._valid_until = 0.0
+            self._acquired.clear()
+        return got
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.try_acquire()
+            except Exception:
+                logger.exception(f"{self.name}: lease yangilanmadi")
+            self._stop.wait(self.ttl / 3)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name=f"lease-{self.name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self):
+        """Lider bo'lgunga qadar kutadi"""
+        while not self.held:
+            self._acquired.wait(self.ttl / 3)
+
+    def release(self):
+        self._stop.set()
+        if self.held:
+            query_db("DELETE FROM leases WHERE name = ? AND holder = ?", (self.name, self.holder))
+        self._valid_until = 0.0
+
+class CacheVersions:
+    """Jarayon ichidagi keshlarni boshqa jarayonlar bilan moslash (cache_versions jadvali)"""
+
+    def __init__(self):
+        self._caches = {}  # nomi -> invalidate()
+        self._seen = {}  # nomi -> oxirgi ko'rilgan versiya
+        self._lock = threading.Lock()
+        self._thread = None
+        self.enabled = False
+        self.remote_invalidations = 0
+
+    def register(self, name, invalidate):
+        self._caches[name] = invalidate
+
+    def bump(self, name):
+        """Shu jarayon keshini darhol, boshqalarnikini keyingi poll'da tashlaydi"""
+        self._caches[name]()
+        if not self.enabled:
+            return
+        with transaction() as conn:
+            conn.execute(
+                "INSERT INTO cache_versions (name, version) VALUES (?, 1) "
+                "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                (name,),
+            )
+            version = conn.execute("SELECT version FROM cache_versions WHERE name = ?", (name,)).fetchone()[0]
+        with self._lock:
+            self._seen[name] = version
+
+    def poll(self, seed=False):
+        rows = query_db("SELECT name, version FROM cache_versions", fetch=True) or []
+        for name, version in rows:
+            with self._lock:
+                # Yangi paydo bo'lgan nom ham o'zgarish (birinchi bump boshqa jarayonda)
+                changed = not seed and self._seen.get(name, 0) != version
+                self._seen[name] = version
+            if changed and name in self._caches:
+                self._caches[name]()
+                self.remote_invalidations += 1
+
+    def start(self, interval=CACHE_SYNC_INTERVAL):
+        self.enabled = True
+        self.poll(seed=True)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll()
+                except Exception:
+                    logger.exception("cache_versions o'qilmadi")
+        self._thread = threading.Thread(target=run, name="cache-sync", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        with self._lock:
+            return {"caches": len(self._caches), "versions": dict(self._seen), "remote_invalidations": self.remote_invalidations}
+
+cache_versions = CacheVersions()
+
+def forget_state(chat_id):
+    """Boshqa chatning suhbat holatini o'chiradi - u boshqa worker'da bo'lsa, o'sha worker orqali"""
+    from update_queue import update_queue
+    if ENABLED and not (IS_WORKER and update_queue.partition_of(chat_id) == WORKER_INDEX):
+        update_queue.put_control(chat_id, "forget_state")
+    else:
+        user_state.pop(chat_id, None)
+
+def control_handlers():
+    """QueueWorker uchun boshqaruv yozuvlari"""
+    return {"forget_state": lambda data: user_state.pop(data["chat_id"], None)}
+
+class Supervisor:
+    """Worker jarayonlarini ishga tushiradi va yiqilganini qayta ishga tushiradi"""
+
+    def __init__(self, workers, script=None):
+        self.workers = workers
+        self.script = script or os.path.abspath(sys.argv[0])
+        self._procs = {}
+        self._stopping = False
+        self._thread = None
+        self.restarts = 0
+
+    def _spawn(self, index):
+        env = {**os.environ, "BOT_ROLE": "worker", "WORKER_INDEX": str(index), "CLUSTER_WORKERS": str(self.workers)}
+        self._procs[index] = subprocess.Popen([sys.executable, self.script], env=env)
+
+    def start(self):
+        for index in range(self.workers):
+            self._spawn(index)
+        self._thread = threading.Thread(target=self._watch, name="supervisor", daemon=True)
+        self._thread.start()
+        logger.info(f"👷 {self.workers} ta worker jarayoni ishga tushdi")
+
+    def _watch(self):
+        while not self._stopping:
+            time.sleep(1)
+            for index, proc in list(self._procs.items()):
+                code = proc.poll()
+                if code is not None and not self._stopping:
+                    logger.error(f"Worker {index} to'xtadi (kod {code}), qayta ishga tushirilmoqda")
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def stop(self, timeout=30):
+        """SIGTERM: worker'lar lane'lardagini tugatib chiqadi"""
+        self._stopping = True
+        for proc in self._procs.values():
+            if proc.poll() is None:
+                proc.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + timeout
+        for index, proc in self._procs.items():
+            try:
+                proc.wait(max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.error(f"Worker {index} to'xtamadi - o'ldirilmoqda")
+                proc.kill()
+
+    def alive(self):
+        return sum(1 for proc in self._procs.values() if proc.poll() is None)
+
+supervisor = None  # asosiy jarayonda ishlayotgan Supervisor
+worker = None  # worker jarayonida ishlayotgan update_queue.QueueWorker
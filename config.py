@@ -1,8 +1,11 @@
 import os
 import logging
+import secrets
 from dotenv import load_dotenv
 import telebot
 
+from state_store import StateStore
+
 load_dotenv()
 
 TOKEN = os.getenv("BOT_TOKEN")
@@ -21,16 +24,103 @@ DB_FILE = os.getenv("DB_FILE", "data.db")
 VIDEOS_FOLDER = os.getenv("VIDEOS_FOLDER", "videos")
 POLLING = os.getenv("BOT_POLLING", "1") == "1"
 
+# Webhook rejimi (BOT_POLLING=0): Telegram WEBHOOK_URL ga yuboradi, server WEBHOOK_HOST:WEBHOOK_PORT da tinglaydi
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "").rstrip("/")
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or secrets.token_urlsafe(32)
+# Update'lar chat_id bo'yicha shuncha lane'da ishlanadi (bir chat - ketma-ket, turli chatlar - parallel)
+UPDATE_LANES = int(os.getenv("UPDATE_LANES", "8"))
+UPDATE_LANE_QUEUE_SIZE = int(os.getenv("UPDATE_LANE_QUEUE_SIZE", "100"))
+# asyncio runtime (AsyncTeleBot, aiohttp kerak): async variantli handlerlar event loop'da,
+# qolganlari AIO_HANDLER_THREADS ta thread'da; ommaviy yuborishda bir vaqtda AIO_SEND_CONCURRENCY ta so'rov
+BOT_ASYNC = os.getenv("BOT_ASYNC", "0") == "1"
+AIO_HANDLER_THREADS = int(os.getenv("AIO_HANDLER_THREADS", "16"))
+AIO_SEND_CONCURRENCY = int(os.getenv("AIO_SEND_CONCURRENCY", "30"))
+# Chiquvchi xabarlar (outbound.py): global va har bir chat uchun limit (xabar/s), 429 da qayta urinishlar
+OUTBOUND_RATE = float(os.getenv("OUTBOUND_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+# Chat bo'yicha portlash: 1 - qat'iy 1 xabar/s (Telegram chat limiti); kattaroq qiymat ketma-ket javoblarni tezlatadi, lekin 429 xavfi bor
+OUTBOUND_CHAT_BURST = int(os.getenv("OUTBOUND_CHAT_BURST", "1"))
+# Handler javoblari uchun chat portlashi: bitta javobdagi 2-3 xabar kutmasdan ketadi (admin/ommaviy xabarlar - OUTBOUND_CHAT_BURST)
+OUTBOUND_INTERACTIVE_BURST = int(os.getenv("OUTBOUND_INTERACTIVE_BURST", "3"))
+OUTBOUND_QUEUE_SIZE = int(os.getenv("OUTBOUND_QUEUE_SIZE", "10000"))
+OUTBOUND_WORKERS = int(os.getenv("OUTBOUND_WORKERS", "8"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+# Test/uyga vazifa topshiriqlari adminga shuncha soniyalik digest bo'lib ketadi (0 - har biri darhol),
+# bitta digestda ko'pi bilan NOTIFY_DIGEST_MAX ta hodisa; to'lov xabarlari kutmaydi
+NOTIFY_DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "60"))
+NOTIFY_DIGEST_MAX = int(os.getenv("NOTIFY_DIGEST_MAX", "20"))
+# Ko'p jarayonli rejim (cluster.py): CLUSTER_WORKERS > 0 bo'lsa main.py update'larni UPDATE_QUEUE_FILE
+# navbatiga yozadi va shuncha worker jarayonini ishga tushiradi (BOT_ROLE=worker, WORKER_INDEX=i);
+# worker'lar navbatni CLUSTER_POLL_INTERVAL da tekshiradi, keshlar CACHE_SYNC_INTERVAL da moslanadi
+CLUSTER_WORKERS = int(os.getenv("CLUSTER_WORKERS", "0"))
+BOT_ROLE = os.getenv("BOT_ROLE", "main")
+WORKER_INDEX = int(os.getenv("WORKER_INDEX", "0"))
+UPDATE_QUEUE_FILE = os.getenv("UPDATE_QUEUE_FILE", os.path.splitext(DB_FILE)[0] + "_updates.db")
+CLUSTER_POLL_INTERVAL = float(os.getenv("CLUSTER_POLL_INTERVAL", "0.05"))
+CACHE_SYNC_INTERVAL = float(os.getenv("CACHE_SYNC_INTERVAL", "1"))
+LEASE_TTL = int(os.getenv("LEASE_TTL", "30"))
+if BOT_ROLE == "worker" and CLUSTER_WORKERS > 1:
+    # Telegram limiti butun bot uchun - worker'lar o'rtasida bo'linadi
+    OUTBOUND_RATE /= CLUSTER_WORKERS
+# Lokal Bot API server yoki test uchun, masalan http://127.0.0.1:8081/bot{0}/{1}
+BOT_API_URL = os.getenv("BOT_API_URL")
+
+# Natijalarni guruhlab yozish (write-behind): partiya hajmi va vaqt oynasi (soniya)
+RESULTS_WRITE_BEHIND = os.getenv("RESULTS_WRITE_BEHIND", "0") == "1"
+RESULTS_BATCH_SIZE = int(os.getenv("RESULTS_BATCH_SIZE", "50"))
+RESULTS_BATCH_WINDOW = float(os.getenv("RESULTS_BATCH_WINDOW", "0.5"))
+
+# Eski natijalar arxiv bazasiga ko'chiriladi (0 = o'chirilgan)
+ARCHIVE_DB_FILE = os.getenv("ARCHIVE_DB_FILE", os.path.splitext(DB_FILE)[0] + "_archive.db")
+RESULTS_HOT_DAYS = int(os.getenv("RESULTS_HOT_DAYS", "90"))
+
+# db_executor: o'qish pool'idagi threadlar soni (yozuvlar doim bitta threadda)
+DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "4"))
+
+# Suhbat holatlari: step shuncha soniya harakatsiz qolsa unutiladi (o'z timeout'i bo'lmasa),
+# step'siz yozuvlar - STATE_IDLE_TIMEOUT dan keyin
+STATE_TIMEOUT = int(os.getenv("STATE_TIMEOUT", "1800"))
+STATE_IDLE_TIMEOUT = int(os.getenv("STATE_IDLE_TIMEOUT", str(2 * 86400)))
+STATE_SWEEP_INTERVAL = int(os.getenv("STATE_SWEEP_INTERVAL", "60"))
+# Xotiradagi holatlar chegarasi (state_store.py): oshsa eng eski ishlatilgan yozuv chiqariladi
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "100000"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "50000"))
+# Profili yo'q (ro'yxatdan o'tmagan) foydalanuvchi shuncha soniya eslab qolinadi (access.py)
+PROFILE_MISSING_TTL = int(os.getenv("PROFILE_MISSING_TTL", "60"))
+ANSWERED_QUIZZES_MAX = int(os.getenv("ANSWERED_QUIZZES_MAX", "500000"))
+# Obunalar keshi (subscriptions.py): faol obuna tugash vaqtigacha, obunasizlik SUBSCRIPTION_NEGATIVE_TTL soniya
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "100000"))
+SUBSCRIPTION_NEGATIVE_TTL = int(os.getenv("SUBSCRIPTION_NEGATIVE_TTL", "300"))
+# Muddati o'tgan obunalar har SUBSCRIPTION_SWEEP_INTERVAL soniyada bitta UPDATE bilan faolsizlantiriladi;
+# SUBSCRIPTION_EXPIRY_NOTIFY=1 - o'quvchilarga xabar (ommaviy prioritetda)
+SUBSCRIPTION_SWEEP_INTERVAL = int(os.getenv("SUBSCRIPTION_SWEEP_INTERVAL", "60"))
+SUBSCRIPTION_EXPIRY_NOTIFY = os.getenv("SUBSCRIPTION_EXPIRY_NOTIFY", "0") == "1"
+# To'lov kartalari halqasi (cards.py): har bir karta vazn birligi uchun virtual nuqtalar soni
+CARD_RING_REPLICAS = int(os.getenv("CARD_RING_REPLICAS", "160"))
+# user_state va answered_quizzes restartdan omon qolishi uchun SQLite'da (state_persist.py, klasterda doim);
+# o'zgarishlar STATE_FLUSH_INTERVAL soniyada bir partiya bilan yoziladi
+STATE_PERSIST = os.getenv("STATE_PERSIST", "0") == "1" or CLUSTER_WORKERS > 0
+STATE_FLUSH_INTERVAL = float(os.getenv("STATE_FLUSH_INTERVAL", "2"))
+
 # Logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger(__name__)
 
 # Bot instance
+if BOT_API_URL:
+    telebot.apihelper.API_URL = BOT_API_URL
 bot = telebot.TeleBot(TOKEN, parse_mode="HTML")
 
-# Global state
-user_state = {}
-user_profiles = {}
+# Global state: TTL va LRU bilan chegaralangan (state_store.py)
+user_state = StateStore("user_state", STATE_MAX_ENTRIES, STATE_IDLE_TIMEOUT)
+user_profiles = StateStore("user_profiles", PROFILE_CACHE_SIZE)
+# user_id -> True: users jadvalida qatori yo'q; save_profile o'chiradi
+missing_profiles = StateStore("missing_profiles", PROFILE_CACHE_SIZE, PROFILE_MISSING_TTL)
+# "quiz_{quiz_id}_{user_id}" -> True, viktorina muddati tugaguncha saqlanadi
+answered_quizzes = StateStore("answered_quizzes", ANSWERED_QUIZZES_MAX)
 
 # Create videos folder if not exists
 if VIDEOS_FOLDER and not os.path.exists(VIDEOS_FOLDER):
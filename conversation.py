@@ -0,0 +1,150 @@
+"""Suhbat holatlari (user_state step'lari) reyestri.
+
+Har bir step bir joyda e'lon qilinadi: uning handleri, "⬅️ Orqaga" bosilganda
+qayerga qaytishi va necha soniya harakatsizlikdan keyin unutilishi.
+
+    conversation.state("quiz_menu")                      # handlersiz (faqat menyu)
+    @conversation.step("get_homework_name", back=admin_homework_menu)
+    def get_homework_name(message): ...
+
+"⬅️ Orqaga" uchun bitta umumiy handler bor (birinchi bo'lib ro'yxatdan o'tadi):
+joriy step'ning back'i chaqiriladi, back=None bo'lsa bosh menyu. Shuning uchun
+step handlerlari orqaga tugmasini o'zi tekshirmaydi va istisno ro'yxatlari
+kerak emas. Har bir holatning muddati user_state'da (StateStore TTL) turadi:
+har bir harakatda step timeout'i bilan yangilanadi, muddati o'tganlari fon
+thread'ida tozalanadi.
+"""
+import functools
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from config import bot, ADMIN_IDS, user_state, STATE_TIMEOUT, STATE_IDLE_TIMEOUT
+from router import router
+from state_store import expire_all
+
+logger = logging.getLogger(__name__)
+
+BACK_BUTTON = "⬅️ Orqaga"
+
+class Step(NamedTuple):
+    name: str
+    handler: object  # None - step xabarlarni kutmaydi (menyu yoki inline tugma)
+    back: object  # back(message) yoki None - bosh menyu
+    timeout: int
+
+def to_main_menu(message):
+    """Holatni tozalab bosh menyuni ko'rsatadi (admin yoki foydalanuvchi)"""
+    from utils import admin_main_menu, user_main_menu
+    user_state.pop(message.chat.id, None)
+    try:
+        menu = admin_main_menu() if message.from_user.id in ADMIN_IDS else user_main_menu()
+        bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=menu)
+    except Exception:
+        # Menyusiz oddiy xabar
+        try:
+            bot.send_message(message.chat.id, "🏠 Bosh menyu")
+        except Exception:
+            pass
+
+class Conversation:
+    def __init__(self, router, default_timeout=STATE_TIMEOUT, idle_timeout=STATE_IDLE_TIMEOUT):
+        self.router = router
+        self.default_timeout = default_timeout
+        self.idle_timeout = idle_timeout
+        self.steps = {}
+        self.expired = 0
+
+    def _declare(self, name, handler, back, timeout):
+        if name in self.steps:
+            raise ValueError(f"Step ikki marta e'lon qilindi: {name}")
+        step = Step(name, handler, back, timeout or self.default_timeout)
+        self.steps[name] = step
+        return step
+
+    def state(self, name, back=None, timeout=None):
+        """Handlersiz step: foydalanuvchi menyuda yoki inline tugma bosishini kutmoqda"""
+        return self._declare(name, None, back, timeout)
+
+    def step(self, name, back=None, timeout=None, func=None, content_types=None):
+        """Step handleri: router'da step bo'yicha indekslanadi, har bir xabar timeout'ni yangilaydi"""
+        def decorator(handler):
+            self._declare(name, handler, back, timeout)
+
+            @functools.wraps(handler)
+            def run(message):
+                self.touch(message.chat.id)
+                return handler(message)
+            self.router.message_handler(step=name, func=func, content_types=content_types)(run)
+            return handler
+        return decorator
+
+    def timeout_for(self, state):
+        """Holat necha soniya harakatsiz turishi mumkin"""
+        name = state.get("step") if state else None
+        if name is None:
+            return self.idle_timeout
+        step = self.steps.get(name)
+        return step.timeout if step else self.default_timeout
+
+    def touch(self, chat_id):
+        user_state.touch(chat_id, self.timeout_for(user_state.get(chat_id)))
+
+    def enter(self, chat_id, step, **data):
+        """Yangi step: oldingi holat ma'lumotlari tashlanadi"""
+        user_state[chat_id] = {"step": step, **data}
+        self.touch(chat_id)
+
+    def goto(self, chat_id, step, **data):
+        """Keyingi step: to'plangan ma'lumotlar saqlanadi"""
+        state = user_state.setdefault(chat_id, {})
+        state.update(data)
+        state["step"] = step
+        self.touch(chat_id)
+
+    def current(self, chat_id):
+        """Joriy Step (e'lon qilinmagan yoki step yo'q bo'lsa None)"""
+        state = user_state.get(chat_id)
+        return self.steps.get(state.get("step")) if state else None
+
+    def handle_back(self, message):
+        step = self.current(message.chat.id)
+        if step is None or step.back is None:
+            return to_main_menu(message)
+        user_state.pop(message.chat.id, None)
+        step.back(message)
+
+    def sweep(self, now=None):
+        """Muddati o'tgan holatlarni o'chiradi, o'chirilganlar sonini qaytaradi"""
+        expired = user_state.expire(now)
+        self.expired += expired
+        if expired:
+            logger.info(f"🧹 {expired} ta eskirgan suhbat holati tozalandi")
+        return expired
+
+    def start_sweeper(self, interval):
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.sweep()
+                    # user_profiles, answered_quizzes va boshqa store'lar
+                    expire_all()
+                except Exception:
+                    logger.exception("Suhbat holatlarini tozalashda xatolik")
+        thread = threading.Thread(target=run, name="state-sweeper", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self):
+        return {
+            "states": len(user_state),
+            "steps": len(self.steps),
+            "expired": self.expired,
+        }
+
+conversation = Conversation(router)
+
+# Boshqa barcha xabar handlerlaridan oldin ro'yxatdan o'tishi kerak
+router.message_handler(text=BACK_BUTTON)(conversation.handle_back)
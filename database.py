@@ -1,188 +1,221 @@
 import sqlite3
 import logging
-from datetime import datetime
-from config import DB_FILE, user_profiles
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import archive
+from config import DB_FILE, ARCHIVE_DB_FILE, RESULTS_HOT_DAYS, user_profiles, missing_profiles, RESULTS_BATCH_SIZE, RESULTS_BATCH_WINDOW
+from migrations import migrate, backfill_epoch_columns
+from result_writer import ResultWriter
 
 logger = logging.getLogger(__name__)
 
-def init_db():
-    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
-    cur = conn.cursor()
+# Har bir thread o'z ulanishini qayta ishlatadi (telebot worker'lari, quiz dispatcher)
+_local = threading.local()
+_connections = {}
+_connections_lock = threading.Lock()
+
+def _configure_connection(conn):
+    """Ulanish ochilganda bir marta PRAGMA larni qo'llaydi"""
     try:
-        cur.execute("PRAGMA journal_mode=WAL;")
-        cur.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
     except Exception:
         pass
 
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            chat_id TEXT PRIMARY KEY,
-            student_name TEXT,
-            username TEXT,
-            updated_at TEXT,
-            name_changes INTEGER DEFAULT 0,
-            balance INTEGER DEFAULT 0
-        )
-    ''')
-
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS tests (
-            test_id TEXT PRIMARY KEY,
-            test_name TEXT,
-            correct_answers TEXT,
-            created_at TEXT
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS results (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_name TEXT,
-            username TEXT,
-            tg_id TEXT,
-            test_id TEXT,
-            correct_count INTEGER,
-            incorrect_count INTEGER,
-            date TEXT
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS videos (
-            video_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            test_id TEXT UNIQUE,
-            video_url TEXT,
-            created_at TEXT
-        )
-    ''')
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS quizzes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            file_path TEXT,
-            file_id TEXT,
-            correct_answer TEXT,
-            active INTEGER DEFAULT 1,
-            created_at TEXT,
-            sent_at TEXT,
-            hours_remaining INTEGER DEFAULT 24,
-            sent_to_users INTEGER DEFAULT 0
-        )
-    ''')
-    
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS blocked_users (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id TEXT UNIQUE,
-            username TEXT,
-            student_name TEXT,
-            blocked_at TEXT,
-            blocked_by TEXT,
-            reason TEXT
-        )
-    ''')
-    
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS bot_cards (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            card_number TEXT NOT NULL,
-            card_owner TEXT,
-            bank_name TEXT,
-            is_active INTEGER DEFAULT 1
-        )
-    ''')
-    
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS payments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT,
-            username TEXT,
-            student_name TEXT,
-            amount INTEGER DEFAULT 15000,
-            status TEXT DEFAULT 'pending',
-            card_number TEXT,
-            payment_date TEXT,
-            verified_date TEXT,
-            verified_by TEXT,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    cur.execute('''
-        CREATE TABLE IF NOT EXISTS subscriptions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id TEXT UNIQUE,
-            username TEXT,
-            student_name TEXT,
-            subscription_type TEXT DEFAULT 'monthly',
-            price INTEGER DEFAULT 15000,
-            start_date TEXT,
-            end_date TEXT,
-            is_active INTEGER DEFAULT 1,
-            payment_id INTEGER,
-            created_at TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
+def connect(attach_archive=True):
+    """Yangi (pool'dan tashqari) ulanish ochadi; arxiv `archive` nomi bilan biriktiriladi"""
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
+    _configure_connection(conn)
+    if attach_archive:
+        archive.attach(conn, ARCHIVE_DB_FILE)
+    return conn
 
-    conn.commit()
+def get_connection():
+    """Joriy thread uchun doimiy ulanishni qaytaradi"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = connect()
+        _local.conn = conn
+        with _connections_lock:
+            # Tugagan thread'lardan qolgan ulanishlarni yopish
+            for thread in [t for t in _connections if not t.is_alive()]:
+                try:
+                    _connections.pop(thread).close()
+                except Exception:
+                    pass
+            _connections[threading.current_thread()] = conn
+    return conn
 
-    # Add name_changes column if not exists
-    cur.execute("PRAGMA table_info(users)")
-    cols = [r[1] for r in cur.fetchall()]  
-    if "name_changes" not in cols:
-        try:
-            cur.execute("ALTER TABLE users ADD COLUMN name_changes INTEGER DEFAULT 0")
-            conn.commit()
-        except Exception:
-            pass
+def discard_connection():
+    """Joriy thread ulanishini yopadi (xatolikdan keyin yoki thread tugaganda)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        return
+    _local.conn = None
+    with _connections_lock:
+        _connections.pop(threading.current_thread(), None)
+    try:
+        conn.close()
+    except Exception:
+        pass
 
-    if "balance" not in cols:
+def close_all_connections():
+    """Shutdown paytida barcha ochiq ulanishlarni yopadi"""
+    _local.conn = None
+    with _connections_lock:
+        conns = list(_connections.values())
+        _connections.clear()
+    for conn in conns:
         try:
-            cur.execute("ALTER TABLE users ADD COLUMN balance INTEGER DEFAULT 0")
-            conn.commit()
+            conn.close()
         except Exception:
             pass
 
-    # Add is_homework column for tests
-    cur.execute("PRAGMA table_info(tests)")
-    test_cols = [r[1] for r in cur.fetchall()]
-    if "is_homework" not in test_cols:
-        try:
-            cur.execute("ALTER TABLE tests ADD COLUMN is_homework INTEGER DEFAULT 0")
-            conn.commit()
-        except Exception:
-            pass
+def init_db():
+    """Sxemani oxirgi versiyaga keltiradi (sxema yangi bo'lsa faqat user_version o'qiladi)"""
+    conn = connect(attach_archive=False)
+    try:
+        if migrate(conn):
+            try:
+                conn.execute("PRAGMA optimize;")
+            except Exception:
+                pass
+        # results jadvali endi mavjud - arxiv sxemasini ham tayyorlaymiz
+        archive.attach(conn, ARCHIVE_DB_FILE)
+    finally:
+        conn.close()
 
-    # Add columns for quizzes
-    cur.execute("PRAGMA table_info(quizzes)")
-    quiz_cols = [r[1] for r in cur.fetchall()]
-    if "correct_answer" not in quiz_cols:
-        try:
-            cur.execute("ALTER TABLE quizzes ADD COLUMN correct_answer TEXT")
-            conn.commit()
-        except Exception:
-            pass
-    if "sent_at" not in quiz_cols:
-        try:
-            cur.execute("ALTER TABLE quizzes ADD COLUMN sent_at TEXT")
-            conn.commit()
-        except Exception:
-            pass
-    if "hours_remaining" not in quiz_cols:
-        try:
-            cur.execute("ALTER TABLE quizzes ADD COLUMN hours_remaining INTEGER DEFAULT 24")
-            conn.commit()
-        except Exception:
-            pass
-    if "sent_to_users" not in quiz_cols:
+def start_results_compaction():
+    """RESULTS_HOT_DAYS dan eski natijalarni vaqti-vaqti bilan arxivga ko'chiradi"""
+    if RESULTS_HOT_DAYS <= 0:
+        return None
+    return archive.start_compaction(connect, RESULTS_HOT_DAYS)
+
+def start_epoch_backfill():
+    """Eski results/payments qatorlarining epoch ustunlarini fon threadida to'ldiradi"""
+    def run():
+        conn = connect()
         try:
-            cur.execute("ALTER TABLE quizzes ADD COLUMN sent_to_users INTEGER DEFAULT 0")
-            conn.commit()
+            backfill_epoch_columns(conn)
         except Exception:
-            pass
+            logger.exception("Epoch backfill xatolik bilan to'xtadi")
+        finally:
+            conn.close()
+    thread = threading.Thread(target=run, name="epoch-backfill", daemon=True)
+    thread.start()
+    return thread
+
+# Sanalar matn ko'rinishida (ko'rsatish uchun) va *_ts epoch ustunlarida (qidiruv uchun) yoziladi
+def to_ts(dt):
+    return int(dt.timestamp())
+
+def day_range_ts(day=None):
+    """Mahalliy kun boshi va keyingi kun boshi (epoch) - date_ts >= ? AND date_ts < ? uchun"""
+    start = (day or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    return to_ts(start), to_ts(start + timedelta(days=1))
+
+# EXPLAIN QUERY PLAN tekshiruvi uchun: (nomi, so'rov, namunaviy parametrlar)
+# (indekslar migrations.py da; blocked_users.chat_id va subscriptions.user_id UNIQUE - avtomatik indeksga ega)
+HOT_QUERIES = [
+    ("results_attempts",
+     "SELECT COUNT(*) FROM all_results WHERE (username = ? OR tg_id = ?) AND test_id = ?",
+     ("user", "1", "T0001")),
+    ("results_last_attempt",
+     "SELECT correct_count, incorrect_count, date FROM all_results WHERE (username = ? OR tg_id = ?) AND test_id = ? ORDER BY date DESC LIMIT 1",
+     ("user", "1", "T0001")),
+    ("results_by_user",
+     "SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.test_name, t.is_homework FROM all_results r "
+     "LEFT JOIN tests t ON r.test_id = t.test_id WHERE (r.username = ? OR r.tg_id = ?) ORDER BY r.test_id ASC, r.date ASC",
+     ("user", "1")),
+    ("results_by_tg_id",
+     "SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.test_name, t.is_homework FROM all_results r "
+     "LEFT JOIN tests t ON r.test_id = t.test_id WHERE r.tg_id = ? ORDER BY r.test_id ASC, r.date ASC",
+     ("1",)),
+    ("results_by_test",
+     "SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM all_results WHERE test_id = ? ORDER BY date DESC",
+     ("T0001",)),
+    ("results_today",
+     "SELECT student_name, username, tg_id, test_id, correct_count, incorrect_count, date FROM results WHERE date_ts >= ? AND date_ts < ?",
+     (1704067200, 1704153600)),
+    ("access_context",
+     "SELECT u.student_name, s.end_date, s.end_ts FROM (SELECT ? AS chat_id) k "
+     "LEFT JOIN users u ON u.chat_id = k.chat_id "
+     "LEFT JOIN subscriptions s ON s.user_id = k.chat_id AND s.is_active = 1",
+     ("1",)),
+    ("subscriptions_expired",
+     "UPDATE subscriptions SET is_active = 0 WHERE is_active = 1 AND end_ts <= ? RETURNING user_id",
+     (1704067200,)),
+    ("subscriptions_active_list",
+     "SELECT user_id, username, student_name, start_date, end_date, payment_id FROM subscriptions WHERE is_active = 1 ORDER BY end_ts DESC",
+     ()),
+    ("payment_pending",
+     "SELECT id, card_number FROM payments WHERE user_id = ? AND status = 'pending'",
+     ("1",)),
+    ("payment_pending_latest",
+     "SELECT id FROM payments WHERE user_id = ? AND status = 'pending' ORDER BY created_ts DESC LIMIT 1",
+     ("1",)),
+    ("blocked_user",
+     "SELECT id FROM blocked_users WHERE chat_id = ?",
+     ("1",)),
+    ("state_entry",
+     "SELECT value, expires_ts FROM state_entries WHERE store = ? AND key = ?",
+     ("user_state", "1")),
+    ("state_expired",
+     "SELECT key FROM state_entries WHERE expires_ts <= ?",
+     (1704067200,)),
+    ("quiz_unsent",
+     "SELECT id, file_id, correct_answer, sent_to_users FROM quizzes WHERE active = 1 AND sent_to_users = 0 "
+     "AND file_id IS NOT NULL AND file_id != '' ORDER BY created_ts ASC LIMIT 1",
+     ()),
+]
+
+def find_table_scans(conn):
+    """HOT_QUERIES ichida to'liq skanerga tushadiganlarini qaytaradi: [(nomi, plan qatori)]
+
+    Faqat partial indeks bo'yicha SCAN ruxsat etiladi - u faqat kerakli qatorlarni o'z ichiga oladi.
+    View (all_results) natijasini o'qish ham skaner emas: uning ichki so'rovlari alohida tekshiriladi.
+    CONSTANT ROW - jadvalsiz SELECT (masalan, parametrlardan tuzilgan bitta qator).
+    """
+    partial = {
+        row[0] for row in conn.execute(
+            "SELECT il.name FROM sqlite_master m, pragma_index_list(m.name) il "
+            "WHERE m.type = 'table' AND il.partial = 1"
+        )
+    }
+    scans = []
+    for name, sql, params in HOT_QUERIES:
+        subqueries = set()
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params).fetchall():
+            detail = row[-1]
+            if detail.startswith(("CO-ROUTINE ", "MATERIALIZE ")):
+                subqueries.add(detail.split()[1])
+            if not detail.startswith("SCAN") or detail == "SCAN CONSTANT ROW" or detail.split()[1] in subqueries:
+                continue
+            index_name = detail.split("INDEX ", 1)[1].split()[0] if "INDEX " in detail else None
+            if index_name not in partial:
+                scans.append((name, detail))
+    return scans
 
-    conn.close()
+@contextmanager
+def transaction():
+    """Joriy thread ulanishida bitta tranzaksiya: xatoda rollback, aks holda commit"""
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            discard_connection()
+        raise
 
 def query_db(query, params=(), fetch=False, many=False):
+    conn = None
     try:
-        conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
+        conn = get_connection()
         cur = conn.cursor()
         if many:
             cur.executemany(query, params)
@@ -190,16 +223,37 @@ def query_db(query, params=(), fetch=False, many=False):
             cur.execute(query, params)
         rows = cur.fetchall() if fetch else None
         conn.commit()
-        conn.close()
+        cur.close()
         return rows
     except sqlite3.Error as e:
         logger.exception("DB error")
-        try:
-            conn.close()
-        except Exception:
-            pass
+        if conn is not None:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                # Ulanish yaroqsiz holatda - keyingi chaqiruv yangisini ochadi
+                discard_connection()
         return None
 
+# Natijalar shu orqali yoziladi; main.py RESULTS_WRITE_BEHIND=1 bo'lsa threadni ishga tushiradi
+result_writer = ResultWriter(RESULTS_BATCH_SIZE, RESULTS_BATCH_WINDOW)
+
+def insert_result(student_name, username, tg_id, test_id, correct_count, incorrect_count, date=None):
+    """Test/uyga vazifa natijasini yozadi (write-behind yoqilgan bo'lsa navbat orqali)"""
+    dt = datetime.strptime(date, "%Y-%m-%d %H:%M:%S") if date else datetime.now()
+    date = dt.strftime("%Y-%m-%d %H:%M:%S")
+    result_writer.submit((student_name, username, tg_id, test_id, correct_count, incorrect_count, date, to_ts(dt)))
+
+def wait_for_user_results(tg_id):
+    """Foydalanuvchi o'z natijalarini o'qishdan oldin navbatdagi yozuvlari commit qilinishini kutadi"""
+    result_writer.wait_for_user(str(tg_id))
+
+_SAVE_PROFILE = (
+    "INSERT INTO users (chat_id, student_name, username, updated_at, name_changes) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(chat_id) DO UPDATE SET student_name = excluded.student_name, username = excluded.username, "
+    "updated_at = excluded.updated_at, name_changes = excluded.name_changes"
+)
+
 def save_profile(chat_id, student_name, username=None, name_changes=None):
     """Insert or update user profile. If name_changes is None, preserve existing value (or default 0)."""
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -207,11 +261,10 @@ def save_profile(chat_id, student_name, username=None, name_changes=None):
     existing_count = existing[0][0] if existing else 0
     if name_changes is None:
         name_changes = existing_count or 0
-    query_db(
-        "INSERT OR REPLACE INTO users (chat_id, student_name, username, updated_at, name_changes) VALUES (?, ?, ?, ?, ?)",
-        (str(chat_id), student_name, username, now, name_changes)
-    )
+    # INSERT OR REPLACE qatorni o'chirib qayta yozadi va balance ni 0 ga tushiradi - faqat profil ustunlari yangilanadi
+    query_db(_SAVE_PROFILE, (str(chat_id), student_name, username, now, name_changes))
     user_profiles[chat_id] = student_name
+    missing_profiles.pop(int(chat_id), None)
 
 def load_profile(chat_id):
     if chat_id in user_profiles:
@@ -246,48 +299,92 @@ def get_balance(chat_id):
         return int(r[0][0])
     return 0
 
-def update_user_balance(chat_id, amount):
-    """User balansini yangilaydi"""
-    current = get_balance(chat_id)
-    new_balance = current + amount
+# UPSERT + RETURNING bitta statement: parallel qo'shishlarda yangilanish yo'qolmaydi.
+# Birinchi statement yozish bo'lgani uchun tranzaksiya boshidanoq yozish qulfini oladi.
+_CREDIT_BALANCE = (
+    "INSERT INTO users (chat_id, student_name, updated_at, balance) VALUES (?, '', ?, ?) "
+    "ON CONFLICT(chat_id) DO UPDATE SET balance = COALESCE(balance, 0) + excluded.balance, "
+    "updated_at = excluded.updated_at RETURNING balance"
+)
+_LEDGER_INSERT = (
+    "INSERT INTO balance_ledger (chat_id, delta, balance_after, reason, created_at) VALUES (?, ?, ?, ?, ?)"
+)
+
+def update_user_balance(chat_id, amount, reason="credit"):
+    """User balansiga amount qo'shadi va jurnalga yozadi. Yangi balansni qaytaradi.
+
+    Xatoda sqlite3.Error ko'tariladi: chaqiruvchi "kredit yo'q" va "yozilmadi" ni farqlashi kerak.
+    """
+    chat_id = str(chat_id)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        with transaction() as conn:
+            new_balance = conn.execute(_CREDIT_BALANCE, (chat_id, now, amount)).fetchall()[0][0]
+            conn.execute(_LEDGER_INSERT, (chat_id, amount, new_balance, reason, now))
+        return new_balance
+    except sqlite3.Error:
+        logger.exception(f"Balans yangilanmadi: {chat_id} {amount:+}")
+        raise
+
+def reset_user_balance(chat_id, reason="reset"):
+    """User balansini 0 ga tushiradi; jurnalga -eski balans yoziladi"""
+    chat_id = str(chat_id)
     now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    query_db("UPDATE users SET balance = ?, updated_at = ? WHERE chat_id = ?", (new_balance, now, str(chat_id)))
-    return new_balance
+    try:
+        with transaction() as conn:
+            # Avval jurnal (yozish qulfi shu yerda olinadi), keyin users - oraliqda kredit tushib qolmaydi
+            conn.execute(
+                "INSERT INTO balance_ledger (chat_id, delta, balance_after, reason, created_at) "
+                "SELECT chat_id, -balance, 0, ?, ? FROM users WHERE chat_id = ? AND COALESCE(balance, 0) != 0",
+                (reason, now, chat_id)
+            )
+            conn.execute("UPDATE users SET balance = 0, updated_at = ? WHERE chat_id = ?", (now, chat_id))
+        return True
+    except sqlite3.Error:
+        logger.exception(f"Balans 0 ga tushirilmadi: {chat_id}")
+        return False
+
+def find_balance_mismatches():
+    """users.balance jurnal yig'indisiga teng bo'lmagan foydalanuvchilar: [(chat_id, balance, ledger_sum)]"""
+    return query_db(
+        "SELECT u.chat_id, COALESCE(u.balance, 0), COALESCE(l.total, 0) FROM users u "
+        "LEFT JOIN (SELECT chat_id, SUM(delta) AS total FROM balance_ledger GROUP BY chat_id) l "
+        "ON l.chat_id = u.chat_id WHERE COALESCE(u.balance, 0) != COALESCE(l.total, 0)",
+        fetch=True
+    ) or []
 
 def get_all_active_quizzes():
     return query_db("SELECT id, file_path, file_id, correct_answer, created_at, sent_at, hours_remaining, sent_to_users FROM quizzes WHERE active = 1 ORDER BY created_at DESC", fetch=True)
 
 def get_unsent_quiz():
     """Yuborilmagan viktorina savolini qaytaradi"""
-    quizzes = query_db("SELECT id, file_id, correct_answer, sent_to_users FROM quizzes WHERE active = 1 AND sent_to_users = 0 AND file_id IS NOT NULL AND file_id != '' ORDER BY created_at ASC LIMIT 1", fetch=True)
+    quizzes = query_db("SELECT id, file_id, correct_answer, sent_to_users FROM quizzes WHERE active = 1 AND sent_to_users = 0 AND file_id IS NOT NULL AND file_id != '' ORDER BY created_ts ASC LIMIT 1", fetch=True)
     return quizzes[0] if quizzes else None
 
 def mark_quiz_as_sent(quiz_id):
     """Viktorina savolini yuborilgan deb belgilaydi"""
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    query_db("UPDATE quizzes SET sent_to_users = 1, sent_at = ? WHERE id = ?", (now, quiz_id))
+    now = datetime.now()
+    query_db("UPDATE quizzes SET sent_to_users = 1, sent_at = ?, sent_ts = ? WHERE id = ?",
+             (now.strftime("%Y-%m-%d %H:%M:%S"), to_ts(now), quiz_id))
 
 def get_quiz_hours_remaining(quiz_id):
     """Viktorina savolini necha soat qolganini qaytaradi"""
-    result = query_db("SELECT sent_at, hours_remaining FROM quizzes WHERE id = ?", (quiz_id,), fetch=True)
+    result = query_db("SELECT sent_ts, hours_remaining FROM quizzes WHERE id = ?", (quiz_id,), fetch=True)
     if not result:
         return None
-    sent_at_str, hours_remaining = result[0]
-    if not sent_at_str:
-        return None
-    try:
-        sent_at = datetime.strptime(sent_at_str, "%Y-%m-%d %H:%M:%S")
-        now = datetime.now()
-        elapsed = (now - sent_at).total_seconds() / 3600
-        remaining = max(0, hours_remaining - elapsed)
-        return remaining
-    except Exception:
+    return quiz_hours_remaining(*result[0])
+
+def quiz_hours_remaining(sent_ts, hours_remaining):
+    """sent_ts (epoch) dan beri qolgan soatlar; yuborilmagan bo'lsa None"""
+    if not sent_ts:
         return None
+    elapsed = (time.time() - sent_ts) / 3600
+    return max(0, (hours_remaining or 0) - elapsed)
 
 def create_quiz(file_path, file_id, correct_answer):
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    now = datetime.now()
     query_db(
-        "INSERT INTO quizzes (file_path, file_id, correct_answer, active, created_at, sent_at, hours_remaining, sent_to_users) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-        (file_path, file_id, correct_answer, 1, now, None, 24, 0)
+        "INSERT INTO quizzes (file_path, file_id, correct_answer, active, created_at, created_ts, sent_at, hours_remaining, sent_to_users) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (file_path, file_id, correct_answer, 1, now.strftime("%Y-%m-%d %H:%M:%S"), to_ts(now), None, 24, 0)
     )
 
@@ -0,0 +1,129 @@
+"""Future/asyncio asosidagi DB so'rovlari.
+
+SQLite bir vaqtda faqat bitta yozuvchiga ruxsat beradi, shuning uchun
+db_executor orqali yuborilgan yozuvlar bitta `db-writer` thread orqali ketma-ket
+bajariladi; o'qishlar esa `db-read` pool'ida (har bir thread o'z ulanishi
+bilan, WAL bilan parallel).
+
+Hozir writer thread orqali o'tadiganlar: viktorina krediti va
+mark_quiz_as_sent (async), obunalar sweeper'i va state_persist. Qolgan
+yozuvlar - test natijalari (urinish raqami shu yozuvga bog'liq, keyingi
+o'qishlar uni ko'rishi kerak), profil, to'lovlar, admin amallari,
+blok/blokdan ochish, kartalar, uyga vazifa fayllari - hali
+query_db/transaction() bilan chaqiruvchi threadda bajariladi va SQLite
+busy_timeout orqali navbatga turadi.
+Handler so'rovni yuborib, Telegram I/O ni davom ettiradi va natijani keyin
+Future.result() yoki `await` orqali oladi.
+
+query_db dan farqli: xatolar yutilmaydi - Future exception bilan tugaydi.
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import DB_READ_WORKERS
+from database import get_connection, discard_connection
+
+logger = logging.getLogger(__name__)
+
+def _run_write(query, params, many, fetch):
+    conn = get_connection()
+    try:
+        cur = conn.executemany(query, params) if many else conn.execute(query, params)
+        rows = cur.fetchall() if fetch else None
+        conn.commit()
+        return rows if fetch else cur.rowcount
+    except sqlite3.Error:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            discard_connection()
+        raise
+
+def _run_read(query, params):
+    return get_connection().execute(query, params).fetchall()
+
+class DBExecutor:
+    def __init__(self, read_workers=4):
+        self.read_workers = max(1, int(read_workers))
+        self._lock = threading.Lock()
+        self._writer = None
+        self._readers = None
+        self._pending_writes = 0
+        self._writes = 0
+        self._reads = 0
+        self._write_time = 0.0
+
+    def _pools(self):
+        # Threadlar birinchi so'rovda ishga tushadi (import paytida emas)
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+                self._readers = ThreadPoolExecutor(max_workers=self.read_workers, thread_name_prefix="db-read")
+            return self._writer, self._readers
+
+    def _timed_write(self, fn, args, kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending_writes -= 1
+                self._writes += 1
+                self._write_time += time.perf_counter() - start
+
+    def _timed_read(self, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._reads += 1
+
+    def call(self, fn, *args, write=False, **kwargs):
+        """fn ni writer threadda (write=True) yoki o'qish pool'ida bajaradi -> Future"""
+        writer, readers = self._pools()
+        if write:
+            with self._lock:
+                self._pending_writes += 1
+            return writer.submit(self._timed_write, fn, args, kwargs)
+        return readers.submit(self._timed_read, fn, args, kwargs)
+
+    def read(self, query, params=()):
+        """SELECT -> Future[list[tuple]]"""
+        return self.call(_run_read, query, params)
+
+    def write(self, query, params=(), many=False, fetch=False):
+        """INSERT/UPDATE/DELETE -> Future[rowcount] (fetch=True bo'lsa RETURNING qatorlari)"""
+        return self.call(_run_write, query, params, many, fetch, write=True)
+
+    # asyncio runtime uchun
+    async def aread(self, query, params=()):
+        return await asyncio.wrap_future(self.read(query, params))
+
+    async def awrite(self, query, params=(), many=False, fetch=False):
+        return await asyncio.wrap_future(self.write(query, params, many, fetch))
+
+    async def acall(self, fn, *args, write=False, **kwargs):
+        return await asyncio.wrap_future(self.call(fn, *args, write=write, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pending_writes": self._pending_writes,
+                "writes": self._writes,
+                "reads": self._reads,
+                "avg_write_ms": round(self._write_time / self._writes * 1000, 2) if self._writes else 0,
+            }
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            writer, readers = self._writer, self._readers
+            self._writer = self._readers = None
+        for pool in (readers, writer):
+            if pool is not None:
+                pool.shutdown(wait=wait)
+
+db_executor = DBExecutor(DB_READ_WORKERS)
@@ -5,7 +5,14 @@ import logging
 from datetime import datetime
 from telebot import types
 from config import bot, ADMIN_IDS, user_state, VIDEOS_FOLDER, logger
-from database import query_db, get_balance, update_user_balance
+from router import router
+from conversation import conversation
+from database import query_db, get_balance, reset_user_balance, day_range_ts
+from catalog import get_test, invalidate_tests, test_catalog
+from subscriptions import subscription_cache, subscription_sweeper, invalidate_subscription
+from blocklist import block_list
+from cards import card_ring, MAX_WEIGHT
+from repository import get_test_results
 from utils import admin_main_menu, back_button, generate_tests_menu, generate_test_id, extract_answers, build_admin_balances
 import io
 from reportlab.lib.pagesizes import A4
@@ -15,7 +22,7 @@ from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 
-@bot.message_handler(commands=['start', 'admin'])
+@router.message_handler(commands=['start', 'admin'])
 def start(message):
     if message.from_user.id in ADMIN_IDS:
         bot.send_message(message.chat.id, "🧑‍💼 Salom, admin!", reply_markup=admin_main_menu())
@@ -28,19 +35,19 @@ def start(message):
         user_state.setdefault(message.chat.id, {})["username"] = message.from_user.username or None
     else:
         bot.send_message(message.chat.id, "Assalomu alaykum! Ism familiyangizni kiriting:")
-        user_state[message.chat.id] = {"step": "get_name", "username": message.from_user.username or None}
+        conversation.enter(message.chat.id, "get_name", username=message.from_user.username or None)
 
-@bot.message_handler(commands=['results'])
+@router.message_handler(commands=['results'])
 def results_command(message):
     if message.from_user.id not in ADMIN_IDS:
         return
     parts = message.text.split()
     if len(parts) >= 2 and parts[1].lower() in ("today", "bugun"):
-        today = datetime.now().strftime("%Y-%m-%d")
+        # Epoch oralig'i: idx_results_date_ts bo'yicha range seek, satr solishtirish yo'q
         rows = query_db(
             "SELECT student_name, username, tg_id, test_id, correct_count, incorrect_count, date "
-            "FROM results WHERE date LIKE ? ORDER BY student_name ASC, username ASC, tg_id ASC, test_id ASC, date ASC",
-            (f"{today}%",),
+            "FROM results WHERE date_ts >= ? AND date_ts < ? ORDER BY student_name ASC, username ASC, tg_id ASC, test_id ASC, date ASC",
+            day_range_ts(),
             fetch=True
         )
         if not rows:
@@ -65,33 +72,95 @@ def results_command(message):
 
         bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "➕ Test qo'shish")
+@router.message_handler(commands=['stats'])
+def stats_command(message):
+    """Ichki ko'rsatkichlar (batching va boshqalarni sozlash uchun)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    from database import result_writer
+    text = "📈 <b>Statistika</b>\n\n"
+    text += "<b>Natijalar yozuvchisi</b> (" + ("yoqilgan" if result_writer.running else "o'chirilgan") + ")\n"
+    for key, value in result_writer.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>Testlar katalogi keshi</b>\n"
+    for key, value in test_catalog.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>Obunalar keshi</b>\n"
+    for key, value in subscription_cache.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>Obunalar muddati</b>\n"
+    for key, value in subscription_sweeper.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>Bloklanganlar</b>\n"
+    for key, value in block_list.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>To'lov kartalari</b>\n"
+    for key, value in card_ring.stats().items():
+        text += f"  {key}: {value}\n"
+    from db_executor import db_executor
+    text += "\n<b>DB executor</b>\n"
+    for key, value in db_executor.stats().items():
+        text += f"  {key}: {value}\n"
+    text += "\n<b>Suhbat holatlari</b>\n"
+    for key, value in conversation.stats().items():
+        text += f"  {key}: {value}\n"
+    from state_store import stores
+    text += "\n<b>Xotiradagi holatlar</b>\n"
+    for store in stores:
+        text += f"  {store.name}: " + ", ".join(f"{k}={v}" for k, v in store.stats().items()) + "\n"
+    from state_persist import state_persister
+    if state_persister.running:
+        text += "\n<b>Holatlarni saqlash (SQLite)</b>\n"
+        for key, value in state_persister.stats().items():
+            text += f"  {key}: {value}\n"
+    from outbound import outbound
+    text += "\n<b>Chiquvchi navbat</b>\n"
+    for key, value in outbound.stats().items():
+        text += f"  {key}: {value}\n"
+    from notifications import notifier
+    text += "\n<b>Admin xabarnomalari</b>\n"
+    for key, value in notifier.stats().items():
+        text += f"  {key}: {value}\n"
+    from lanes import update_lanes
+    text += "\n<b>Update lane'lari</b>\n"
+    for key, value in update_lanes.stats().items():
+        text += f"  {key}: {value}\n"
+    import aio
+    if aio.runtime is not None:
+        text += "\n<b>Asyncio runtime</b>\n"
+        for key, value in aio.runtime.stats().items():
+            text += f"  {key}: {value}\n"
+    import webhook
+    if webhook.server is not None:
+        text += "\n<b>Webhook</b>\n"
+        for key, value in webhook.server.stats().items():
+            text += f"  {key}: {value}\n"
+    import cluster
+    if cluster.worker is not None:
+        from update_queue import update_queue
+        text += f"\n<b>Klaster</b> ({cluster.PROCESS_ID})\n"
+        for key, value in {**cluster.worker.stats(), **update_queue.stats(), **cluster.cache_versions.stats()}.items():
+            text += f"  {key}: {value}\n"
+    bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=admin_main_menu())
+
+@router.message_handler(text="➕ Test qo'shish")
 def add_test_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
     bot.send_message(message.chat.id, "🧾 Test nomini kiriting:", reply_markup=back_button())
-    user_state[message.chat.id] = {"step": "get_test_name"}
+    conversation.enter(message.chat.id, "get_test_name")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "get_test_name")
+@conversation.step("get_test_name")
 def get_test_name(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        return go_back(message)
-
     name = message.text.strip()
     if not name:
         bot.send_message(message.chat.id, "❌ Test nomi bo'sh bo'lmasligi kerak.")
         return
-    user_state[message.chat.id]["test_name"] = name
-    user_state[message.chat.id]["step"] = "get_correct_answers"
+    conversation.goto(message.chat.id, "get_correct_answers", test_name=name)
     bot.send_message(message.chat.id, "To'g'ri javoblarni kiriting (masalan: XXX 1a2b3c...):")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "get_correct_answers")
+@conversation.step("get_correct_answers")
 def save_test(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        return go_back(message)
-
     data = user_state.pop(message.chat.id, {})
     text = message.text.strip()
     if not text or not any(ch.isdigit() for ch in text):
@@ -108,13 +177,14 @@ def save_test(message):
         "INSERT OR REPLACE INTO tests (test_id, test_name, correct_answers, created_at) VALUES (?, ?, ?, ?)",
         (test_id, data.get("test_name"), correct, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
     )
+    invalidate_tests()
     bot.send_message(message.chat.id, f"✅ Test saqlandi!\n🆔 {test_id}\n📘 {data.get('test_name')}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "🗑 Testni o'chirish")
+@router.message_handler(text="🗑 Testni o'chirish")
 def delete_test_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    tests = query_db("SELECT test_id, test_name FROM tests WHERE is_homework = 0 OR is_homework IS NULL ORDER BY created_at ASC", fetch=True)
+    tests = [(t.test_id, t.test_name) for t in test_catalog.list()]
     if not tests:
         bot.send_message(message.chat.id, "📭 O'chirish uchun testlar yo'q.", reply_markup=admin_main_menu())
         return
@@ -130,20 +200,19 @@ def delete_test_start(message):
         kb.row(*row)
     kb.add("⬅️ Orqaga")
     bot.send_message(message.chat.id, "O'chirish uchun testni tanlang:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "delete_test"}
+    conversation.enter(message.chat.id, "delete_test")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "delete_test")
+@conversation.step("delete_test")
 def delete_selected_test(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        return go_back(message)
     test_id = message.text.split("(")[-1].replace(")", "").strip()
-    test = query_db("SELECT test_name FROM tests WHERE test_id = ?", (test_id,), fetch=True)
+    test = get_test(test_id)
     if not test:
         bot.send_message(message.chat.id, "❌ Test topilmadi.")
         return
     query_db("DELETE FROM tests WHERE test_id = ?", (test_id,))
+    invalidate_tests()
     query_db("DELETE FROM results WHERE test_id = ?", (test_id,))
+    query_db("DELETE FROM archive.results WHERE test_id = ?", (test_id,))
     query_db("DELETE FROM videos WHERE test_id = ?", (test_id,))
     if VIDEOS_FOLDER and os.path.isdir(VIDEOS_FOLDER):
         try:
@@ -158,11 +227,11 @@ def delete_selected_test(message):
     user_state.pop(message.chat.id, None)
     bot.send_message(message.chat.id, f"✅ Test o'chirildi!\n🆔 {test_id}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "🎬 Video qo'shish")
+@router.message_handler(text="🎬 Video qo'shish")
 def add_video_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    tests = query_db("SELECT test_id, test_name FROM tests WHERE is_homework = 0 OR is_homework IS NULL ORDER BY created_at ASC", fetch=True)
+    tests = [(t.test_id, t.test_name) for t in test_catalog.list()]
     if not tests:
         bot.send_message(message.chat.id, "📭 Hozircha testlar mavjud emas. Avval test qo'shing.", reply_markup=admin_main_menu())
         return
@@ -178,18 +247,15 @@ def add_video_start(message):
         kb.row(*row)
     kb.add("⬅️ Orqaga")
     bot.send_message(message.chat.id, "Video qo'shish uchun test tanlang:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "select_test_for_video"}
+    conversation.enter(message.chat.id, "select_test_for_video")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "select_test_for_video")
+@conversation.step("select_test_for_video")
 def select_test_for_video(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        return go_back(message)
     test_id = message.text.split("(")[-1].replace(")", "").strip()
-    user_state[message.chat.id] = {"step": "get_video_url", "test_id": test_id}
+    conversation.enter(message.chat.id, "get_video_url", test_id=test_id)
     bot.send_message(message.chat.id, "🎥 YouTube video linkini kiriting:")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "get_video_url")
+@conversation.step("get_video_url")
 def get_video_url(message):
     video_url = message.text.strip()
     chat_id = message.chat.id
@@ -209,7 +275,7 @@ def get_video_url(message):
     user_state.pop(chat_id, None)
     bot.send_message(chat_id, f"✅ YouTube link saqlandi.\n🆔 {test_id}\n🔗 {video_url}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "🗑 Videoni o'chirish")
+@router.message_handler(text="🗑 Videoni o'chirish")
 def delete_video_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
@@ -229,13 +295,10 @@ def delete_video_start(message):
         kb.row(*row)
     kb.add("⬅️ Orqaga")
     bot.send_message(message.chat.id, "O'chirish uchun videoni tanlang:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "delete_video"}
+    conversation.enter(message.chat.id, "delete_video")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "delete_video")
+@conversation.step("delete_video")
 def delete_selected_video(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        return go_back(message)
     test_id = message.text.split("(")[-1].replace(")", "").strip()
     video = query_db("SELECT video_url FROM videos WHERE test_id = ?", (test_id,), fetch=True)
     if not video:
@@ -256,12 +319,11 @@ def delete_selected_video(message):
     user_state.pop(message.chat.id, None)
     bot.send_message(message.chat.id, f"✅ Video o'chirildi.\n🆔 {test_id}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "📊 Natijalarni ko'rish")
+@router.message_handler(text="📊 Natijalarni ko'rish")
 def show_test_list(message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    tests = query_db("SELECT * FROM tests WHERE is_homework = 0 OR is_homework IS NULL", fetch=True)
-    if not tests:
+    if not test_catalog.list():
         bot.send_message(message.chat.id, "📭 Hozircha testlar mavjud emas.", reply_markup=admin_main_menu())
         return
     bot.send_message(message.chat.id, "📋 Testlar ro'yxati (bir qatorda 3ta test):", reply_markup=generate_tests_menu())
@@ -276,15 +338,15 @@ def get_score_color(correct_count):
     else:  # 25-30
         return colors.HexColor("#01F901")  # Light Green
 
-@bot.message_handler(func=lambda m: m.text == "📅 Bugungi natijalar")
+@router.message_handler(text="📅 Bugungi natijalar")
 def show_today_results(message):
     if message.from_user.id not in ADMIN_IDS:
         return
-    today = datetime.now().strftime("%Y-%m-%d")
+    # Epoch oralig'i: idx_results_date_ts bo'yicha range seek, satr solishtirish yo'q
     rows = query_db(
         "SELECT student_name, username, tg_id, test_id, correct_count, incorrect_count, date "
-        "FROM results WHERE date LIKE ? ORDER BY student_name ASC, username ASC, tg_id ASC, test_id ASC, date ASC",
-        (f"{today}%",),
+        "FROM results WHERE date_ts >= ? AND date_ts < ? ORDER BY student_name ASC, username ASC, tg_id ASC, test_id ASC, date ASC",
+        day_range_ts(),
         fetch=True
     )
     if not rows:
@@ -356,7 +418,7 @@ def show_today_results(message):
     buf.seek(0)
     bot.send_document(message.chat.id, (f"today_results_{today}.pdf", buf), reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "💰 Balans" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="💰 Balans", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_show_balances(message):
     text, kb = build_admin_balances()
     bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
@@ -405,8 +467,9 @@ def admin_update_balance(call):
     except Exception:
         pass
     
-    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    query_db("UPDATE users SET balance = 0, updated_at = ? WHERE chat_id = ?", (now, target_id))
+    if not reset_user_balance(target_id, reason=f"admin_reset:{call.from_user.id}"):
+        bot.answer_callback_query(call.id, "❌ Xatolik yuz berdi")
+        return
     bot.answer_callback_query(call.id, f"✅ Balansi 0 ga o'rnatildi")
     text, kb = build_admin_balances(current_page)
     try:
@@ -422,12 +485,12 @@ def view_test_result_callback(call):
     test_id = call.data.split(":", 1)[1]
     bot.answer_callback_query(call.id)
     
-    test = query_db("SELECT test_name FROM tests WHERE test_id = ?", (test_id,), fetch=True)
+    test = get_test(test_id)
     if not test:
         bot.send_message(call.message.chat.id, f"❌ Test topilmadi: {test_id}")
         return
     
-    results = query_db("SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM results WHERE test_id = ? ORDER BY id ASC", (test_id,), fetch=True)
+    results = query_db("SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM all_results WHERE test_id = ? ORDER BY id ASC", (test_id,), fetch=True)
     if not results:
         bot.send_message(call.message.chat.id, f"📭 Bu testni hali hech kim ishlamagan.\n🆔 {test_id}")
         return
@@ -456,7 +519,7 @@ def view_test_result_callback(call):
     doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=10*mm, rightMargin=10*mm, topMargin=15*mm, bottomMargin=15*mm)
     elements = []
     styles = getSampleStyleSheet()
-    title_text = Paragraph(f"Test natijalari: {test[0][0]} (ID: {test_id})", styles['Heading2'])
+    title_text = Paragraph(f"Test natijalari: {test.test_name} (ID: {test_id})", styles['Heading2'])
     elements.append(title_text)
     elements.append(Spacer(1, 6*mm))
     # Space for image
@@ -512,7 +575,7 @@ def back_admin_callback(call):
         pass
     bot.send_message(call.message.chat.id, "🏠 Bosh menyu", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.from_user.id in ADMIN_IDS and "(" in m.text and ")" in m.text and m.text != "⬅️ Orqaga")
+@router.message_handler(func=lambda m: m.from_user.id in ADMIN_IDS and "(" in m.text and ")" in m.text and m.text != "⬅️ Orqaga")
 def admin_view_results(message):
     # IMPORTANT: Skip ALL homework-related and quiz-related messages
     # Skip messages that start with special emojis (homework-related, quiz-related)
@@ -525,29 +588,17 @@ def admin_view_results(message):
         if state.get("step") in ["select_homework_for_results", "delete_homework", "homework_admin_menu", "delete_quiz", "quiz_menu"]:
             return
     
-    # Check if this is a homework test BEFORE processing
     test_id = message.text.split("(")[-1].replace(")", "").strip()
     
-    # First check if it's a homework test by ID format (5 digits) or database
-    if len(test_id) == 5 and test_id.isdigit():
-        # Likely a homework ID, check database
-        test = query_db("SELECT test_name, is_homework FROM tests WHERE test_id = ?", (test_id,), fetch=True)
-        if test:
-            is_homework = test[0][1] if test else False
-            if is_homework:
-                return  # Skip homework tests
-    
-    # For non-homework tests, check database
-    test = query_db("SELECT test_name, is_homework FROM tests WHERE test_id = ?", (test_id,), fetch=True)
+    test = get_test(test_id)
     if not test:
         return
     
     # Skip homework tests (they're handled in homework_handlers.py)
-    is_homework = test[0][1] if test else False
-    if is_homework:
+    if test.is_homework:
         return
     
-    results = query_db("SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM results WHERE test_id = ? ORDER BY id ASC", (test_id,), fetch=True)
+    results = get_test_results(test_id)
     if not results:
         bot.send_message(message.chat.id, f"📭 Bu testni hali hech kim ishlamagan.\n🆔 {test_id}")
         return
@@ -576,7 +627,7 @@ def admin_view_results(message):
     doc = SimpleDocTemplate(buf, pagesize=A4, leftMargin=10*mm, rightMargin=10*mm, topMargin=15*mm, bottomMargin=15*mm)
     elements = []
     styles = getSampleStyleSheet()
-    title_text = Paragraph(f"Test natijalari: {test[0][0]} (ID: {test_id})", styles['Heading2'])
+    title_text = Paragraph(f"Test natijalari: {test.test_name} (ID: {test_id})", styles['Heading2'])
     elements.append(title_text)
     elements.append(Spacer(1, 6*mm))
     # Space for image
@@ -620,27 +671,17 @@ def admin_view_results(message):
     doc.build(elements)
     buf.seek(0)
     bot.send_document(message.chat.id, (f"results_{test_id}.pdf", buf))
-def go_back(message):
-    if message.from_user.id in ADMIN_IDS:
-        bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=admin_main_menu())
-    else:
-        from utils import user_main_menu
-        bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=user_main_menu())
-    user_state.pop(message.chat.id, None)
 
 
 # ============= BLOKLASH TIZIMI =============
 
 def is_user_blocked(chat_id):
-    """Foydalanuvchi bloklangan yoki yo'q"""
-    result = query_db(
-        "SELECT id FROM blocked_users WHERE chat_id = ?",
-        (str(chat_id),),
-        fetch=True
-    )
-    return bool(result)
+    """Foydalanuvchi bloklangan yoki yo'q (block_list - xotiradan, DB'siz)"""
+    return block_list.is_blocked(chat_id)
+
+conversation.state("blocked_list")
 
-@bot.message_handler(func=lambda m: m.text == "🚫 Bloklangan foydalanuvchilar" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="🚫 Bloklangan foydalanuvchilar", func=lambda m: m.from_user.id in ADMIN_IDS)
 def show_blocked_users(message):
     """Bloklangan foydalanuvchilar ro'yxati"""
     blocked = query_db(
@@ -672,7 +713,7 @@ def show_blocked_users(message):
     kb.add(types.InlineKeyboardButton("⬅️ Orqaga", callback_data="admin_back"))
     
     bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "blocked_list"}
+    conversation.enter(message.chat.id, "blocked_list")
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("unblock_user:"))
 def unblock_user_callback(call):
@@ -696,7 +737,7 @@ def unblock_user_callback(call):
     username, student_name = blocked_info[0]
     display_name = student_name or username or chat_id
     
-    query_db("DELETE FROM blocked_users WHERE chat_id = ?", (chat_id,))
+    block_list.unblock(chat_id)
     
     # Foydalanuvchiga bildirishnoma
     try:
@@ -711,7 +752,9 @@ def unblock_user_callback(call):
     bot.answer_callback_query(call.id, f"✅ @{display_name} blokdan ochildi!", show_alert=True)
     show_blocked_users(call.message)
 
-@bot.message_handler(func=lambda m: m.text == "👥 Foydalanuvchilarni boshqarish" and m.from_user.id in ADMIN_IDS)
+conversation.state("users_list")
+
+@router.message_handler(text="👥 Foydalanuvchilarni boshqarish", func=lambda m: m.from_user.id in ADMIN_IDS)
 def manage_users_menu(message):
     """Foydalanuvchilarni boshqarish menyusi"""
     users = query_db(
@@ -738,7 +781,7 @@ def manage_users_menu(message):
     
     text = f"👥 <b>Foydalanuvchilarni Boshqarish</b>\n\nJami: {len(users)} ta\n\nFoydalanuvchini tanlang:"
     bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "users_list"}
+    conversation.enter(message.chat.id, "users_list")
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith("user_action:"))
 def user_action_menu(call):
@@ -832,16 +875,13 @@ def block_user_confirmed(call):
     student_name, username = user_info[0]
     
     # Bloklash
-    query_db(
-        "INSERT OR REPLACE INTO blocked_users (chat_id, username, student_name, blocked_at, blocked_by, reason) VALUES (?, ?, ?, ?, ?, ?)",
-        (
-            chat_id,
-            username,
-            student_name,
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            str(call.from_user.id),
-            "Admin tomonidan bloklandi"
-        )
+    block_list.block(
+        chat_id,
+        username,
+        student_name,
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        str(call.from_user.id),
+        "Admin tomonidan bloklandi"
     )
     
     # Bloklangan foydalanuvchiga bildirishnoma
@@ -917,16 +957,13 @@ def quick_block_user(call):
         student_name, username = user_info[0]
         
         # Bloklash
-        query_db(
-            "INSERT OR REPLACE INTO blocked_users (chat_id, username, student_name, blocked_at, blocked_by, reason) VALUES (?, ?, ?, ?, ?, ?)",
-            (
-                user_id,
-                username,
-                student_name,
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                str(call.from_user.id),
-                "Test/Uyga vazifa natijasidan tezkor bloklash"
-            )
+        block_list.block(
+            user_id,
+            username,
+            student_name,
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            str(call.from_user.id),
+            "Test/Uyga vazifa natijasidan tezkor bloklash"
         )
         
         # Bloklangan foydalanuvchiga bildirishnoma
@@ -954,21 +991,13 @@ def quick_block_user(call):
 
 def get_db_id_by_visible_id(visible_id):
     """Ko'rinadigan ID (1, 2, 3...) ni DB ID ga o'girish"""
-    active_cards = query_db(
-        "SELECT id FROM bot_cards WHERE is_active = 1 ORDER BY id ASC",
-        fetch=True
-    ) or []
-    
-    if visible_id <= 0 or visible_id > len(active_cards):
-        return None
-    
-    return active_cards[visible_id - 1][0]  # visible_id 1-based, list 0-based
+    return card_ring.db_id(visible_id)
 
-@bot.message_handler(func=lambda m: m.text == "💳 Kartalarni boshqarish" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="💳 Kartalarni boshqarish", func=lambda m: m.from_user.id in ADMIN_IDS)
 def manage_bot_cards_menu(message):
     """Bot kartalarini boshqarish menyusi"""
     cards = query_db(
-        "SELECT id, card_number, card_owner, bank_name, is_active FROM bot_cards ORDER BY is_active DESC",
+        "SELECT id, card_number, card_owner, bank_name, is_active, weight FROM bot_cards ORDER BY is_active DESC, id ASC",
         fetch=True
     ) or []
     
@@ -983,17 +1012,18 @@ def manage_bot_cards_menu(message):
     text = "💳 <b>Bot Kartalar</b>\n\n"
     
     # Faol kartalarni alohida ko'rsatish
-    active_cards = [(idx, card_id, card_num, owner, bank) for idx, (card_id, card_num, owner, bank, is_active) in enumerate(cards, 1) if is_active]
-    inactive_cards = [(card_id, card_num, owner, bank, is_active) for card_id, card_num, owner, bank, is_active in cards if not is_active]
+    active_cards = [(idx, card_id, card_num, owner, bank, weight) for idx, (card_id, card_num, owner, bank, is_active, weight) in enumerate(cards, 1) if is_active]
+    inactive_cards = [(card_id, card_num, owner, bank, is_active) for card_id, card_num, owner, bank, is_active, weight in cards if not is_active]
     
     # Faol kartalarni ko'rinadigan ID bilan ko'rsatish
     if active_cards:
         text += "✅ <b>Faol Kartalar:</b>\n\n"
-        for visible_id, card_id, card_num, owner, bank in active_cards:
+        for visible_id, card_id, card_num, owner, bank, weight in active_cards:
             text += f"🆔 <b>Karta ID: {visible_id}</b>\n"
             text += f"🏦 {bank}\n"
             text += f"💳 {card_num}\n"
             text += f"👤 {owner}\n"
+            text += f"⚖️ Vazn: {weight}\n"
             
 
     
@@ -1008,9 +1038,10 @@ def manage_bot_cards_menu(message):
             
 
     
+    text += f"\n⚖️ Vazn (1-{MAX_WEIGHT}): /card_weight ID N - vazni katta karta ko'proq o'quvchiga beriladi"
     bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=admin_main_menu())
 
-@bot.message_handler(commands=['add_card'])
+@router.message_handler(commands=['add_card'])
 def add_card_command(message):
     """Yangi karta qo'shish: /add_card XXXXXX XXXXXX XXXXXX XXXXXX Egasi Bank"""
     if message.from_user.id not in ADMIN_IDS:
@@ -1033,17 +1064,11 @@ def add_card_command(message):
         card_owner = " ".join(parts[5:-1])
         bank_name = parts[-1]
         
-        query_db(
-            "INSERT INTO bot_cards (card_number, card_owner, bank_name) VALUES (?, ?, ?)",
-            (card_number, card_owner, bank_name)
-        )
+        card_id = card_ring.add(card_number, card_owner, bank_name)
         
-        # Faol kartalar sonini hisoblash (ko'rinadigan ID uchun)
-        active_count = query_db(
-            "SELECT COUNT(*) FROM bot_cards WHERE is_active = 1",
-            fetch=True
-        )
-        visible_id = active_count[0][0] if active_count else 1
+        # Ko'rinadigan ID - faol kartalar orasidagi o'rni
+        card = card_ring.find(card_id)
+        visible_id = card.visible_id if card else len(card_ring.cards())
         
         text = f"✅ <b>Karta qo'shildi!</b>\n\n"
         text += f"🆔 <b>Karta ID:</b> {visible_id}\n"
@@ -1056,7 +1081,7 @@ def add_card_command(message):
         logger.exception(f"Add card error: {e}")
         bot.send_message(message.chat.id, f"❌ Xato: {str(e)}", reply_markup=admin_main_menu())
 
-@bot.message_handler(commands=['toggle_card'])
+@router.message_handler(commands=['toggle_card'])
 def toggle_card_status(message):
     """Karta statusini o'zgartirish: /toggle_card ID (ko'rinadigan ID yoki DB ID)"""
     if message.from_user.id not in ADMIN_IDS:
@@ -1091,7 +1116,7 @@ def toggle_card_status(message):
         card_num = card[0][1]
         new_status = 0 if current_status == 1 else 1
         
-        query_db("UPDATE bot_cards SET is_active = ? WHERE id = ?", (new_status, db_id))
+        card_ring.set_active(db_id, new_status)
         
         status_text = "✅ Faol" if new_status else "❌ Faol emas"
         text = f"✅ <b>Karta {status_text} bo'ldi</b>\n\n"
@@ -1102,7 +1127,7 @@ def toggle_card_status(message):
         logger.exception(f"Toggle card error: {e}")
         bot.send_message(message.chat.id, f"❌ Xato: {str(e)}", reply_markup=admin_main_menu())
 
-@bot.message_handler(commands=['delete_card'])
+@router.message_handler(commands=['delete_card'])
 def delete_card_command(message):
     """Kartani o'chirish: /delete_card ID (ko'rinadigan ID yoki DB ID)"""
     if message.from_user.id not in ADMIN_IDS:
@@ -1133,7 +1158,7 @@ def delete_card_command(message):
             bot.send_message(message.chat.id, "❌ Karta topilmadi")
             return
         
-        query_db("DELETE FROM bot_cards WHERE id = ?", (db_id,))
+        card_ring.delete(db_id)
         
         text = f"✅ <b>Karta o'chirildi</b>\n\n"
         text += f"💳 Karta: {card[0][0]}"
@@ -1143,16 +1168,63 @@ def delete_card_command(message):
         logger.exception(f"Delete card error: {e}")
         bot.send_message(message.chat.id, f"❌ Xato: {str(e)}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "✅ Active users" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(commands=['card_weight'])
+def card_weight_command(message):
+    """Karta vaznini o'zgartirish: /card_weight ID N (ko'rinadigan ID yoki DB ID)"""
+    if message.from_user.id not in ADMIN_IDS:
+        return
+    
+    try:
+        parts = message.text.split()
+        if len(parts) < 3:
+            bot.send_message(message.chat.id, f"❌ Format: /card_weight ID N (N = 1-{MAX_WEIGHT})")
+            return
+        
+        input_id = int(parts[1])
+        weight = int(parts[2])
+        if not 1 <= weight <= MAX_WEIGHT:
+            bot.send_message(message.chat.id, f"❌ Vazn 1 dan {MAX_WEIGHT} gacha bo'lishi kerak")
+            return
+        
+        # Avval ko'rinadigan ID sifatida tekshirish
+        db_id = get_db_id_by_visible_id(input_id)
+        
+        # Agar ko'rinadigan ID bo'lmasa, DB ID sifatida tekshirish
+        if db_id is None:
+            db_id = input_id
+        
+        card = query_db(
+            "SELECT card_number FROM bot_cards WHERE id = ?",
+            (db_id,),
+            fetch=True
+        )
+        
+        if not card:
+            bot.send_message(message.chat.id, "❌ Karta topilmadi")
+            return
+        
+        card_ring.set_weight(db_id, weight)
+        
+        text = f"✅ <b>Karta vazni: {weight}</b>\n\n"
+        text += f"💳 Karta: {card[0][0]}"
+        
+        bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=admin_main_menu())
+    except Exception as e:
+        logger.exception(f"Card weight error: {e}")
+        bot.send_message(message.chat.id, f"❌ Xato: {str(e)}", reply_markup=admin_main_menu())
+
+@router.message_handler(text="✅ Active users", func=lambda m: m.from_user.id in ADMIN_IDS)
 def show_active_users(message):
     """Active users ro'yxatini ko'rsatish"""
     try:
+        # Keyingi fon tekshiruvini kutmasdan muddati o'tganlarni chiqaramiz
+        subscription_sweeper.sweep()
         # Faol obunachilarni olish
         active_users = query_db(
             """SELECT s.user_id, s.username, s.student_name, s.start_date, s.end_date, s.payment_id
                FROM subscriptions s
                WHERE s.is_active = 1
-               ORDER BY s.end_date DESC""",
+               ORDER BY s.end_ts DESC""",
             fetch=True
         ) or []
         
@@ -1200,6 +1272,7 @@ def deactivate_subscription_callback(call):
             "UPDATE subscriptions SET is_active = 0 WHERE user_id = ?",
             (user_id,)
         )
+        invalidate_subscription(user_id)
         
         # Foydalanuvchiga xabar yuborish
         try:
@@ -1232,7 +1305,7 @@ def deactivate_subscription_callback(call):
             """SELECT s.user_id, s.username, s.student_name, s.start_date, s.end_date, s.payment_id
                FROM subscriptions s
                WHERE s.is_active = 1
-               ORDER BY s.end_date DESC""",
+               ORDER BY s.end_ts DESC""",
             fetch=True
         ) or []
         
@@ -3,15 +3,22 @@ import logging
 from datetime import datetime
 from telebot import types
 from config import bot, ADMIN_IDS, user_state
-from database import query_db, load_profile
+from router import router
+from conversation import conversation
+from notifications import notifier
+from database import query_db, insert_result, wait_for_user_results
+from catalog import get_test, invalidate_tests, test_catalog
+from access import access
+from repository import get_test_results, get_user_results, get_user_attempts
 from utils import user_main_menu, admin_main_menu, back_button, generate_homework_id
 
 logger = logging.getLogger(__name__)
 
 def require_payment(message):
     """To'lov tekshiruv funksiyasi - agar to'lov qilmagan bo'lsa True qaytaradi va xabar yuboradi"""
+    ctx = access(message)
     # Adminlar uchun ruxsat
-    if message.from_user.id in ADMIN_IDS:
+    if ctx.is_admin:
         return False
     
     # To'lov menyusiga ruxsat
@@ -19,10 +26,7 @@ def require_payment(message):
         return False
     
     # Obunani tekshirish
-    from handlers.payment_handlers import check_subscription
-    sub = check_subscription(str(message.from_user.id))
-    
-    if not sub["active"]:
+    if not ctx.active:
         text = "❌ <b>To'lov qilmagansiz!</b>\n\n"
         text += "Iltimos, hisobingizni to'ldiring.\n"
         text += "💰 Oylik to'lov: 15,000 so'm\n\n"
@@ -47,34 +51,32 @@ def require_payment(message):
 
 # ==================== USER HANDLERS ====================
 
-@bot.message_handler(func=lambda m: m.text == "📝 Uyga vazifa" and m.from_user and m.from_user.id not in ADMIN_IDS)
+conversation.state("homework_menu")
+
+def send_user_homework_menu(chat_id):
+    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
+    kb.add("📊 Uyga vazifa natijalari", "📝 Uyga vazifa topshirish")
+    kb.add("⬅️ Orqaga")
+    bot.send_message(chat_id, "📝 Uyga vazifa bo'limi:", reply_markup=kb)
+    conversation.enter(chat_id, "homework_menu")
+
+@router.message_handler(text="📝 Uyga vazifa", func=lambda m: m.from_user and m.from_user.id not in ADMIN_IDS)
 def user_homework_menu(message):
     if require_payment(message):
         return
     try:
-        kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-        kb.add("📊 Uyga vazifa natijalari", "📝 Uyga vazifa topshirish")
-        kb.add("⬅️ Orqaga")
-        bot.send_message(message.chat.id, "📝 Uyga vazifa bo'limi:", reply_markup=kb)
-
-        user_state[message.chat.id] = {"step": "homework_menu"}
+        send_user_homework_menu(message.chat.id)
     except Exception as e:
         logger.exception(f"Error in user_homework_menu: {e}")
         bot.send_message(message.chat.id, "❌ Xatolik yuz berdi. Iltimos qayta urinib ko'ring.", reply_markup=user_main_menu())
 
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and m.chat.id in user_state and user_state[m.chat.id].get("step") == "homework_menu")
-def back_from_homework_menu(message):
-    user_state.pop(message.chat.id, None)
-    bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=user_main_menu())
-
-@bot.message_handler(func=lambda m: m.text == "📝 Uyga vazifa topshirish" and m.from_user.id not in ADMIN_IDS)
+@router.message_handler(text="📝 Uyga vazifa topshirish", func=lambda m: m.from_user.id not in ADMIN_IDS)
 def submit_homework_start(message):
     if require_payment(message):
         return
     
     # Blok tekshirish
-    from handlers.admin_handlers import is_user_blocked
-    if is_user_blocked(message.from_user.id):
+    if access(message).blocked:
         bot.send_message(
             message.chat.id,
             "❌ <b>Qora ro'yxatdagi shaxsiz</b>\n\nSiz qora ro'yxatga kiritildingiz.\nAdmin bilan bog'lanib qaytadan urinib ko'ring!.\n\n@math_3322",
@@ -84,38 +86,23 @@ def submit_homework_start(message):
         return
     
     bot.send_message(message.chat.id, "🆔 Uyga vazifa ID va javoblaringizni kiriting:\nFormat: <b>12345 1a2a3a4b5c...30a</b>\nMasalan: <b>12345 1a2b3c4d5e...30a</b>", parse_mode="HTML", reply_markup=back_button())
-    user_state[message.chat.id] = {"step": "submit_homework"}
-
+    conversation.enter(message.chat.id, "submit_homework")
 
-# Handler for back button during homework submission - must be registered before process_homework_answers
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and 
-                     m.chat.id in user_state and user_state[m.chat.id].get("step") == "submit_homework")
 def back_from_submit_homework(message):
-    user_state.pop(message.chat.id, None)
-    # Navigate back to homework menu
-    kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
-    kb.add("📊 Uyga vazifa natijalari", "📝 Uyga vazifa topshirish")
-    kb.add("⬅️ Orqaga")
-    bot.send_message(message.chat.id, "📝 Uyga vazifa bo'limi:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "homework_menu"}
+    # Uyga vazifa bo'limiga qaytish
+    send_user_homework_menu(message.chat.id)
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "submit_homework")
+@conversation.step("submit_homework", back=back_from_submit_homework, timeout=3600)
 def process_homework_answers(message):
-    # Skip if this is the back button (handled by separate handler above)
-    if message.text == "⬅️ Orqaga":
-        return
-    
     # To'lov tekshirish (state-based handler uchun)
-    if message.from_user.id not in ADMIN_IDS:
-        from handlers.payment_handlers import check_subscription
-        sub = check_subscription(str(message.from_user.id))
-        if not sub["active"]:
-            text = "❌ <b>To'lov qilmagansiz!</b>\n\nIltimos, hisobingizni to'ldiring.\n💰 Oylik to'lov: 15,000 so'm\n\nTo'lov qilish uchun pastdagi tugmani bosing."
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("💳 Hisobni to'ldirish", callback_data="topup_account"))
-            bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
-            user_state.pop(message.chat.id, None)
-            return
+    ctx = access(message)
+    if not ctx.is_admin and not ctx.active:
+        text = "❌ <b>To'lov qilmagansiz!</b>\n\nIltimos, hisobingizni to'ldiring.\n💰 Oylik to'lov: 15,000 so'm\n\nTo'lov qilish uchun pastdagi tugmani bosing."
+        kb = types.InlineKeyboardMarkup()
+        kb.add(types.InlineKeyboardButton("💳 Hisobni to'ldirish", callback_data="topup_account"))
+        bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
+        user_state.pop(message.chat.id, None)
+        return
     
     text = message.text.strip()
     
@@ -127,18 +114,20 @@ def process_homework_answers(message):
     homework_id = parts[0].strip()
     answers_text = parts[1].strip()
     
-    test = query_db("SELECT test_name, correct_answers FROM tests WHERE test_id = ? AND is_homework = 1", (homework_id,), fetch=True)
-    if not test:
+    test = get_test(homework_id)
+    if not test or test.is_homework != 1:
         bot.send_message(message.chat.id, "❌ Bunday uyga vazifa topilmadi. ID ni tekshirib qayta kiriting.")
         return
     
-    homework_name = test[0][0]
-    correct_answers_str = test[0][1]
+    homework_name = test.test_name
+    correct_answers_str = test.correct_answers
     
     username = message.from_user.username or None
     tg_id = str(message.from_user.id)
+    # Navbatdagi (hali yozilmagan) topshiriq ham hisobga olinishi kerak
+    wait_for_user_results(tg_id)
     existing_result = query_db(
-        "SELECT COUNT(*) FROM results WHERE (username = ? OR tg_id = ?) AND test_id = ?",
+        "SELECT COUNT(*) FROM all_results WHERE (username = ? OR tg_id = ?) AND test_id = ?",
         (username, tg_id, homework_id),
         fetch=True
     )
@@ -191,14 +180,11 @@ def process_homework_answers(message):
     
     incorrect = total_questions - correct
     
-    student_name = load_profile(message.chat.id) or "Unknown"
+    student_name = ctx.student_name or "Unknown"
     username = message.from_user.username or None
     tg_id = str(message.from_user.id)
     
-    query_db(
-        "INSERT INTO results (student_name, username, tg_id, test_id, correct_count, incorrect_count, date) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        (student_name, username, tg_id, homework_id, correct, incorrect, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-    )
+    insert_result(student_name, username, tg_id, homework_id, correct, incorrect)
     
     result_text = f"📊 <b>Uyga vazifa natijangiz:</b>\n"
     result_text += f"🆔 ID: {homework_id}\n"
@@ -217,58 +203,30 @@ def process_homework_answers(message):
     user_display = f"@{username}" if username else f"tg:{tg_id}"
     admin_caption = f"📥 Uyga vazifa topshirildi:\n🧑‍🎓 {student_name}\n🆔 {homework_id}\n✅ {correct} | ❌ {incorrect}\n{user_display}"
     
-    for admin in ADMIN_IDS:
-        try:
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("🚫 Bloklash", callback_data=f"quick_block:{message.from_user.id}"))
-            bot.send_message(admin, admin_caption, reply_markup=kb)
-        except Exception as e:
-            logger.exception(f"Send to admin error: {e}")
+    line = f"📚 {student_name} ({user_display}) — {homework_id}: ✅ {correct} | ❌ {incorrect}"
+    notifier.submission(message.from_user.id, student_name, admin_caption, line)
     
     user_state.pop(message.chat.id, None)
 
-@bot.message_handler(func=lambda m: m.text == "📊 Uyga vazifa natijalari" and m.from_user.id not in ADMIN_IDS)
+@router.message_handler(text="📊 Uyga vazifa natijalari", func=lambda m: m.from_user.id not in ADMIN_IDS)
 def show_homework_results(message):
     if require_payment(message):
         return
     username = message.from_user.username or None
     tg_id = str(message.from_user.id)
+    wait_for_user_results(tg_id)
     
-    all_results = query_db(
-        """SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.is_homework
-            FROM results r 
-            LEFT JOIN tests t ON r.test_id = t.test_id 
-            WHERE (r.username = ? OR r.tg_id = ?) 
-            ORDER BY r.date DESC""",
-        (username, tg_id),
-        fetch=True
-    ) or []
-    
-    results = []
-    for r in all_results:
-        test_id = str(r[0])
-        is_homework = r[4] if len(r) > 4 else None
-        is_homework_test = (is_homework == 1) or (len(test_id) == 5 and test_id.isdigit())
-        if is_homework_test:
-            results.append((r[0], r[1], r[2], r[3]))
+    # Test nomlari ham shu so'rovda keladi (har bir test uchun alohida so'rov yo'q)
+    grouped_results = get_user_attempts(tg_id, username, homework=True, recent_first=True)
     
-    if not results:
+    if not grouped_results:
         bot.send_message(message.chat.id, "📭 Siz hali uyga vazifalarni topshirmadingiz.", reply_markup=user_main_menu())
         return
     
     text = "📊 <b>Sizning uyga vazifa natijalaringiz:</b>\n\n"
     
-    grouped_results = {}
-    for r in results:
-        test_id, correct, incorrect, date = r
-        if test_id not in grouped_results:
-            grouped_results[test_id] = []
-        grouped_results[test_id].append((correct, incorrect, date))
-    
-    for test_id, attempts in grouped_results.items():
-        test_name = query_db("SELECT test_name FROM tests WHERE test_id = ?", (test_id,), fetch=True)
-        test_name = test_name[0][0] if test_name else "Noma'lum"
-        
+    for test_id, (test_name, attempts) in grouped_results.items():
+        test_name = test_name or "Noma'lum"
         text += f"<b>🆔 {test_id}</b> - {test_name}\n"
         for attempt_num, (correct, incorrect, date) in enumerate(attempts, 1):
             total = correct + incorrect
@@ -284,54 +242,37 @@ def show_homework_results(message):
 
 # ==================== ADMIN HANDLERS ====================
 
-@bot.message_handler(func=lambda m: m.text == "📝 Uyga vazifa boshqaruvi" and m.from_user.id in ADMIN_IDS)
+conversation.state("homework_admin_menu")
+
+@router.message_handler(text="📝 Uyga vazifa boshqaruvi", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_homework_menu(message):
     kb = types.ReplyKeyboardMarkup(resize_keyboard=True)
     kb.add("➕ Uyga vazifa qo'shish", "📊 Uyga vazifa natijalari")
     kb.add("🗑 Uyga vazifa o'chirish", "⬅️ Orqaga")
     bot.send_message(message.chat.id, "📝 Uyga vazifa boshqaruvi:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "homework_admin_menu"}
+    conversation.enter(message.chat.id, "homework_admin_menu")
 
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and m.chat.id in user_state and user_state[m.chat.id].get("step") == "homework_admin_menu")
-def back_from_homework_admin_menu(message):
-    if message.from_user.id not in ADMIN_IDS:
-        return
-    user_state.pop(message.chat.id, None)
-    from handlers.admin_handlers import go_back
-    go_back(message)
-
-@bot.message_handler(func=lambda m: m.text == "📝 Uyga vazifa" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="📝 Uyga vazifa", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_add_homework_shortcut(message):
     admin_homework_menu(message)
 
-@bot.message_handler(func=lambda m: m.text == "➕ Uyga vazifa qo'shish" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="➕ Uyga vazifa qo'shish", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_add_homework_start(message):
     bot.send_message(message.chat.id, "📚 Uyga vazifa nomini kiriting:", reply_markup=back_button())
-    user_state[message.chat.id] = {"step": "get_homework_name"}
+    conversation.enter(message.chat.id, "get_homework_name")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "get_homework_name")
+@conversation.step("get_homework_name", back=admin_homework_menu)
 def get_homework_name(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        admin_homework_menu(message)
-        return
-    
     name = message.text.strip()
     if not name:
         bot.send_message(message.chat.id, "❌ Uyga vazifa nomi bo'sh bo'lmasligi kerak.")
         return
     
-    user_state[message.chat.id]["homework_name"] = name
-    user_state[message.chat.id]["step"] = "get_homework_answers"
+    conversation.goto(message.chat.id, "get_homework_answers", homework_name=name)
     bot.send_message(message.chat.id, "📝 To'g'ri javoblarni kiriting:\nFormat: <b>1a2a3a4b5c...30a</b> (30 ta javob)", parse_mode="HTML", reply_markup=back_button())
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "get_homework_answers")
+@conversation.step("get_homework_answers", back=admin_homework_menu)
 def save_homework(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        admin_homework_menu(message)
-        return
-    
     data = user_state.get(message.chat.id, {})
     text = message.text.strip()
     
@@ -364,6 +305,7 @@ def save_homework(message):
         "INSERT OR REPLACE INTO tests (test_id, test_name, correct_answers, created_at, is_homework) VALUES (?, ?, ?, ?, ?)",
         (homework_id, data.get("homework_name"), correct_answers, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 1)
     )
+    invalidate_tests()
     
     user_state.pop(message.chat.id, None)
     bot.send_message(
@@ -373,10 +315,10 @@ def save_homework(message):
         reply_markup=admin_main_menu()
     )
 
-@bot.message_handler(func=lambda m: m.text == "📊 Uyga vazifa natijalari" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="📊 Uyga vazifa natijalari", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_show_homework_results(message):
     try:
-        homeworks = query_db("SELECT test_id, test_name FROM tests WHERE is_homework = 1 ORDER BY created_at DESC", fetch=True) or []
+        homeworks = [(t.test_id, t.test_name) for t in reversed(test_catalog.list(homework=True))]
         
         if not homeworks:
             bot.send_message(message.chat.id, "📭 Hozircha uyga vazifalar mavjud emas.", reply_markup=admin_main_menu())
@@ -387,18 +329,13 @@ def admin_show_homework_results(message):
             kb.add(f"📊 {hw_name} ({hw_id})")
         kb.add("⬅️ Orqaga")
         bot.send_message(message.chat.id, "Natijalarini ko'rish uchun uyga vazifani tanlang:", reply_markup=kb)
-        user_state[message.chat.id] = {"step": "select_homework_for_results"}
+        conversation.enter(message.chat.id, "select_homework_for_results")
     except Exception as e:
         logger.exception(f"Error in admin_show_homework_results: {e}")
         bot.send_message(message.chat.id, f"❌ Xatolik yuz berdi: {str(e)}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "select_homework_for_results" and m.from_user.id in ADMIN_IDS)
+@conversation.step("select_homework_for_results", back=admin_homework_menu, func=lambda m: m.from_user.id in ADMIN_IDS)
 def show_homework_results_details(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        admin_homework_menu(message)
-        return
-    
     # Check if message starts with 📊 (homework results button)
     if not message.text.startswith("📊"):
         bot.send_message(message.chat.id, "❌ Noto'g'ri tanlov.", reply_markup=admin_main_menu())
@@ -413,19 +350,15 @@ def show_homework_results_details(message):
     
     homework_id = match.group(1)
     
-    results = query_db(
-        "SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM results WHERE test_id = ? ORDER BY date DESC",
-        (homework_id,),
-        fetch=True
-    ) or []
+    results = get_test_results(homework_id, recent_first=True)
     
     if not results:
         bot.send_message(message.chat.id, f"📭 Bu uyga vazifani hali hech kim ishlamagan.\n🆔 {homework_id}", reply_markup=admin_main_menu())
         user_state.pop(message.chat.id, None)
         return
     
-    test_info = query_db("SELECT test_name FROM tests WHERE test_id = ?", (homework_id,), fetch=True)
-    test_name = test_info[0][0] if test_info else "Noma'lum"
+    test = get_test(homework_id)
+    test_name = test.test_name if test else "Noma'lum"
     
     text = f"📊 <b>Uyga vazifa natijalari</b>\n"
     text += f"📘 Nomi: {test_name}\n"
@@ -465,10 +398,10 @@ def show_homework_results_details(message):
     bot.send_message(message.chat.id, text, parse_mode="HTML", reply_markup=kb)
     user_state.pop(message.chat.id, None)
 
-@bot.message_handler(func=lambda m: m.text == "🗑 Uyga vazifa o'chirish" and m.from_user.id in ADMIN_IDS)
+@router.message_handler(text="🗑 Uyga vazifa o'chirish", func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_delete_homework_start(message):
     try:
-        homeworks = query_db("SELECT test_id, test_name FROM tests WHERE is_homework = 1 ORDER BY created_at DESC", fetch=True) or []
+        homeworks = [(t.test_id, t.test_name) for t in reversed(test_catalog.list(homework=True))]
         
         if not homeworks:
             bot.send_message(message.chat.id, "📭 O'chirish uchun uyga vazifalar yo'q.", reply_markup=admin_main_menu())
@@ -479,18 +412,13 @@ def admin_delete_homework_start(message):
             kb.add(f"🗑 {hw_name} ({hw_id})")
         kb.add("⬅️ Orqaga")
         bot.send_message(message.chat.id, "O'chirish uchun uyga vazifani tanlang:", reply_markup=kb)
-        user_state[message.chat.id] = {"step": "delete_homework"}
+        conversation.enter(message.chat.id, "delete_homework")
     except Exception as e:
         logger.exception(f"Error in admin_delete_homework_start: {e}")
         bot.send_message(message.chat.id, f"❌ Xatolik yuz berdi: {str(e)}", reply_markup=admin_main_menu())
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "delete_homework" and m.from_user.id in ADMIN_IDS)
+@conversation.step("delete_homework", back=admin_homework_menu, func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_delete_selected_homework(message):
-    if message.text == "⬅️ Orqaga":
-        user_state.pop(message.chat.id, None)
-        admin_homework_menu(message)
-        return
-    
     # Check if message starts with 🗑 (delete homework button)
     if not message.text.startswith("🗑"):
         bot.send_message(message.chat.id, "❌ Noto'g'ri tanlov.", reply_markup=admin_main_menu())
@@ -505,14 +433,16 @@ def admin_delete_selected_homework(message):
     
     homework_id = match.group(1)
     
-    test = query_db("SELECT test_name FROM tests WHERE test_id = ? AND is_homework = 1", (homework_id,), fetch=True)
-    if not test:
+    test = get_test(homework_id)
+    if not test or test.is_homework != 1:
         bot.send_message(message.chat.id, "❌ Bunday uyga vazifa topilmadi yoki uyga vazifa emas.", reply_markup=admin_main_menu())
         user_state.pop(message.chat.id, None)
         return
     
     query_db("DELETE FROM tests WHERE test_id = ? AND is_homework = 1", (homework_id,))
+    invalidate_tests()
     query_db("DELETE FROM results WHERE test_id = ?", (homework_id,))
+    query_db("DELETE FROM archive.results WHERE test_id = ?", (homework_id,))
     query_db("DELETE FROM videos WHERE test_id = ?", (homework_id,))
     
     user_state.pop(message.chat.id, None)
@@ -530,7 +460,7 @@ def handle_download_hw_pdf(call):
             return
         
         results = query_db(
-            "SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM results WHERE test_id = ? ORDER BY date DESC",
+            "SELECT student_name, username, tg_id, correct_count, incorrect_count, date FROM all_results WHERE test_id = ? ORDER BY date DESC",
             (homework_id,),
             fetch=True
         ) or []
@@ -539,8 +469,8 @@ def handle_download_hw_pdf(call):
             bot.answer_callback_query(call.id, "❌ Natijalar topilmadi!", show_alert=True)
             return
         
-        test_info = query_db("SELECT test_name FROM tests WHERE test_id = ?", (homework_id,), fetch=True)
-        test_name = test_info[0][0] if test_info else "Noma'lum"
+        test = get_test(homework_id)
+        test_name = test.test_name if test else "Noma'lum"
         
         from pdf_generator import create_homework_results_pdf
         pdf_bytes = create_homework_results_pdf(test_name, homework_id, results)
@@ -567,30 +497,18 @@ def handle_download_student_hw_pdf(call):
     try:
         username = call.from_user.username or None
         tg_id = str(call.from_user.id)
+        wait_for_user_results(tg_id)
         
-        all_results = query_db(
-            """SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.test_name, t.is_homework
-                FROM results r 
-                LEFT JOIN tests t ON r.test_id = t.test_id 
-                WHERE (r.username = ? OR r.tg_id = ?) 
-                ORDER BY r.date DESC""",
-            (username, tg_id),
-            fetch=True
-        ) or []
-        
-        homework_results = []
-        for r in all_results:
-            test_id = str(r[0])
-            is_homework = r[5] if len(r) > 5 else None
-            is_homework_test = (is_homework == 1) or (len(test_id) == 5 and test_id.isdigit())
-            if is_homework_test:
-                homework_results.append((r[4] or "Noma'lum", r[0], r[1], r[2], r[3]))
+        homework_results = [
+            (r.test_name or "Noma'lum", r.test_id, r.correct_count, r.incorrect_count, r.date)
+            for r in get_user_results(tg_id, username, recent_first=True) if r.is_homework_test
+        ]
         
         if not homework_results:
             bot.answer_callback_query(call.id, "❌ Hali uyga vazifa natijalari yo'q!", show_alert=True)
             return
         
-        student_name = load_profile(call.from_user.id) or f"Student_{call.from_user.id}"
+        student_name = access(call).student_name or f"Student_{call.from_user.id}"
         
         from pdf_generator import create_student_homework_results_pdf
         pdf_bytes = create_student_homework_results_pdf(student_name, homework_results)
@@ -1,109 +1,49 @@
 import logging
+import time
 from datetime import datetime, timedelta
 from telebot import types
 from config import bot, ADMIN_IDS, user_state
-from database import query_db
+from router import router
+from conversation import conversation
+from notifications import notifier
+from cluster import forget_state
+from subscriptions import invalidate_subscription
+from access import access, load_access
+from cards import card_ring
+from database import query_db, to_ts
 
 logger = logging.getLogger(__name__)
 
 WAITING_CONFIRMATION = "waiting_confirmation"
 
+# Foydalanuvchi pul o'tkazib "Pul tashladim" tugmasini bosishini kutmoqda
+conversation.state("waiting_payment_confirmation", timeout=86400)
+
 def get_active_card():
     """Faol karta raqamini olish (eski funksiya - orqaga moslik uchun)"""
-    result = query_db(
-        "SELECT card_number, card_owner, bank_name FROM bot_cards WHERE is_active = 1 LIMIT 1",
-        fetch=True
-    )
-    return result[0] if result else None
+    cards = card_ring.cards()
+    return (cards[0].card_number, cards[0].card_owner, cards[0].bank_name) if cards else None
 
 def get_active_cards():
     """Barcha faol kartalarni olish"""
-    result = query_db(
-        "SELECT id, card_number, card_owner, bank_name FROM bot_cards WHERE is_active = 1 ORDER BY id ASC",
-        fetch=True
-    )
-    return result if result else []
+    return [(c.id, c.card_number, c.card_owner, c.bank_name) for c in card_ring.cards()]
 
 def get_card_for_user(user_id):
-    """User ID ga qarab toq/juft aniqlash va tegishli kartani qaytarish"""
-    active_cards = get_active_cards()
-    
-    if not active_cards:
-        return None
-    
-    if len(active_cards) == 1:
-        # Agar faqat bitta karta bo'lsa, uni qaytarish
-        card = active_cards[0]
-        return {
-            "id": card[0],
-            "visible_id": 1,  # Ko'rinadigan ID
-            "card_number": card[1],
-            "card_owner": card[2],
-            "bank_name": card[3]
-        }
-    
-    # User ID ni son sifatida olish
-    try:
-        user_id_int = int(user_id)
-        # Toq yoki juft aniqlash
-        is_odd = user_id_int % 2 == 1
-        
-        if is_odd:
-            # Toq userlar uchun birinchi karta
-            card = active_cards[0]
-            visible_id = 1
-        else:
-            # Juft userlar uchun ikkinchi karta
-            card = active_cards[1] if len(active_cards) > 1 else active_cards[0]
-            visible_id = 2 if len(active_cards) > 1 else 1
-        
-        return {
-            "id": card[0],
-            "visible_id": visible_id,  # Ko'rinadigan ID
-            "card_number": card[1],
-            "card_owner": card[2],
-            "bank_name": card[3]
-        }
-    except (ValueError, TypeError):
-        # Agar user_id son bo'lmasa, birinchi kartani qaytarish
-        card = active_cards[0]
-        return {
-            "id": card[0],
-            "visible_id": 1,  # Ko'rinadigan ID
-            "card_number": card[1],
-            "card_owner": card[2],
-            "bank_name": card[3]
-        }
+    """O'quvchiga biriktirilgan karta (kartalar halqasi, vazn bo'yicha)"""
+    card = card_ring.card_for(user_id)
+    return card._asdict() if card else None
 
 def check_subscription(user_id):
-    """Foydalanuvchining obunasini tekshirish"""
-    result = query_db(
-        "SELECT id, is_active, end_date FROM subscriptions WHERE user_id = ? AND is_active = 1",
-        (str(user_id),),
-        fetch=True
-    )
-    
-    if result:
-        sub_id, is_active, end_date = result[0]
-        try:
-            end_dt = datetime.strptime(end_date, "%Y-%m-%d %H:%M:%S")
-            if end_dt > datetime.now():
-                return {"active": True, "end_date": end_date}
-            else:
-                # Obunani deaktiv qilish
-                query_db("UPDATE subscriptions SET is_active = 0 WHERE id = ?", (sub_id,))
-        except:
-            pass
-    
-    return {"active": False, "end_date": None}
+    """Foydalanuvchining obunasini tekshirish (update ichida - access(update).active)"""
+    return load_access(user_id).subscription
 
-@bot.message_handler(func=lambda m: m.text == "💳 To'lov")
+@router.message_handler(text="💳 To'lov")
 def show_payment_menu(message):
     """To'lov menyusi"""
     user_id = str(message.from_user.id)
     
     # Obunani tekshirish
-    sub = check_subscription(user_id)
+    sub = access(message).subscription
     
     if sub["active"]:
         end_date = sub["end_date"]
@@ -178,7 +118,7 @@ def topup_account_callback(call):
         bot.send_message(call.from_user.id, text, parse_mode="HTML", reply_markup=kb)
         return
     
-    # User ID ga qarab toq/juft aniqlash va tegishli kartani olish
+    # O'quvchiga biriktirilgan kartani olish
     card_data = get_card_for_user(user_id)
     
     if not card_data:
@@ -196,13 +136,13 @@ def topup_account_callback(call):
     bank_name = card_data["bank_name"]
     visible_id = card_data.get("visible_id", 1)  # Ko'rinadigan ID
     
-    user_state[call.from_user.id] = {
-        "payment_user_id": user_id,
-        "payment_username": username,
-        "payment_full_name": full_name,
-        "payment_card": card_number,
-        "step": "waiting_payment_confirmation"
-    }
+    conversation.enter(
+        call.from_user.id, "waiting_payment_confirmation",
+        payment_user_id=user_id,
+        payment_username=username,
+        payment_full_name=full_name,
+        payment_card=card_number,
+    )
     
     # Karta raqamini ko'rsatish
     text = "💳 <b>Bu karta raqamiga pul tashang</b>\n\n"
@@ -236,14 +176,15 @@ def confirm_payment_sent_callback(call):
         return
     
     # Database ga to'lov recordi yaratish
+    now = datetime.now()
     query_db(
-        "INSERT INTO payments (user_id, username, student_name, card_number, status, payment_date) VALUES (?, ?, ?, ?, ?, ?)",
-        (user_id, username, full_name, card_number, "pending", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        "INSERT INTO payments (user_id, username, student_name, card_number, status, payment_date, created_ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (user_id, username, full_name, card_number, "pending", now.strftime("%Y-%m-%d %H:%M:%S"), to_ts(now))
     )
     
     # Payment ID ni olish
     payment = query_db(
-        "SELECT id FROM payments WHERE user_id = ? AND status = 'pending' ORDER BY created_at DESC LIMIT 1",
+        "SELECT id FROM payments WHERE user_id = ? AND status = 'pending' ORDER BY created_ts DESC LIMIT 1",
         (user_id,),
         fetch=True
     )
@@ -291,14 +232,14 @@ def confirm_payment_sent_callback(call):
     # Faqat karta raqamiga qarab tegishli adminga xabar yuborish
     if specific_admin_id:
         try:
-            bot.send_message(specific_admin_id, text_admin, parse_mode="HTML", reply_markup=kb_admin)
+            notifier.urgent(specific_admin_id, text_admin, parse_mode="HTML", reply_markup=kb_admin)
         except Exception as e:
             logger.exception(f"Send to specific admin {specific_admin_id} error: {e}")
     else:
         # Agar karta raqami 2717 yoki 9657 bilan tugamasa, barcha adminlarga yuborish
         for admin_id in ADMIN_IDS:
             try:
-                bot.send_message(admin_id, text_admin, parse_mode="HTML", reply_markup=kb_admin)
+                notifier.urgent(admin_id, text_admin, parse_mode="HTML", reply_markup=kb_admin)
             except Exception as e:
                 logger.exception(f"Send to admin error: {e}")
 
@@ -347,9 +288,8 @@ def reject_payment_callback(call):
         # Hech qanday tugma bo'lmasin - faqat matn
         bot.send_message(int(user_id), text_user, parse_mode="HTML", reply_markup=types.ReplyKeyboardRemove())
         
-        # User state'ni tozalash
-        if int(user_id) in user_state:
-            user_state.pop(int(user_id), None)
+        # User state'ni tozalash (klasterda - user chatining worker'ida)
+        forget_state(int(user_id))
     except Exception as e:
         logger.exception(f"User ga xabar yuborishda xatolik: {e}")
 
@@ -383,12 +323,15 @@ def verify_payment_callback(call):
     )
     
     # Obunani yaratish
-    end_date = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d %H:%M:%S")
+    start_dt = datetime.now()
+    end_dt = start_dt + timedelta(days=30)
+    end_date = end_dt.strftime("%Y-%m-%d %H:%M:%S")
     
     query_db(
-        "INSERT OR REPLACE INTO subscriptions (user_id, username, student_name, subscription_type, price, start_date, end_date, is_active, payment_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        (user_id, username, student_name, "monthly", 15000, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), end_date, 1, payment_id)
+        "INSERT OR REPLACE INTO subscriptions (user_id, username, student_name, subscription_type, price, start_date, end_date, is_active, payment_id, start_ts, end_ts) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (user_id, username, student_name, "monthly", 15000, start_dt.strftime("%Y-%m-%d %H:%M:%S"), end_date, 1, payment_id, to_ts(start_dt), to_ts(end_dt))
     )
+    invalidate_subscription(user_id)
     
     # Admin xabari
     text = f"✅ <b>To'lov tasdiqlandi!</b>\n\n"
@@ -442,10 +385,9 @@ def back_to_menu_callback(call):
     """Bosh menyuya qaytish"""
     bot.answer_callback_query(call.id)
     from utils import user_main_menu
-    from handlers.payment_handlers import check_subscription
     
     # To'lov tekshirish
-    sub = check_subscription(str(call.from_user.id))
+    sub = access(call).subscription
     
     if sub["active"]:
         bot.send_message(call.from_user.id, "🏠 Bosh menyu", reply_markup=user_main_menu())
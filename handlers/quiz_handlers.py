@@ -1,17 +1,28 @@
+import asyncio
 import os
 import re
+import sqlite3
 import time
 import logging
 from datetime import datetime
 from telebot import types
-from config import bot, ADMIN_IDS, user_state, VIDEOS_FOLDER, logger
+from config import bot, ADMIN_IDS, user_state, answered_quizzes, VIDEOS_FOLDER, AIO_SEND_CONCURRENCY, logger
+from aio import async_variant, gather_limited
+from outbound import outbound, priority, BULK
+from router import router
+from conversation import conversation
 from database import (
     query_db, get_all_active_quizzes, get_unsent_quiz, mark_quiz_as_sent,
-    get_quiz_hours_remaining, create_quiz, update_user_balance
+    quiz_hours_remaining, create_quiz, update_user_balance
 )
+from db_executor import db_executor
+from blocklist import block_list
+from access import access
 from utils import admin_main_menu, back_button
 
-@bot.message_handler(func=lambda m: m.text == "🧩 Viktorina savollari")
+conversation.state("quiz_menu")
+
+@router.message_handler(text="🧩 Viktorina savollari")
 def admin_quiz_menu(message):
     if message.from_user.id not in ADMIN_IDS:
         return
@@ -19,31 +30,16 @@ def admin_quiz_menu(message):
     kb.add("➕ Viktorina savolini qo'shish", "🗑️ Viktorina savolini o'chirish")
     kb.add("⬅️ Orqaga")
     bot.send_message(message.chat.id, "Viktorina boshqaruvi: tanlang", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "quiz_menu"}
-
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and m.chat.id in user_state and user_state[m.chat.id].get("step") == "quiz_menu")
-def back_from_quiz_menu(message):
-    if message.from_user.id not in ADMIN_IDS:
-        return
-    user_state.pop(message.chat.id, None)
-    from handlers.admin_handlers import go_back
-    go_back(message)
+    conversation.enter(message.chat.id, "quiz_menu")
 
-@bot.message_handler(func=lambda m: m.text == "➕ Viktorina savolini qo'shish")
+@router.message_handler(text="➕ Viktorina savolini qo'shish")
 def admin_quiz_add_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
     bot.send_message(message.chat.id, "📸 Iltimos viktorina savoli uchun rasm yuboring.", reply_markup=back_button())
-    user_state[message.chat.id] = {"step": "quiz_wait_image"}
+    conversation.enter(message.chat.id, "quiz_wait_image")
 
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and m.chat.id in user_state and user_state[m.chat.id].get("step") == "quiz_wait_image")
-def back_from_quiz_image(message):
-    if message.from_user.id not in ADMIN_IDS:
-        return
-    user_state.pop(message.chat.id, None)
-    admin_quiz_menu(message)
-
-@bot.message_handler(content_types=['photo'])
+@conversation.step("quiz_wait_image", back=admin_quiz_menu, content_types=['photo'])
 def handle_photo(message):
     state = user_state.get(message.chat.id, {})
     if state and state.get("step") == "quiz_wait_image" and message.from_user.id in ADMIN_IDS:
@@ -62,7 +58,7 @@ def handle_photo(message):
             user_state.pop(message.chat.id, None)
             return
 
-        user_state[message.chat.id] = {"step": "quiz_wait_correct", "file_path": path, "file_id": file_id}
+        conversation.enter(message.chat.id, "quiz_wait_correct", file_path=path, file_id=file_id)
         kb = types.InlineKeyboardMarkup()
         row = []
         for opt in ["A", "B", "C", "D", "E"]:
@@ -71,6 +67,8 @@ def handle_photo(message):
         bot.send_message(message.chat.id, "🔘 Endi to'g'ri javobni tanlang:", reply_markup=kb)
         return
 
+conversation.state("quiz_wait_correct")
+
 @bot.callback_query_handler(func=lambda call: call.data.startswith("set_quiz_correct:"))
 def handle_set_quiz_correct(call):
     try:
@@ -103,7 +101,7 @@ def handle_set_quiz_correct(call):
         except Exception:
             pass
 
-@bot.message_handler(func=lambda m: m.text == "🗑️ Viktorina savolini o'chirish")
+@router.message_handler(text="🗑️ Viktorina savolini o'chirish")
 def admin_quiz_delete_start(message):
     if message.from_user.id not in ADMIN_IDS:
         return
@@ -118,16 +116,11 @@ def admin_quiz_delete_start(message):
         kb.add(f"❌ {qid} — {short} ({correct})")
     kb.add("⬅️ Orqaga")
     bot.send_message(message.chat.id, "O'chirish uchun savolni tanlang:", reply_markup=kb)
-    user_state[message.chat.id] = {"step": "delete_quiz"}
+    conversation.enter(message.chat.id, "delete_quiz")
 
-@bot.message_handler(func=lambda m: m.chat.id in user_state and user_state[m.chat.id].get("step") == "delete_quiz" and m.from_user.id in ADMIN_IDS)
+@conversation.step("delete_quiz", back=admin_quiz_menu, func=lambda m: m.from_user.id in ADMIN_IDS)
 def admin_delete_selected_quiz(message):
     try:
-        if message.text == "⬅️ Orqaga":
-            user_state.pop(message.chat.id, None)
-            admin_quiz_menu(message)
-            return
-        
         # Check if message starts with ❌ (delete quiz button)
         if not message.text.startswith("❌"):
             bot.send_message(message.chat.id, "❌ Noto'g'ri tanlov. Iltimos menyudan tanlang.", reply_markup=admin_main_menu())
@@ -162,64 +155,96 @@ def admin_delete_selected_quiz(message):
         bot.send_message(message.chat.id, f"❌ Xatolik yuz berdi: {str(e)}", reply_markup=admin_main_menu())
         user_state.pop(message.chat.id, None)
 
-def send_quiz_to_users(quiz_id, file_id, correct_answer):
-    """Barcha userlarga viktorina savolini yuboradi (bloklangan userlar bundan mustasno)"""
-    from handlers.admin_handlers import is_user_blocked
-    
+QUIZ_SEND_BATCH = 500  # outbound navbatini to'ldirib yubormaslik uchun
+QUIZ_CAPTION = "🧩 <b>Viktorina savoli</b>\n⏰ Qolgan vaqt: 24 soat"
+
+def quiz_recipients():
+    """Viktorina yuboriladigan chat_id'lar (adminlar va bloklanganlarsiz) -> (chat_ids, xato, bloklangan)"""
+    # Userlar va bloklanganlar ro'yxati parallel o'qiladi (har bir user uchun alohida so'rov o'rniga)
     if ADMIN_IDS:
         placeholders = ','.join(['?' for _ in ADMIN_IDS])
-        users = query_db(f"SELECT chat_id FROM users WHERE chat_id NOT IN ({placeholders})", [str(aid) for aid in ADMIN_IDS], fetch=True) or []
+        users_future = db_executor.read(f"SELECT chat_id FROM users WHERE chat_id NOT IN ({placeholders})", [str(aid) for aid in ADMIN_IDS])
     else:
-        users = query_db("SELECT chat_id FROM users", fetch=True) or []
+        users_future = db_executor.read("SELECT chat_id FROM users")
+    try:
+        users = users_future.result()
+        blocked = block_list.ids()
+    except Exception:
+        logger.exception("Viktorina uchun userlarni o'qishda xatolik")
+        return None
     
     if not users:
         logger.info("Viktorina yuborish uchun userlar topilmadi")
-        return 0
-    
-    if not file_id:
-        logger.error(f"Viktorina {quiz_id} uchun file_id topilmadi")
-        return 0
+        return None
     
+    chat_ids = []
+    failed_count = 0
+    blocked_count = 0
+    for (chat_id,) in users:
+        try:
+            chat_id_int = int(chat_id)
+        except (ValueError, TypeError):
+            logger.warning(f"Noto'g'ri chat_id: {chat_id}")
+            failed_count += 1
+            continue
+        
+        # Bloklangan userlarga viktorina yubormaslik
+        if str(chat_id_int) in blocked:
+            blocked_count += 1
+            continue
+        chat_ids.append(chat_id_int)
+    return chat_ids, failed_count, blocked_count
+
+def quiz_keyboard(quiz_id):
     kb = types.InlineKeyboardMarkup()
     row = []
     for opt in ["A", "B", "C", "D", "E"]:
         row.append(types.InlineKeyboardButton(text=opt, callback_data=f"quiz_answer:{quiz_id}:{opt}"))
     kb.row(*row)
+    return kb
+
+def send_quiz_to_users(quiz_id, file_id, correct_answer):
+    """Barcha userlarga viktorina savolini yuboradi (bloklangan userlar bundan mustasno)"""
+    if not file_id:
+        logger.error(f"Viktorina {quiz_id} uchun file_id topilmadi")
+        return 0
+    
+    recipients = quiz_recipients()
+    if not recipients:
+        return 0
+    chat_ids, failed_count, blocked_count = recipients
+    kb = quiz_keyboard(quiz_id)
     
+    # Partiyalab navbatga: tezlikni outbound limitlari belgilaydi, handler javoblari oldinda
     sent_count = 0
-    failed_count = 0
-    blocked_count = 0
-    for (chat_id,) in users:
-        try:
+    for start in range(0, len(chat_ids), QUIZ_SEND_BATCH):
+        batch = chat_ids[start:start + QUIZ_SEND_BATCH]
+        futures = [
+            outbound.submit(chat_id, bot.send_photo, chat_id, file_id, caption=QUIZ_CAPTION, parse_mode="HTML", reply_markup=kb, priority=BULK)
+            for chat_id in batch
+        ]
+        for chat_id, future in zip(batch, futures):
             try:
-                chat_id_int = int(chat_id)
-            except (ValueError, TypeError):
-                logger.warning(f"Noto'g'ri chat_id: {chat_id}")
+                future.result()
+                sent_count += 1
+            except Exception as e:
+                logger.warning(f"User {chat_id} ga viktorina yuborishda xatolik: {e}")
                 failed_count += 1
-                continue
-            
-            # Bloklangan userlarga viktorina yubormaslik
-            if is_user_blocked(chat_id_int):
-                blocked_count += 1
-                continue
-            
-            bot.send_photo(chat_id_int, file_id, caption="🧩 <b>Viktorina savoli</b>\n⏰ Qolgan vaqt: 24 soat", parse_mode="HTML", reply_markup=kb)
-            sent_count += 1
-            if sent_count % 10 == 0:
-                time.sleep(0.1)
-        except Exception as e:
-            logger.warning(f"User {chat_id} ga viktorina yuborishda xatolik: {e}")
-            failed_count += 1
     
     logger.info(f"Viktorina savoli {sent_count} ta userga yuborildi, {failed_count} ta xatolik, {blocked_count} ta bloklangan user o'tkazib yuborildi")
     return sent_count
 
-def quiz_dispatcher_loop():
-    """Har 2 soatda viktorina savolini yuboradi (bir kunda 12 ta)"""
+def quiz_dispatcher_loop(lease=None):
+    """Har 2 soatda viktorina savolini yuboradi (bir kunda 12 ta).
+
+    lease (cluster.Lease) berilsa faqat lider jarayon yuboradi, qolganlari kutadi.
+    """
     logger.info("🧩 Viktorina dispatcher loop ishga tushdi")
     first_run = True
     
     while True:
+        if lease is not None:
+            lease.wait()
         try:
             if first_run:
                 logger.info("🔍 Viktorina savollarini tekshiryapman...")
@@ -242,30 +267,63 @@ def quiz_dispatcher_loop():
             logger.info("🔄 1 minutdan keyin qayta uriniladi...")
             time.sleep(60)
 
+QUIZ_ANSWER_QUERY = "SELECT correct_answer, sent_ts, hours_remaining FROM quizzes WHERE id = ? AND active = 1"
+
+def unpaid_quiz_reply():
+    text = "❌ <b>To'lov qilmagansiz!</b>\n\n"
+    text += "Iltimos, hisobingizni to'ldiring.\n"
+    text += "💰 Oylik to'lov: 15,000 so'm\n\n"
+    text += "To'lov qilish uchun pastdagi tugmani bosing."
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton("💳 Hisobni to'ldirish", callback_data="topup_account"))
+    return text, kb
+
+def quiz_answered(user_quiz_key):
+    return user_quiz_key in answered_quizzes
+
+def mark_quiz_answered(user_quiz_key, hours_left):
+    """Viktorina muddati tugaguncha eslab qolinadi (keyin vaqt tekshiruvi rad etadi)"""
+    answered_quizzes.set(user_quiz_key, True, ttl=hours_left * 3600 + 60)
+
+def unmark_quiz_answered(user_quiz_key):
+    """Kredit yozilmadi - o'quvchi qaytadan javob bera oladi"""
+    answered_quizzes.pop(user_quiz_key, None)
+
+# Javob kreditdan OLDIN belgilanadi: qayta bosish ikkinchi kredit yubormaydi.
+# Belgi faqat kredit xato bilan tugasa olib tashlanadi.
+CREDIT_TIMEOUT = 30
+CREDIT_FAILED_TEXT = "⚠️ Javobingiz saqlanmadi. Birozdan keyin qaytadan urinib ko'ring."
+CREDIT_PENDING_TEXT = "⏳ Javobingiz qabul qilindi, balans birozdan keyin yangilanadi."
+
+def unmark_on_failed_credit(credit, user_quiz_key):
+    def done(future):
+        if future.cancelled() or future.exception() is not None:
+            unmark_quiz_answered(user_quiz_key)
+    credit.add_done_callback(done)
+
+def quiz_result_text(new_balance, correct_answer):
+    """new_balance - to'g'ri javobdan keyingi balans, None - noto'g'ri javob"""
+    if new_balance is not None:
+        return f"✅ <b>To'g'ri javob!</b>\n💰 Sizga 100 som qo'shildi\n💰 Joriy balans: {new_balance} som"
+    return f"❌ <b>Noto'g'ri javob</b>\nTo'g'ri javob: <b>{correct_answer}</b>"
+
 @bot.callback_query_handler(func=lambda call: call.data.startswith("quiz_answer:"))
 def handle_quiz_answer(call):
     try:
         # To'lov tekshirish
-        from handlers.payment_handlers import check_subscription
-        sub = check_subscription(str(call.from_user.id))
-        if not sub["active"]:
+        ctx = access(call)
+        if not ctx.active:
             bot.answer_callback_query(call.id, "❌ To'lov qilmagansiz! Iltimos, hisobingizni to'ldiring.", show_alert=True)
-            text = "❌ <b>To'lov qilmagansiz!</b>\n\n"
-            text += "Iltimos, hisobingizni to'ldiring.\n"
-            text += "💰 Oylik to'lov: 15,000 so'm\n\n"
-            text += "To'lov qilish uchun pastdagi tugmani bosing."
-            kb = types.InlineKeyboardMarkup()
-            kb.add(types.InlineKeyboardButton("💳 Hisobni to'ldirish", callback_data="topup_account"))
+            text, kb = unpaid_quiz_reply()
             bot.send_message(call.from_user.id, text, parse_mode="HTML", reply_markup=kb)
             return
         
         # Blok tekshirish
-        from handlers.admin_handlers import is_user_blocked
-        if is_user_blocked(call.from_user.id):
+        if ctx.blocked:
             bot.answer_callback_query(call.id, "❌ Qora ro'yxatdagi shaxsiz! Admin bilan bog'lanib qaytadan urinib ko'ring!", show_alert=True)
             return
         
-        if call.from_user.id in ADMIN_IDS:
+        if ctx.is_admin:
             bot.answer_callback_query(call.id, "Adminlar javob bera olmaydi")
             return
         
@@ -277,13 +335,13 @@ def handle_quiz_answer(call):
         quiz_id = int(parts[1])
         user_answer = parts[2]
         
-        quiz_info = query_db("SELECT correct_answer, sent_at, hours_remaining FROM quizzes WHERE id = ? AND active = 1", (quiz_id,), fetch=True)
+        quiz_info = query_db(QUIZ_ANSWER_QUERY, (quiz_id,), fetch=True)
         if not quiz_info:
             bot.answer_callback_query(call.id, "Savol topilmadi yoki aktiv emas")
             return
         
-        correct_answer, sent_at, hours_remaining = quiz_info[0]
-        remaining = get_quiz_hours_remaining(quiz_id)
+        correct_answer, sent_ts, hours_remaining = quiz_info[0]
+        remaining = quiz_hours_remaining(sent_ts, hours_remaining)
         
         if remaining is None or remaining <= 0:
             bot.answer_callback_query(call.id, "⏰ Vaqt tugadi!")
@@ -296,30 +354,33 @@ def handle_quiz_answer(call):
                 pass
             return
         
-        chat_id = call.message.chat.id
         user_quiz_key = f"quiz_{quiz_id}_{call.from_user.id}"
-        if user_quiz_key in user_state.get(chat_id, {}).get("answered_quizzes", []):
+        if quiz_answered(user_quiz_key):
             bot.answer_callback_query(call.id, "Siz allaqachon javob berdingiz!")
             return
         
         is_correct = user_answer.upper() == correct_answer.upper()
         
+        mark_quiz_answered(user_quiz_key, remaining)
+        new_balance = None
         if is_correct:
-            new_balance = update_user_balance(call.from_user.id, 100)
-            result_text = f"✅ <b>To'g'ri javob!</b>\n💰 Sizga 100 som qo'shildi\n💰 Joriy balans: {new_balance} som"
-        else:
-            result_text = f"❌ <b>Noto'g'ri javob</b>\nTo'g'ri javob: <b>{correct_answer}</b>"
-        
-        if chat_id not in user_state:
-            user_state[chat_id] = {}
-        if "answered_quizzes" not in user_state[chat_id]:
-            user_state[chat_id]["answered_quizzes"] = []
-        user_state[chat_id]["answered_quizzes"].append(user_quiz_key)
+            try:
+                new_balance = update_user_balance(call.from_user.id, 100, reason=f"quiz:{quiz_id}")
+            except sqlite3.Error:
+                logger.exception(f"Viktorina krediti yozilmadi: {user_quiz_key}")
+                unmark_quiz_answered(user_quiz_key)
+                bot.answer_callback_query(call.id, CREDIT_FAILED_TEXT, show_alert=True)
+                return
         
         bot.answer_callback_query(call.id, "✅ Javob qabul qilindi")
         try:
             # Avval tugmalarni o'chiramiz
             bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=None)
+        except Exception:
+            pass
+        
+        result_text = quiz_result_text(new_balance, correct_answer)
+        try:
             # Keyin captionni yangilaymiz
             bot.edit_message_caption(call.message.chat.id, call.message.message_id, caption=result_text, parse_mode="HTML", reply_markup=None)
         except Exception as e:
@@ -335,6 +396,143 @@ def handle_quiz_answer(call):
         except Exception:
             pass
 
+# --- asyncio runtime (BOT_ASYNC=1) varianti: Telegram chaqiruvlari loop'da, DB - db_executor'da ---
+
+async def send_quiz_to_users_async(abot, quiz_id, file_id, correct_answer):
+    """send_quiz_to_users ning async varianti: bir vaqtda AIO_SEND_CONCURRENCY ta yuborish"""
+    if not file_id:
+        logger.error(f"Viktorina {quiz_id} uchun file_id topilmadi")
+        return 0
+    
+    recipients = await asyncio.to_thread(quiz_recipients)
+    if not recipients:
+        return 0
+    chat_ids, failed_count, blocked_count = recipients
+    kb = quiz_keyboard(quiz_id)
+    
+    with priority(BULK):
+        results = await gather_limited(
+            (abot.send_photo(chat_id, file_id, caption=QUIZ_CAPTION, parse_mode="HTML", reply_markup=kb) for chat_id in chat_ids),
+            AIO_SEND_CONCURRENCY,
+        )
+    sent_count = 0
+    for chat_id, result in zip(chat_ids, results):
+        if isinstance(result, Exception):
+            logger.warning(f"User {chat_id} ga viktorina yuborishda xatolik: {result}")
+            failed_count += 1
+        else:
+            sent_count += 1
+    
+    logger.info(f"Viktorina savoli {sent_count} ta userga yuborildi, {failed_count} ta xatolik, {blocked_count} ta bloklangan user o'tkazib yuborildi")
+    return sent_count
+
+async def quiz_dispatcher_task(abot):
+    """quiz_dispatcher_loop ning async varianti (aio.run_async background)"""
+    logger.info("🧩 Viktorina dispatcher task ishga tushdi")
+    while True:
+        try:
+            quiz = await db_executor.acall(get_unsent_quiz)
+            if quiz:
+                quiz_id, file_id, correct_answer, sent_to_users = quiz
+                logger.info(f"📤 Viktorina savoli yuborilmoqda: ID {quiz_id}")
+                sent_count = await send_quiz_to_users_async(abot, quiz_id, file_id, correct_answer)
+                await db_executor.acall(mark_quiz_as_sent, quiz_id, write=True)
+                logger.info(f"✅ Viktorina savoli {sent_count} ta userga yuborildi")
+            else:
+                logger.info("📭 Yuborish uchun viktorina savoli topilmadi")
+            await asyncio.sleep(7200)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"❌ Viktorina dispatcher xatosi: {e}")
+            await asyncio.sleep(60)
+
+@async_variant(handle_quiz_answer)
+async def handle_quiz_answer_async(abot, call):
+    try:
+        parts = call.data.split(":")
+        quiz_id = int(parts[1]) if len(parts) == 3 else None
+        
+        # Kirish konteksti va savol bir vaqtda o'qiladi; javoblar tartibi sinxron handlerdagidek
+        reads = [db_executor.acall(access, call)]
+        if quiz_id is not None:
+            reads.append(db_executor.aread(QUIZ_ANSWER_QUERY, (quiz_id,)))
+        ctx, *quiz_info = await asyncio.gather(*reads)
+        
+        if not ctx.active:
+            await abot.answer_callback_query(call.id, "❌ To'lov qilmagansiz! Iltimos, hisobingizni to'ldiring.", show_alert=True)
+            text, kb = unpaid_quiz_reply()
+            await abot.send_message(call.from_user.id, text, parse_mode="HTML", reply_markup=kb)
+            return
+        if ctx.blocked:
+            await abot.answer_callback_query(call.id, "❌ Qora ro'yxatdagi shaxsiz! Admin bilan bog'lanib qaytadan urinib ko'ring!", show_alert=True)
+            return
+        if ctx.is_admin:
+            await abot.answer_callback_query(call.id, "Adminlar javob bera olmaydi")
+            return
+        if quiz_id is None:
+            await abot.answer_callback_query(call.id, "Xatolik")
+            return
+        if not quiz_info[0]:
+            await abot.answer_callback_query(call.id, "Savol topilmadi yoki aktiv emas")
+            return
+        
+        correct_answer, sent_ts, hours_remaining = quiz_info[0][0]
+        remaining = quiz_hours_remaining(sent_ts, hours_remaining)
+        chat_id = call.message.chat.id
+        message_id = call.message.message_id
+        if remaining is None or remaining <= 0:
+            await abot.answer_callback_query(call.id, "⏰ Vaqt tugadi!")
+            try:
+                await abot.edit_message_reply_markup(chat_id, message_id, reply_markup=None)
+                await abot.edit_message_caption(caption="⏰ <b>Vaqt tugadi!</b>", chat_id=chat_id, message_id=message_id, parse_mode="HTML", reply_markup=None)
+            except Exception:
+                pass
+            return
+        
+        user_quiz_key = f"quiz_{quiz_id}_{call.from_user.id}"
+        if quiz_answered(user_quiz_key):
+            await abot.answer_callback_query(call.id, "Siz allaqachon javob berdingiz!")
+            return
+        
+        mark_quiz_answered(user_quiz_key, remaining)
+        new_balance = None
+        if parts[2].upper() == correct_answer.upper():
+            credit = db_executor.call(update_user_balance, call.from_user.id, 100, reason=f"quiz:{quiz_id}", write=True)
+            unmark_on_failed_credit(credit, user_quiz_key)
+            try:
+                # shield: kutish to'xtasa ham yozuv bekor qilinmaydi
+                new_balance = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(credit)), CREDIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                # Kredit hali navbatda: belgi qoladi, qayta bosish "allaqachon javob berdingiz" oladi
+                logger.warning(f"Viktorina krediti kechikmoqda: {user_quiz_key}")
+                await abot.answer_callback_query(call.id, CREDIT_PENDING_TEXT, show_alert=True)
+                return
+            except sqlite3.Error:
+                logger.exception(f"Viktorina krediti yozilmadi: {user_quiz_key}")
+                await abot.answer_callback_query(call.id, CREDIT_FAILED_TEXT, show_alert=True)
+                return
+        
+        await abot.answer_callback_query(call.id, "✅ Javob qabul qilindi")
+        try:
+            await abot.edit_message_reply_markup(chat_id, message_id, reply_markup=None)
+        except Exception:
+            pass
+        
+        result_text = quiz_result_text(new_balance, correct_answer)
+        try:
+            await abot.edit_message_caption(caption=result_text, chat_id=chat_id, message_id=message_id, parse_mode="HTML", reply_markup=None)
+        except Exception:
+            try:
+                await abot.send_message(chat_id, result_text, parse_mode="HTML")
+            except Exception:
+                pass
+    except Exception:
+        logger.exception("Error in handle_quiz_answer_async")
+        try:
+            await abot.answer_callback_query(call.id, "Xatolik")
+        except Exception:
+            pass
 
 
 
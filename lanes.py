@@ -0,0 +1,161 @@
+"""Chat bo'yicha tartiblangan worker'lar (lane'lar).
+
+telebot'ning threaded rejimida bir o'quvchining ketma-ket ikki xabari turli
+worker'larda parallel bajarilib, user_state ustida poyga bo'lishi mumkin
+("📝 Test topshirish" va darhol javoblar). Bu yerda har bir update chat_id
+bo'yicha bitta lane'ga tushadi: lane - o'z navbati va bitta thread'i bor,
+shuning uchun bir chat update'lari kelgan tartibda, turli chatlar esa
+parallel ishlanadi.
+
+    attach(bot, update_lanes)   # polling: bot.process_new_updates lane'larga yuboradi
+"""
+import logging
+import queue
+import threading
+import time
+
+from config import UPDATE_LANES, UPDATE_LANE_QUEUE_SIZE
+
+logger = logging.getLogger(__name__)
+
+def update_chat_id(update):
+    """Update qaysi chatga tegishli (lane kaliti); aniqlab bo'lmasa update_id"""
+    for attr in ("message", "edited_message", "channel_post", "edited_channel_post"):
+        message = getattr(update, attr, None)
+        if message is not None:
+            return message.chat.id
+    call = getattr(update, "callback_query", None)
+    if call is not None:
+        return call.message.chat.id if call.message else call.from_user.id
+    for attr in ("my_chat_member", "chat_member", "chat_join_request"):
+        event = getattr(update, attr, None)
+        if event is not None:
+            return event.chat.id
+    for attr in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query", "poll_answer"):
+        event = getattr(update, attr, None)
+        user = getattr(event, "from_user", None) or getattr(event, "user", None)
+        if user is not None:
+            return user.id
+    return update.update_id
+
+class Lane:
+    __slots__ = ("queue", "thread", "max_depth")
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.max_depth = 0
+
+class LanePool:
+    def __init__(self, lanes=8, queue_size=100, name="lane"):
+        self.name = name
+        self.lanes = [Lane(queue_size) for _ in range(max(1, int(lanes)))]
+        self._lock = threading.Lock()
+        self._started = False
+        self.processed = 0
+        self.errors = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    def lane_for(self, key):
+        # int chat_id uchun hash(key) == key - lane'lar barqaror va bashorat qilinadigan
+        return self.lanes[hash(key) % len(self.lanes)]
+
+    def start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for i, lane in enumerate(self.lanes):
+                lane.thread = threading.Thread(target=self._run, args=(lane,), name=f"{self.name}-{i}", daemon=True)
+                lane.thread.start()
+
+    def submit(self, key, fn, *args, block=True):
+        """fn(*args) ni key lane'iga qo'yadi; block=False va lane to'la bo'lsa False"""
+        if not self._started:
+            self.start()
+        lane = self.lane_for(key)
+        try:
+            lane.queue.put((time.monotonic(), fn, args), block=block)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        depth = lane.queue.qsize()
+        if depth > lane.max_depth:
+            lane.max_depth = depth
+        return True
+
+    def _run(self, lane):
+        while True:
+            item = lane.queue.get()
+            if item is None:
+                lane.queue.task_done()
+                break
+            queued_at, fn, args = item
+            wait = time.monotonic() - queued_at
+            try:
+                fn(*args)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                logger.exception(f"{self.name}: update'ni qayta ishlashda xatolik")
+            finally:
+                with self._lock:
+                    self.processed += 1
+                    self._wait_total += wait
+                    if wait > self.max_wait:
+                        self.max_wait = wait
+                lane.queue.task_done()
+
+    def join(self):
+        """Navbatdagi barcha vazifalar bajarilishini kutadi"""
+        for lane in self.lanes:
+            lane.queue.join()
+
+    def stop(self, wait=True):
+        """Navbatdagilarni bajarib bo'lgandan keyin lane thread'larini to'xtatadi"""
+        with self._lock:
+            if not self._started:
+                return
+            self._started = False
+        for lane in self.lanes:
+            lane.queue.put(None)
+        if wait:
+            for lane in self.lanes:
+                lane.thread.join()
+
+    def stats(self):
+        depths = [lane.queue.qsize() for lane in self.lanes]
+        with self._lock:
+            return {
+                "lanes": len(self.lanes),
+                "queued": sum(depths),
+                "lane_depth": max(depths),
+                "peak_lane_depth": max(lane.max_depth for lane in self.lanes),
+                "processed": self.processed,
+                "errors": self.errors,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._wait_total / self.processed * 1000, 2) if self.processed else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+def attach(bot, pool):
+    """Polling: bot.process_new_updates update'larni lane'larga tarqatadigan bo'ladi.
+
+    Handlerlar lane thread'ida bajariladi, shuning uchun telebot'ning ichki
+    pool'i o'chiriladi. Lane to'lsa polling thread kutadi (backpressure).
+    """
+    process = bot.process_new_updates
+    bot.threaded = False
+
+    def process_in_lanes(updates):
+        for update in updates:
+            pool.submit(update_chat_id(update), process, [update])
+
+    bot.process_new_updates = process_in_lanes
+    pool.start()
+    return process
+
+update_lanes = LanePool(UPDATE_LANES, UPDATE_LANE_QUEUE_SIZE, name="update-lane")
@@ -2,22 +2,63 @@ import signal
 import sys
 import threading
 import logging
-from config import bot, POLLING, logger
-from database import init_db
+from config import (
+    bot, POLLING, BOT_ASYNC, RESULTS_WRITE_BEHIND, STATE_SWEEP_INTERVAL, STATE_PERSIST, CLUSTER_WORKERS,
+    WORKER_INDEX, logger
+)
+from router import router
+from database import (
+    init_db, close_all_connections, result_writer, start_epoch_backfill, start_results_compaction
+)
+from db_executor import db_executor
+import webhook
+import aio
+from lanes import attach, update_lanes
+from outbound import outbound
+from notifications import notifier
+from state_persist import state_persister
+from subscriptions import subscription_sweeper
+from blocklist import block_list
+from cards import card_ring
+import cluster
+from update_queue import update_queue, run_polling_intake, QueueWorker
+# conversation birinchi: "⬅️ Orqaga" handleri boshqa barcha handlerlardan oldin ro'yxatdan o'tadi
+from conversation import conversation
 # Import order matters! 
 # homework_handlers and quiz_handlers must be imported before admin_handlers
 # so that homework and quiz handlers are registered first and checked before admin handlers
 from handlers import homework_handlers, quiz_handlers, admin_handlers, user_handlers, payment_handlers
 
+intake_stop = threading.Event()
+
 def shutdown(signum, frame):
     logger.info("Shutting down...")
+    intake_stop.set()
     try:
         bot.stop_polling()
     except Exception:
         pass
+    if webhook.server is not None:
+        webhook.server.stop()
+    # Klaster: asosiy jarayon worker'larni kutadi, worker navbatdan olganlarini tugatadi
+    if cluster.supervisor is not None:
+        cluster.supervisor.stop()
+    if cluster.worker is not None:
+        cluster.worker.stop()
+    # Lane'lardagi update'larni ishlab bo'lgandan keyin DB yopiladi
+    update_lanes.stop()
+    # To'plangan digestlar outbound to'xtashidan oldin navbatga tushadi
+    notifier.stop()
+    outbound.stop()
+    # Handlerlar tugagan - holatlarning oxirgi o'zgarishlari writer yopilishidan oldin yoziladi
+    state_persister.stop()
+    # Navbatdagi natijalarni yozib bo'lgandan keyin ulanishlarni yopamiz
+    result_writer.stop()
+    db_executor.shutdown()
+    close_all_connections()
     sys.exit(0)
 
-@bot.message_handler(commands=['help'])
+@router.message_handler(commands=['help'])
 def help_command(message):
     help_text = (
         "🤖 Bot funksiyalari:\n\n"
@@ -27,34 +68,75 @@ def help_command(message):
     )
     bot.send_message(message.chat.id, help_text)
 
-@bot.message_handler(func=lambda m: m.text == "⬅️ Orqaga" and 
-                     (m.chat.id not in user_state or 
-                      m.chat.id in user_state and user_state[m.chat.id].get("step") not in 
-                      ["submit_homework", "get_homework_name", "get_homework_answers", 
-                       "select_homework_for_results", "delete_homework", "get_test_answers",
-                       "edit_name", "get_name", "quiz_menu", "quiz_wait_image", "homework_menu",
-                       "homework_admin_menu"]))
-def go_back(message):
-    from config import ADMIN_IDS, user_state
-    from utils import admin_main_menu, user_main_menu
-    
-    if message.from_user.id in ADMIN_IDS:
-        bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=admin_main_menu())
+# Barcha xabar handlerlari ro'yxatdan o'tgandan keyin - telebot'ga bitta dispatch handler
+router.install(bot)
+# Barcha send* so'rovlari Telegram limitlari ichida outbound navbati orqali
+outbound.install()
+
+def run_worker():
+    """Worker jarayoni: o'z bo'limidagi update'lar, viktorina esa faqat lease egasida"""
+    cluster.cache_versions.start()
+    lease = cluster.Lease("quiz-dispatcher").start()
+    threading.Thread(target=quiz_handlers.quiz_dispatcher_loop, args=(lease,), daemon=True).start()
+    logger.info(f"🤖 Worker {WORKER_INDEX}/{CLUSTER_WORKERS} ishga tushdi...")
+    cluster.worker = QueueWorker(bot, update_queue, WORKER_INDEX, update_lanes, cluster.control_handlers())
+    cluster.worker.run()
+
+def run_intake():
+    """Asosiy jarayon (klaster): worker'larni ishga tushiradi va update'larni navbatga yozadi"""
+    cluster.supervisor = cluster.Supervisor(CLUSTER_WORKERS)
+    cluster.supervisor.start()
+    if POLLING:
+        try:
+            bot.delete_webhook()
+        except Exception as e:
+            logger.warning(f"Webhook o'chirishda xatolik (ehtimol webhook yo'q): {e}")
+        run_polling_intake(bot, update_queue, intake_stop)
     else:
-        bot.send_message(message.chat.id, "🏠 Bosh menyu", reply_markup=user_main_menu())
-    user_state.pop(message.chat.id, None)
+        webhook.start_webhook(bot, None, intake=update_queue.put_update)
+        intake_stop.wait()
 
 if __name__ == "__main__":
+    if BOT_ASYNC and cluster.ENABLED:
+        raise RuntimeError("BOT_ASYNC=1 va CLUSTER_WORKERS birga ishlamaydi")
     init_db()
+    if not cluster.IS_WORKER:
+        start_epoch_backfill()
+        start_results_compaction()
+    if not cluster.ENABLED or cluster.IS_WORKER:
+        # Handlerlar shu jarayonda ishlaydi
+        block_list.load()
+        card_ring.load()
+        conversation.start_sweeper(STATE_SWEEP_INTERVAL)
+        if STATE_PERSIST:
+            state_persister.start()
+        if RESULTS_WRITE_BEHIND:
+            result_writer.start()
+        # Klasterda muddati o'tgan obunalarni bitta worker tekshiradi
+        subscription_sweeper.start(cluster.Lease("subscription-sweeper").start() if cluster.IS_WORKER else None)
     signal.signal(signal.SIGINT, shutdown)
     signal.signal(signal.SIGTERM, shutdown)
     
-    # Webhook ni o'chirish (agar mavjud bo'lsa)
-    try:
-        bot.delete_webhook()
-        logger.info("✅ Webhook o'chirildi (agar mavjud bo'lsa)")
-    except Exception as e:
-        logger.warning(f"Webhook o'chirishda xatolik (ehtimol webhook yo'q): {e}")
+    if cluster.IS_WORKER:
+        run_worker()
+    elif cluster.ENABLED:
+        run_intake()
+    
+    if BOT_ASYNC:
+        if not POLLING:
+            raise RuntimeError("BOT_ASYNC=1 hozircha faqat polling bilan ishlaydi (BOT_POLLING=1)")
+        logger.info("🤖 Bot ishga tushdi (asyncio)...")
+        # Signal kelguncha shu yerda; runtime o'zi to'xtagach resurslar yopiladi
+        aio.run_async(bot, router, background=[quiz_handlers.quiz_dispatcher_task])
+        shutdown(None, None)
+    
+    if POLLING:
+        # Webhook ni o'chirish (agar mavjud bo'lsa)
+        try:
+            bot.delete_webhook()
+            logger.info("✅ Webhook o'chirildi (agar mavjud bo'lsa)")
+        except Exception as e:
+            logger.warning(f"Webhook o'chirishda xatolik (ehtimol webhook yo'q): {e}")
     
     logger.info("🤖 Bot ishga tushdi...")
     
@@ -63,6 +145,8 @@ if __name__ == "__main__":
     logger.info("🧩 Viktorina dispatcher ishga tushdi (har 2 soatda)")
     
     if POLLING:
+        # Update'lar chat bo'yicha lane'larda: bir chat - qat'iy tartib, turli chatlar - parallel
+        attach(bot, update_lanes)
         while True:
             try:
                 bot.polling(none_stop=True, timeout=20, long_polling_timeout=20)
@@ -76,5 +160,7 @@ if __name__ == "__main__":
                 import time
                 time.sleep(5)
     else:
-        logger.info("Webhook mode not configured. Set BOT_POLLING=1 to use polling.")
+        webhook.start_webhook(bot, update_lanes)
+        # HTTP server va lane'lar fon thread'larida; asosiy thread signal kutadi
+        threading.Event().wait()
 
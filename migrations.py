@@ -0,0 +1,319 @@
+"""Raqamlangan sxema migratsiyalari.
+
+Sxema versiyasi `PRAGMA user_version` da saqlanadi. Har bir migratsiya bitta
+tranzaksiyada bajariladi va versiyani oshiradi. Yangi migratsiya faqat
+MIGRATIONS ro'yxati oxiriga qo'shiladi - mavjudlarini o'zgartirmang.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+def _columns(cur, table):
+    cur.execute(f"PRAGMA table_info({table})")
+    return {r[1] for r in cur.fetchall()}
+
+def _add_column(cur, table, column, ddl):
+    if column not in _columns(cur, table):
+        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+def m001_base_schema(cur):
+    """Boshlang'ich jadvallar (versiyasiz eski bazalar uchun yetishmagan ustunlar ham qo'shiladi)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            chat_id TEXT PRIMARY KEY,
+            student_name TEXT,
+            username TEXT,
+            updated_at TEXT,
+            name_changes INTEGER DEFAULT 0,
+            balance INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS tests (
+            test_id TEXT PRIMARY KEY,
+            test_name TEXT,
+            correct_answers TEXT,
+            created_at TEXT,
+            is_homework INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_name TEXT,
+            username TEXT,
+            tg_id TEXT,
+            test_id TEXT,
+            correct_count INTEGER,
+            incorrect_count INTEGER,
+            date TEXT
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS videos (
+            video_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            test_id TEXT UNIQUE,
+            video_url TEXT,
+            created_at TEXT
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS quizzes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_path TEXT,
+            file_id TEXT,
+            correct_answer TEXT,
+            active INTEGER DEFAULT 1,
+            created_at TEXT,
+            sent_at TEXT,
+            hours_remaining INTEGER DEFAULT 24,
+            sent_to_users INTEGER DEFAULT 0
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS blocked_users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT UNIQUE,
+            username TEXT,
+            student_name TEXT,
+            blocked_at TEXT,
+            blocked_by TEXT,
+            reason TEXT
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS bot_cards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            card_number TEXT NOT NULL,
+            card_owner TEXT,
+            bank_name TEXT,
+            is_active INTEGER DEFAULT 1
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS payments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT,
+            username TEXT,
+            student_name TEXT,
+            amount INTEGER DEFAULT 15000,
+            status TEXT DEFAULT 'pending',
+            card_number TEXT,
+            payment_date TEXT,
+            verified_date TEXT,
+            verified_by TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id TEXT UNIQUE,
+            username TEXT,
+            student_name TEXT,
+            subscription_type TEXT DEFAULT 'monthly',
+            price INTEGER DEFAULT 15000,
+            start_date TEXT,
+            end_date TEXT,
+            is_active INTEGER DEFAULT 1,
+            payment_id INTEGER,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Versiyalashdan oldingi bazalarda yetishmasligi mumkin bo'lgan ustunlar
+    _add_column(cur, "users", "name_changes", "INTEGER DEFAULT 0")
+    _add_column(cur, "users", "balance", "INTEGER DEFAULT 0")
+    _add_column(cur, "tests", "is_homework", "INTEGER DEFAULT 0")
+    _add_column(cur, "quizzes", "correct_answer", "TEXT")
+    _add_column(cur, "quizzes", "sent_at", "TEXT")
+    _add_column(cur, "quizzes", "hours_remaining", "INTEGER DEFAULT 24")
+    _add_column(cur, "quizzes", "sent_to_users", "INTEGER DEFAULT 0")
+
+def m002_hot_query_indexes(cur):
+    """Handlerlardagi issiq so'rovlar uchun indekslar"""
+    # (username = ? OR tg_id = ?) AND test_id = ? -> MULTI-INDEX OR, ORDER BY date
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_results_tg_test ON results (tg_id, test_id, date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_results_username_test ON results (username, test_id, date) WHERE username IS NOT NULL")
+    # WHERE test_id = ? (admin natijalari, PDF, o'chirish)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_results_test ON results (test_id, date)")
+    # Bugungi natijalar: date oralig'i bo'yicha
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_results_date ON results (date)")
+    # Active users ro'yxati (user_id bo'yicha qidiruv UNIQUE indeksdan foydalanadi)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_active_end ON subscriptions (end_date) WHERE is_active = 1")
+    # Kutilayotgan to'lovlar
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_pending ON payments (user_id, created_at) WHERE status = 'pending'")
+    # Yuborilmagan viktorina navbati
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_unsent ON quizzes (created_at) WHERE active = 1 AND sent_to_users = 0")
+
+def m003_balance_ledger(cur):
+    """Balans o'zgarishlari jurnali (faqat qo'shiladi, o'zgartirilmaydi)"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS balance_ledger (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            chat_id TEXT NOT NULL,
+            delta INTEGER NOT NULL,
+            balance_after INTEGER NOT NULL,
+            reason TEXT,
+            created_at TEXT
+        )
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_balance_ledger_chat ON balance_ledger (chat_id, id)")
+    # Mavjud balanslar boshlang'ich yozuv sifatida: users.balance = SUM(delta) bo'lib qoladi
+    cur.execute('''
+        INSERT INTO balance_ledger (chat_id, delta, balance_after, reason, created_at)
+        SELECT chat_id, balance, balance, 'opening', datetime('now', 'localtime')
+        FROM users WHERE COALESCE(balance, 0) != 0
+    ''')
+
+def m004_epoch_columns(cur):
+    """Matnli sanalar yoniga INTEGER epoch ustunlar va ular bo'yicha indekslar"""
+    _add_column(cur, "results", "date_ts", "INTEGER")
+    _add_column(cur, "payments", "created_ts", "INTEGER")
+    _add_column(cur, "subscriptions", "start_ts", "INTEGER")
+    _add_column(cur, "subscriptions", "end_ts", "INTEGER")
+    _add_column(cur, "quizzes", "created_ts", "INTEGER")
+    _add_column(cur, "quizzes", "sent_ts", "INTEGER")
+    # Kichik jadvallar shu yerda to'ldiriladi; results va payments - backfill_epoch_columns()
+    for table, column, source, modifier in EPOCH_COLUMNS:
+        if table in ("subscriptions", "quizzes"):
+            cur.execute(f"UPDATE {table} SET {column} = {_epoch_expr(source, modifier)} WHERE {source} IS NOT NULL")
+
+    cur.execute("DROP INDEX IF EXISTS idx_results_date")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_results_date_ts ON results (date_ts)")
+    cur.execute("DROP INDEX IF EXISTS idx_subscriptions_active_end")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_subscriptions_active_end_ts ON subscriptions (end_ts) WHERE is_active = 1")
+    cur.execute("DROP INDEX IF EXISTS idx_payments_pending")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payments_pending_ts ON payments (user_id, created_ts) WHERE status = 'pending'")
+    cur.execute("DROP INDEX IF EXISTS idx_quizzes_unsent")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_quizzes_unsent_ts ON quizzes (created_ts) WHERE active = 1 AND sent_to_users = 0")
+
+# (jadval, epoch ustun, matnli ustun, strftime modifikatori)
+# Bot sanalarni mahalliy vaqtda yozadi ('utc' = mahalliydan UTC ga); payments.created_at
+# esa CURRENT_TIMESTAMP - allaqachon UTC.
+EPOCH_COLUMNS = [
+    ("results", "date_ts", "date", "utc"),
+    ("payments", "created_ts", "created_at", None),
+    ("subscriptions", "start_ts", "start_date", "utc"),
+    ("subscriptions", "end_ts", "end_date", "utc"),
+    ("quizzes", "created_ts", "created_at", "utc"),
+    ("quizzes", "sent_ts", "sent_at", "utc"),
+]
+
+def _epoch_expr(source, modifier):
+    args = f"{source}, '{modifier}'" if modifier else source
+    # O'qib bo'lmaydigan sana 0 bo'ladi, aks holda backfill uni qayta-qayta oladi
+    return f"COALESCE(CAST(strftime('%s', {args}) AS INTEGER), 0)"
+
+def backfill_epoch_columns(conn, chunk_size=500, pause=0.05):
+    """results/payments epoch ustunlarini rowid oraliqlari bo'yicha kichik tranzaksiyalarda to'ldiradi.
+
+    Eng yangi qatorlardan boshlanadi (bugungi natijalar birinchi bo'lib tayyor bo'ladi),
+    har bir bo'lakdan keyin yozish qulfi bo'shatiladi. To'ldirilgan qatorlar sonini qaytaradi.
+    """
+    total = 0
+    for table, column, source, modifier in EPOCH_COLUMNS:
+        if table not in ("results", "payments"):
+            continue
+        top = conn.execute(f"SELECT MAX(rowid) FROM {table} WHERE {column} IS NULL").fetchone()[0]
+        if top is None:
+            continue
+        filled = 0
+        while top > 0:
+            cur = conn.execute(
+                f"UPDATE {table} SET {column} = {_epoch_expr(source, modifier)} "
+                f"WHERE rowid > ? AND rowid <= ? AND {column} IS NULL AND {source} IS NOT NULL",
+                (top - chunk_size, top)
+            )
+            conn.commit()
+            filled += cur.rowcount
+            top -= chunk_size
+            if pause:
+                time.sleep(pause)
+        if filled:
+            logger.info(f"🕓 {table}.{column}: {filled} ta qator to'ldirildi")
+        total += filled
+    return total
+
+def m005_state_entries(cur):
+    """user_state va answered_quizzes yozuvlari (state_persist.py): kalit va qiymat JSON"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS state_entries (
+            store TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value TEXT NOT NULL,
+            expires_ts REAL,
+            updated_ts REAL,
+            PRIMARY KEY (store, key)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_state_entries_expires ON state_entries (expires_ts)")
+
+def m006_cluster_tables(cur):
+    """Ko'p jarayonli rejim (cluster.py): lider lease'lari va kesh versiyalari"""
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            holder TEXT NOT NULL,
+            expires_ts REAL NOT NULL
+        )
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    ''')
+
+def m007_card_weights(cur):
+    """To'lov kartalari vazni (cards.py): katta vaznli karta ko'proq o'quvchiga tushadi"""
+    _add_column(cur, "bot_cards", "weight", "INTEGER NOT NULL DEFAULT 1")
+
+# Tartib muhim: ro'yxatdagi o'rni + 1 = sxema versiyasi
+MIGRATIONS = [
+    m001_base_schema,
+    m002_hot_query_indexes,
+    m003_balance_ledger,
+    m004_epoch_columns,
+    m005_state_entries,
+    m006_cluster_tables,
+    m007_card_weights,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+def get_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn):
+    """Yetishmagan migratsiyalarni qo'llaydi va qo'llanganlar sonini qaytaradi"""
+    current = get_version(conn)
+    if current >= SCHEMA_VERSION:
+        return 0
+
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None  # tranzaksiyalarni o'zimiz boshqaramiz
+    applied = 0
+    try:
+        for version in range(current + 1, SCHEMA_VERSION + 1):
+            migration = MIGRATIONS[version - 1]
+            cur = conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                # Boshqa jarayon bizdan oldin qo'llagan bo'lishi mumkin
+                if get_version(conn) >= version:
+                    cur.execute("COMMIT")
+                    continue
+                migration(cur)
+                cur.execute(f"PRAGMA user_version = {version}")
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                logger.exception(f"Migratsiya {version} ({migration.__name__}) bajarilmadi")
+                raise
+            logger.info(f"✅ Migratsiya {version} qo'llandi: {migration.__name__}")
+            applied += 1
+    finally:
+        conn.isolation_level = previous_isolation
+    return applied
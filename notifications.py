@@ -0,0 +1,153 @@
+"""Adminlarga xabarnomalar: topshiriqlar digest bo'lib, to'lovlar darhol.
+
+Imtihon paytida har bir test/uyga vazifa topshirig'i uchun har bir adminga
+alohida xabar ketardi va o'quvchi javobi shu yuborishlarni kutardi. Endi
+handler hodisani navbatga qo'yadi va darhol qaytadi; fon thread'i har bir
+admin uchun NOTIFY_DIGEST_WINDOW soniyada to'plangan hodisalarni bitta
+xabarga (har bir o'quvchi uchun "🚫" tugmasi bilan) yig'ib yuboradi.
+Oynada bitta hodisa bo'lsa - odatdagi xabar. To'lov xabarlari kutmaydi
+(urgent), lekin ular ham outbound navbati orqali ketadi.
+"""
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+from telebot import types
+
+from config import bot, ADMIN_IDS, NOTIFY_DIGEST_WINDOW, NOTIFY_DIGEST_MAX
+from outbound import outbound, INTERACTIVE, NORMAL
+
+logger = logging.getLogger(__name__)
+
+class Submission(NamedTuple):
+    user_id: int
+    student_name: str
+    caption: str  # yakka xabar matni (eski format)
+    line: str     # digestdagi qisqa qator
+
+def block_keyboard(events):
+    """Har bir o'quvchi uchun bitta "🚫" tugmasi (takrorlanmaydi)"""
+    kb = types.InlineKeyboardMarkup()
+    if len(events) == 1:
+        kb.add(types.InlineKeyboardButton("🚫 Bloklash", callback_data=f"quick_block:{events[0].user_id}"))
+        return kb
+    seen = set()
+    for event in events:
+        if event.user_id in seen:
+            continue
+        seen.add(event.user_id)
+        kb.add(types.InlineKeyboardButton(f"🚫 {event.student_name[:24]}", callback_data=f"quick_block:{event.user_id}"))
+    return kb
+
+def digest_text(events, window):
+    if len(events) == 1:
+        return events[0].caption
+    header = f"📥 {len(events)} ta topshiriq (oxirgi {int(window)} s):\n\n"
+    return header + "\n".join(event.line for event in events)
+
+class Notifier:
+    def __init__(self, window=60, max_events=20):
+        self.window = max(0.0, float(window))
+        self.max_events = max(1, int(max_events))
+        self._cond = threading.Condition()
+        self._pending = {}    # admin_id -> [Submission]
+        self._deadlines = {}  # admin_id -> digest yuboriladigan vaqt
+        self._thread = None
+        self._stopping = False
+        self.events = 0
+        self.digests = 0
+        self.urgent_sent = 0
+
+    def submission(self, user_id, student_name, caption, line, admins=None):
+        """Topshiriq hodisasi: adminlarga keyingi digest bilan ketadi (window=0 - darhol)"""
+        event = Submission(user_id, student_name or "Unknown", caption, line)
+        admins = ADMIN_IDS if admins is None else admins
+        self.events += 1
+        if self.window == 0 or self._stopping:
+            for admin_id in admins:
+                self._send(admin_id, [event])
+            return
+        with self._cond:
+            self._start()
+            now = time.monotonic()
+            for admin_id in admins:
+                events = self._pending.setdefault(admin_id, [])
+                events.append(event)
+                self._deadlines.setdefault(admin_id, now + self.window)
+                if len(events) >= self.max_events:
+                    self._deadlines[admin_id] = now
+            self._cond.notify()
+
+    def urgent(self, admin_id, text, **kwargs):
+        """Kechiktirilmaydigan xabar (to'lovlar): digest'siz, outbound'da birinchi navbatda"""
+        self.urgent_sent += 1
+        return outbound.post(admin_id, bot.send_message, admin_id, text, priority=INTERACTIVE, **kwargs)
+
+    def _send(self, admin_id, events):
+        outbound.post(admin_id, bot.send_message, admin_id, digest_text(events, self.window),
+                      reply_markup=block_keyboard(events), priority=NORMAL)
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="notifier", daemon=True)
+            self._thread.start()
+
+    def _take_due(self, now, force=False):
+        due = []
+        for admin_id, deadline in list(self._deadlines.items()):
+            if force or deadline <= now:
+                del self._deadlines[admin_id]
+                due.append((admin_id, self._pending.pop(admin_id, [])))
+        return due
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    now = time.monotonic()
+                    if self._deadlines and min(self._deadlines.values()) <= now:
+                        break
+                    self._cond.wait(min(self._deadlines.values()) - now if self._deadlines else None)
+                due = self._take_due(time.monotonic(), force=self._stopping)
+                stopping = self._stopping
+            self._flush(due)
+            if stopping:
+                return
+
+    def _flush(self, due):
+        for admin_id, events in due:
+            for start in range(0, len(events), self.max_events):
+                chunk = events[start:start + self.max_events]
+                try:
+                    self._send(admin_id, chunk)
+                    self.digests += 1
+                except Exception:
+                    logger.exception(f"Admin {admin_id} ga digest yuborilmadi")
+
+    def flush(self):
+        """Navbatdagi hamma digestlarni hozir yuboradi"""
+        with self._cond:
+            due = self._take_due(0, force=True)
+        self._flush(due)
+
+    def stop(self):
+        """To'plangan hodisalarni yuborib, thread'ni to'xtatadi"""
+        with self._cond:
+            if self._thread is None:
+                return
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "window_s": self.window,
+                "pending": sum(len(v) for v in self._pending.values()),
+                "events": self.events,
+                "digests": self.digests,
+                "urgent": self.urgent_sent,
+            }
+
+notifier = Notifier(NOTIFY_DIGEST_WINDOW, NOTIFY_DIGEST_MAX)
@@ -0,0 +1,366 @@
+"""Chiquvchi xabarlar navbati: Telegram limitlari ichida yuborish.
+
+Telegram bot uchun ~30 xabar/s va bitta chatga ~1 xabar/s ruxsat beradi,
+oshib ketsa 429 (retry_after) qaytaradi va xabar yo'qoladi. Barcha send*
+so'rovlari (bot.send_message, send_photo, send_document, ...) shu yerdan o'tadi:
+- global token bucket (OUTBOUND_RATE) va har bir chat uchun bucket
+  (OUTBOUND_CHAT_RATE, qisqa portlash OUTBOUND_CHAT_BURST); handler javoblari
+  (INTERACTIVE) OUTBOUND_INTERACTIVE_BURST gacha portlash oladi - 2-3 xabarli
+  javob har biri uchun ~1s kutib chat lane'ini to'xtatib turmaydi;
+- prioritet: INTERACTIVE (handler javoblari) > NORMAL (admin xabarnomalari)
+  > BULK (ommaviy yuborish); to'la navbatda faqat NORMAL/BULK tashlanadi;
+- 429 kelsa chat retry_after soniya to'xtatiladi va xabar qayta yuboriladi;
+- bir chatga bir vaqtda bitta so'rov, chat ichida tartib saqlanadi.
+
+Handler kodi o'zgarmaydi: install() apihelper._make_request ni o'rab oladi,
+chaqiruvchi xabar yuborilguncha kutadi. Kutmasdan yuborish:
+
+    outbound.post(admin_id, bot.send_message, admin_id, text)          # NORMAL
+    outbound.submit(chat_id, bot.send_photo, chat_id, file_id, priority=BULK)  # -> Future
+"""
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from telebot import apihelper
+
+from config import (
+    OUTBOUND_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_INTERACTIVE_BURST,
+    OUTBOUND_QUEUE_SIZE, OUTBOUND_WORKERS, OUTBOUND_MAX_RETRIES,
+)
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE, NORMAL, BULK = 0, 1, 2
+PRIORITY_NAMES = ("interactive", "normal", "bulk")
+
+# Chatga xabar yuboradigan (limitlanadigan) Bot API metodlari
+SEND_METHODS = frozenset({
+    "sendMessage", "sendPhoto", "sendDocument", "sendVideo", "sendAudio", "sendVoice",
+    "sendAnimation", "sendVideoNote", "sendMediaGroup", "sendSticker", "sendLocation",
+    "sendContact", "sendPoll", "copyMessage", "forwardMessage",
+})
+
+_priority = contextvars.ContextVar("outbound_priority", default=INTERACTIVE)
+_inside = threading.local()  # worker ichidagi so'rov navbatga qayta tushmaydi
+
+class DroppedError(Exception):
+    """Xabar yuborilmadi: navbat to'la yoki 429 dan keyingi urinishlar tugadi"""
+
+@contextlib.contextmanager
+def priority(level):
+    """Blok ichidagi barcha yuborishlar shu prioritet bilan navbatga tushadi"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def retry_after(error):
+    """429 xatosidan retry_after (soniya), boshqa xatolar uchun None"""
+    if getattr(error, "error_code", None) != 429:
+        return None
+    parameters = (getattr(error, "result_json", None) or {}).get("parameters") or {}
+    return float(parameters.get("retry_after", 1))
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def wait_time(self, now, need=1):
+        """Bucket'da need ta token bo'lguncha kutish (0 - hozir yuborish mumkin)"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+class Job:
+    __slots__ = ("priority", "seq", "chat_id", "fn", "args", "kwargs", "future", "queued_at", "attempts")
+
+    def __init__(self, priority, seq, chat_id, fn, args, kwargs):
+        self.priority = priority
+        self.seq = seq
+        self.chat_id = chat_id
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+class Outbound:
+    def __init__(self, rate=30, chat_rate=1.0, chat_burst=1, queue_size=10000, workers=8, max_retries=3,
+                 interactive_burst=3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        # Chat bucket'i interactive_burst sig'imli; oxirgi _reserve ta token faqat INTERACTIVE uchun
+        self.interactive_burst = max(chat_burst, interactive_burst)
+        self._reserve = self.interactive_burst - chat_burst
+        self.queue_size = queue_size
+        self.workers = max(1, int(workers))
+        self.max_retries = max_retries
+        self.transport = None  # asl apihelper._make_request (install() dan keyin)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._global = TokenBucket(rate, max(1, rate), time.monotonic())
+        self._chats = {}      # chat_id -> TokenBucket
+        self._queues = {}     # chat_id -> heap[(priority, seq, Job)]
+        self._ready = []      # heap[(priority, seq, chat_id)] - navbatdagi chat boshlari
+        self._delayed = []    # heap[(vaqt, chat_id)] - limit yoki retry_after kutayotgan chatlar
+        self._waiting = set()  # _delayed dagi chatlar
+        self._busy = set()     # so'rovi ketayotgan chatlar
+        self._pool = None
+        self._thread = None
+        self._stopping = False
+        self._pruned = time.monotonic()
+        self.depth = 0
+        self.depth_by_priority = [0, 0, 0]
+        self.max_depth = 0
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+        self.retried = 0
+        self.throttled = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    # --- navbatga qo'yish ---
+
+    def install(self):
+        """apihelper._make_request ni navbat orqali o'tadigan qiladi (bir marta)"""
+        with self._cond:
+            if self.transport is None:
+                self.transport = apihelper._make_request
+                apihelper._make_request = self.make_request
+
+    def make_request(self, token, method_name, method="get", params=None, files=None):
+        if getattr(_inside, "active", False) or method_name not in SEND_METHODS or not params or "chat_id" not in params:
+            return self.transport(token, method_name, method, params, files)
+        return self.submit(params["chat_id"], self.transport, token, method_name, method, params, files).result()
+
+    def submit(self, chat_id, fn, *args, priority=None, **kwargs):
+        """fn(*args, **kwargs) ni chat navbatiga qo'yadi -> Future (natija yoki istisno)"""
+        level = _priority.get() if priority is None else priority
+        chat_id = str(chat_id)
+        job = Job(level, next(self._seq), chat_id, fn, args, kwargs)
+        with self._cond:
+            if self._stopping:
+                self.dropped += 1
+                job.future.set_exception(DroppedError("Bot to'xtatilmoqda"))
+                return job.future
+            if level != INTERACTIVE and self.depth >= self.queue_size:
+                self.dropped += 1
+                job.future.set_exception(DroppedError(f"Chiquvchi navbat to'la ({self.depth})"))
+                return job.future
+            self._start()
+            queue = self._queues.setdefault(chat_id, [])
+            heapq.heappush(queue, (level, job.seq, job))
+            self.depth += 1
+            self.depth_by_priority[level] += 1
+            self.max_depth = max(self.max_depth, self.depth)
+            # Chat kutmayotgan bo'lsa va bu ish uning yangi boshi bo'lsa - rejalashtiramiz
+            if chat_id not in self._busy and chat_id not in self._waiting and queue[0][2] is job:
+                heapq.heappush(self._ready, (level, job.seq, chat_id))
+                self._cond.notify()
+        return job.future
+
+    def post(self, chat_id, fn, *args, priority=NORMAL, **kwargs):
+        """Kutmasdan yuboradi; xato bo'lsa log qilinadi"""
+        future = self.submit(chat_id, fn, *args, priority=priority, **kwargs)
+
+        def log_failure(done):
+            error = done.exception()
+            if error is not None:
+                logger.warning(f"{chat_id} ga xabar yuborilmadi: {error}")
+        future.add_done_callback(log_failure)
+        return future
+
+    def wrap_async(self, process_request):
+        """asyncio_helper._process_request uchun o'ram (aio runtime): send* so'rovlari shu navbatdan"""
+        async def limited(token, url, method="get", params=None, files=None, **kwargs):
+            if url not in SEND_METHODS or not params or "chat_id" not in params:
+                return await process_request(token, url, method, params, files, **kwargs)
+            loop = asyncio.get_running_loop()
+
+            def run():
+                return asyncio.run_coroutine_threadsafe(
+                    process_request(token, url, method, params, files, **kwargs), loop
+                ).result()
+            return await asyncio.wrap_future(self.submit(params["chat_id"], run))
+        return limited
+
+    # --- dispatcher ---
+
+    def _start(self):
+        if self._thread is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="outbound-send")
+            self._thread = threading.Thread(target=self._loop, name="outbound", daemon=True)
+            self._thread.start()
+
+    def _bucket(self, chat_id, now):
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.chat_rate, self.interactive_burst, now)
+        return bucket
+
+    def _prune(self, now):
+        # To'lgan (uzoq jim) chat bucket'lari kerak emas - lug'at o'smasin
+        for chat_id, bucket in list(self._chats.items()):
+            if chat_id not in self._queues and chat_id not in self._busy and bucket.wait_time(now) == 0 \
+                    and bucket.tokens >= bucket.capacity:
+                del self._chats[chat_id]
+        self._pruned = now
+
+    def _schedule_head(self, chat_id):
+        queue = self._queues.get(chat_id)
+        if queue:
+            level, seq, _ = queue[0]
+            heapq.heappush(self._ready, (level, seq, chat_id))
+
+    def _loop(self):
+        with self._cond:
+            while not self._stopping:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, chat_id = heapq.heappop(self._delayed)
+                    self._waiting.discard(chat_id)
+                    self._schedule_head(chat_id)
+                if now - self._pruned > 60:
+                    self._prune(now)
+                if not self._ready:
+                    self._cond.wait(self._delayed[0][0] - now if self._delayed else None)
+                    continue
+                level, seq, chat_id = self._ready[0]
+                queue = self._queues.get(chat_id)
+                if not queue or chat_id in self._busy or chat_id in self._waiting or queue[0][1] != seq:
+                    heapq.heappop(self._ready)  # eskirgan yozuv
+                    continue
+                need = 1 if level == INTERACTIVE else 1 + self._reserve
+                wait = self._bucket(chat_id, now).wait_time(now, need)
+                if wait > 0:
+                    heapq.heappop(self._ready)
+                    heapq.heappush(self._delayed, (now + wait, chat_id))
+                    self._waiting.add(chat_id)
+                    self.throttled += 1
+                    continue
+                wait = self._global.wait_time(now)
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._ready)
+                _, _, job = heapq.heappop(queue)
+                if not queue:
+                    del self._queues[chat_id]
+                self._global.take()
+                self._chats[chat_id].take()
+                self._busy.add(chat_id)
+                self.depth -= 1
+                self.depth_by_priority[job.priority] -= 1
+                self._pool.submit(self._execute, job)
+
+    def stop(self, timeout=5.0):
+        """Navbatdagilarni ko'pi bilan timeout soniya yuboradi, qolganlari DroppedError bilan tugaydi"""
+        if self._thread is None:
+            return
+        deadline = time.monotonic() + timeout
+        while (self.depth or self._busy) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+        with self._cond:
+            left = [job for queue in self._queues.values() for _, _, job in queue]
+            self._queues.clear()
+            self._ready.clear()
+            self._delayed.clear()
+            self._waiting.clear()
+            self.dropped += len(left)
+            self.depth = 0
+            self.depth_by_priority = [0, 0, 0]
+        for job in left:
+            job.future.set_exception(DroppedError("Bot to'xtatildi"))
+        if left:
+            logger.warning(f"Chiquvchi navbatda {len(left)} ta xabar yuborilmay qoldi")
+
+    def _execute(self, job):
+        _inside.active = True
+        try:
+            result = job.fn(*job.args, **job.kwargs)
+        except Exception as e:
+            pause = retry_after(e)
+            if pause is not None and job.attempts < self.max_retries:
+                job.attempts += 1
+                logger.warning(f"429: {job.chat_id} ga {pause:g}s dan keyin qayta yuboriladi ({job.attempts})")
+                self._finish(job, requeue=True, pause=pause)
+                return
+            self._finish(job, error=e)
+            job.future.set_exception(DroppedError(f"429: urinishlar tugadi ({e})") if pause is not None else e)
+            return
+        finally:
+            _inside.active = False
+        self._finish(job)
+        job.future.set_result(result)
+
+    def _finish(self, job, requeue=False, pause=0.0, error=None):
+        with self._cond:
+            chat_id = job.chat_id
+            self._busy.discard(chat_id)
+            if requeue:
+                self.retried += 1
+                heapq.heappush(self._queues.setdefault(chat_id, []), (job.priority, job.seq, job))
+                self.depth += 1
+                self.depth_by_priority[job.priority] += 1
+            elif error is not None:
+                if retry_after(error) is not None:
+                    self.dropped += 1
+                else:
+                    self.failed += 1
+            else:
+                wait = time.monotonic() - job.queued_at
+                self.sent += 1
+                self._wait_total += wait
+                self.max_wait = max(self.max_wait, wait)
+            if pause:
+                heapq.heappush(self._delayed, (time.monotonic() + pause, chat_id))
+                self._waiting.add(chat_id)
+            else:
+                self._schedule_head(chat_id)
+            self._cond.notify()
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "queued": self.depth,
+                "max_queued": self.max_depth,
+                "sent": self.sent,
+                "failed": self.failed,
+                "dropped": self.dropped,
+                "retried_429": self.retried,
+                "throttled": self.throttled,
+                "avg_wait_ms": round(self._wait_total / self.sent * 1000, 2) if self.sent else 0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+            for name, depth in zip(PRIORITY_NAMES, self.depth_by_priority):
+                stats[f"queued_{name}"] = depth
+            return stats
+
+outbound = Outbound(
+    OUTBOUND_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST,
+    OUTBOUND_QUEUE_SIZE, OUTBOUND_WORKERS, OUTBOUND_MAX_RETRIES,
+    interactive_burst=OUTBOUND_INTERACTIVE_BURST,
+)
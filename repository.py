@@ -0,0 +1,229 @@
+"""Jadval qatorlari uchun tiplangan obyektlar va nomlangan so'rovlar.
+
+Handlerlar query_db dan kelgan tuple'larni indeks bo'yicha ochish o'rniga shu
+yerdagi funksiyalardan foydalanadi. So'rovlar o'zgarmas satrlar - sqlite3 har
+bir ulanishda ularni statement cache'dan qayta ishlatadi (qayta parse yo'q).
+Qatorlar NamedTuple: __slots__ = (), dict'siz va tuple kabi arzon. Har bir
+update'da ishlaydigan sahifalar (foydalanuvchi natijalari) esa iter_rows
+orqali kursordan oddiy tuple'larni oqim bilan o'qiydi - qator obyektlari va
+butun natija ro'yxati xotirada yig'ilmaydi.
+"""
+import logging
+import sqlite3
+from typing import NamedTuple
+
+from database import get_connection
+
+logger = logging.getLogger(__name__)
+
+class User(NamedTuple):
+    chat_id: str
+    student_name: str
+    username: str
+    updated_at: str
+    name_changes: int
+    balance: int
+
+class Test(NamedTuple):
+    test_id: str
+    test_name: str
+    correct_answers: str
+    created_at: str
+    is_homework: int
+
+    @property
+    def is_homework_test(self):
+        return is_homework_test(self.test_id, self.is_homework)
+
+class Result(NamedTuple):
+    student_name: str
+    username: str
+    tg_id: str
+    test_id: str
+    correct_count: int
+    incorrect_count: int
+    date: str
+
+class TestAttempt(NamedTuple):
+    """Bitta test bo'yicha urinish (admin natijalari va PDF shu tartibni kutadi)"""
+    student_name: str
+    username: str
+    tg_id: str
+    correct_count: int
+    incorrect_count: int
+    date: str
+
+class UserResult(NamedTuple):
+    """Foydalanuvchi natijasi test nomi bilan birga (results LEFT JOIN tests)"""
+    test_id: str
+    correct_count: int
+    incorrect_count: int
+    date: str
+    test_name: str
+    is_homework: int
+
+    @property
+    def is_homework_test(self):
+        return is_homework_test(self.test_id, self.is_homework)
+
+class Quiz(NamedTuple):
+    id: int
+    file_path: str
+    file_id: str
+    correct_answer: str
+    active: int
+    created_at: str
+    sent_at: str
+    hours_remaining: int
+    sent_to_users: int
+
+class Payment(NamedTuple):
+    id: int
+    user_id: str
+    username: str
+    student_name: str
+    amount: int
+    status: str
+    card_number: str
+    payment_date: str
+    verified_date: str
+    verified_by: str
+    created_at: str
+
+class Subscription(NamedTuple):
+    id: int
+    user_id: str
+    username: str
+    student_name: str
+    subscription_type: str
+    price: int
+    start_date: str
+    end_date: str
+    is_active: int
+    payment_id: int
+    created_at: str
+
+def is_homework_test(test_id, is_homework):
+    """Uyga vazifa: bazadagi belgi yoki 5 xonali raqamli ID (eski yozuvlar)"""
+    test_id = str(test_id)
+    return is_homework == 1 or (len(test_id) == 5 and test_id.isdigit())
+
+def _cols(row_type, alias=None):
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(prefix + f for f in row_type._fields)
+
+# Nomlangan so'rovlar: (SQL, qator tipi)
+QUERIES = {
+    "user": (f"SELECT {_cols(User)} FROM users WHERE chat_id = ?", User),
+    "test": (f"SELECT {_cols(Test)} FROM tests WHERE test_id = ?", Test),
+    "tests": (f"SELECT {_cols(Test)} FROM tests ORDER BY created_at ASC", Test),
+    "test_results": (f"SELECT {_cols(TestAttempt)} FROM all_results WHERE test_id = ? ORDER BY id ASC", TestAttempt),
+    "test_results_recent": (f"SELECT {_cols(TestAttempt)} FROM all_results WHERE test_id = ? ORDER BY date DESC", TestAttempt),
+    "user_results_by_test": (
+        "SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.test_name, t.is_homework "
+        "FROM all_results r LEFT JOIN tests t ON r.test_id = t.test_id "
+        "WHERE (r.username = ? OR r.tg_id = ?) ORDER BY r.test_id ASC, r.date ASC",
+        UserResult,
+    ),
+    "user_results_recent": (
+        "SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.test_name, t.is_homework "
+        "FROM all_results r LEFT JOIN tests t ON r.test_id = t.test_id "
+        "WHERE (r.username = ? OR r.tg_id = ?) ORDER BY r.date DESC",
+        UserResult,
+    ),
+    "quiz": (f"SELECT {_cols(Quiz)} FROM quizzes WHERE id = ?", Quiz),
+    "payment": (f"SELECT {_cols(Payment)} FROM payments WHERE id = ?", Payment),
+    "subscription": (f"SELECT {_cols(Subscription)} FROM subscriptions WHERE user_id = ?", Subscription),
+}
+
+def load_all(name, params=()):
+    """fetch_all kabi, lekin sqlite3.Error chaqiruvchiga o'tadi (keshlar xatoni bo'sh natijadan ajratadi)"""
+    sql, row_type = QUERIES[name]
+    make = row_type._make
+    cur = get_connection().cursor()
+    # Qatorlar to'g'ridan-to'g'ri tipga aylanadi - oraliq tuple ro'yxati yo'q
+    cur.row_factory = lambda _, row: make(row)
+    return cur.execute(sql, params).fetchall()
+
+def fetch_all(name, params=()):
+    """Nomlangan so'rov natijasi - qator obyektlari ro'yxati (xatoda bo'sh ro'yxat)"""
+    try:
+        return load_all(name, params)
+    except sqlite3.Error:
+        logger.exception(f"Repository so'rovi bajarilmadi: {name}")
+        return []
+
+def iter_rows(name, params=()):
+    """Nomlangan so'rov qatorlari oddiy tuple sifatida, kursordan oqim bilan (xatoda bo'sh).
+
+    Ustunlar tartibi QUERIES dagi qator tipi maydonlari bilan bir xil.
+    """
+    sql, _ = QUERIES[name]
+    try:
+        return get_connection().execute(sql, params)
+    except sqlite3.Error:
+        logger.exception(f"Repository so'rovi bajarilmadi: {name}")
+        return iter(())
+
+def fetch_one(name, params=()):
+    rows = fetch_all(name, params)
+    return rows[0] if rows else None
+
+def get_user(chat_id):
+    return fetch_one("user", (str(chat_id),))
+
+def get_test(test_id):
+    return fetch_one("test", (test_id,))
+
+def get_tests(test_ids):
+    """Bir nechta testni bitta so'rovda oladi: {test_id: Test}"""
+    test_ids = list(dict.fromkeys(test_ids))
+    if not test_ids:
+        return {}
+    result = {}
+    # SQLite parametrlar chegarasi (eski versiyalarda 999)
+    for i in range(0, len(test_ids), 500):
+        chunk = test_ids[i:i + 500]
+        sql = f"SELECT {_cols(Test)} FROM tests WHERE test_id IN ({', '.join('?' * len(chunk))})"
+        try:
+            rows = get_connection().execute(sql, chunk).fetchall()
+        except sqlite3.Error:
+            logger.exception("Testlarni olishda xatolik")
+            continue
+        for r in rows:
+            test = Test._make(r)
+            result[test.test_id] = test
+    return result
+
+def get_test_results(test_id, recent_first=False):
+    return fetch_all("test_results_recent" if recent_first else "test_results", (test_id,))
+
+def get_user_results(tg_id, username=None, recent_first=False):
+    """Foydalanuvchining barcha natijalari test nomi bilan (username bo'lmasa faqat tg_id bo'yicha)"""
+    name = "user_results_recent" if recent_first else "user_results_by_test"
+    return fetch_all(name, (username, str(tg_id)))
+
+def get_user_attempts(tg_id, username=None, homework=False, recent_first=False):
+    """Natijalar sahifasi uchun: {test_id: (test_name, [(correct, incorrect, date), ...])}
+
+    homework=True - faqat uyga vazifalar, False - faqat testlar.
+    """
+    name = "user_results_recent" if recent_first else "user_results_by_test"
+    grouped = {}
+    for test_id, correct, incorrect, date, test_name, is_homework in iter_rows(name, (username, str(tg_id))):
+        if is_homework_test(test_id, is_homework) != homework:
+            continue
+        entry = grouped.get(test_id)
+        if entry is None:
+            entry = grouped[test_id] = (test_name, [])
+        entry[1].append((correct, incorrect, date))
+    return grouped
+
+def get_quiz(quiz_id):
+    return fetch_one("quiz", (quiz_id,))
+
+def get_payment(payment_id):
+    return fetch_one("payment", (payment_id,))
+
+def get_subscription(user_id):
+    return fetch_one("subscription", (str(user_id),))
@@ -0,0 +1,185 @@
+"""Natijalarni guruhlab yozuvchi (write-behind) thread.
+
+Imtihon paytida har bir topshiriq uchun alohida INSERT + commit (WAL fsync)
+o'rniga qatorlar navbatga qo'yiladi va bitta tranzaksiyada partiya bilan
+yoziladi: partiya hajmi (batch_size) to'lganda yoki vaqt oynasi (window)
+tugaganda. O'chirilgan bo'lsa submit() darhol sinxron yozadi.
+"""
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+INSERT_RESULT = (
+    "INSERT INTO results (student_name, username, tg_id, test_id, correct_count, incorrect_count, date, date_ts) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+_STOP = object()
+
+class ResultWriter:
+    def __init__(self, batch_size=50, window=0.5):
+        self.batch_size = max(1, int(batch_size))
+        self.window = max(0.0, float(window))
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._committed = threading.Condition(self._lock)
+        self._pending = {}  # tg_id -> hali commit qilinmagan qatorlar soni
+        self._flush_now = threading.Event()
+        # Statistika
+        self._latencies = deque(maxlen=1000)
+        self._submitted = 0
+        self._written = 0
+        self._commits = 0
+        self._failed = 0
+        self._started_at = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="result-writer", daemon=True)
+        self._thread.start()
+        logger.info(f"📝 Natijalar yozuvchisi ishga tushdi (batch={self.batch_size}, window={self.window}s)")
+
+    def stop(self, timeout=10):
+        """Navbatdagi barcha qatorlarni yozib, threadni to'xtatadi"""
+        if not self.running:
+            return
+        self._queue.put(_STOP)
+        self._flush_now.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"📝 Natijalar yozuvchisi to'xtadi: {self.stats()}")
+
+    def submit(self, row):
+        """row: INSERT_RESULT tartibidagi tuple. Writer ishlamasa darhol yoziladi"""
+        if not self.running:
+            from database import query_db
+            query_db(INSERT_RESULT, row)
+            return
+        tg_id = row[2]
+        with self._lock:
+            self._pending[tg_id] = self._pending.get(tg_id, 0) + 1
+            self._submitted += 1
+        self._queue.put((time.monotonic(), row))
+
+    def wait_for_user(self, tg_id, timeout=5):
+        """Read-your-own-writes: foydalanuvchining navbatdagi natijalari yozilguncha kutadi"""
+        if not self.running:
+            return True
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            if not self._pending.get(tg_id):
+                return True
+            self._flush_now.set()
+            while self._pending.get(tg_id):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._committed.wait(remaining)
+        return True
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.monotonic() - self._started_at if self._started_at else 0
+            return {
+                "queued": self._queue.qsize(),
+                "submitted": self._submitted,
+                "written": self._written,
+                "failed": self._failed,
+                "commits": self._commits,
+                "avg_batch": round(self._written / self._commits, 1) if self._commits else 0,
+                "commits_per_sec": round(self._commits / uptime, 3) if uptime else 0,
+                "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 1) if latencies else 0,
+                "latency_p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1) if latencies else 0,
+            }
+
+    def _collect(self):
+        """Bitta partiyani yig'adi: (qatorlar, to'xtash kerakmi)"""
+        batch = []
+        stop = False
+        item = self._queue.get()
+        if item is _STOP:
+            stop = True
+        else:
+            batch.append(item)
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            if stop or self._flush_now.is_set():
+                # Darhol yozish so'raldi - navbatda borini olib yuboramiz
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=min(remaining, 0.05))
+                except queue.Empty:
+                    continue
+            if item is _STOP:
+                stop = True
+                continue
+            batch.append(item)
+        self._flush_now.clear()
+        return batch, stop
+
+    def _write(self, batch):
+        from database import get_connection, discard_connection
+        rows = [row for _, row in batch]
+        conn = get_connection()
+        commits = failed = 0
+        try:
+            conn.executemany(INSERT_RESULT, rows)
+            conn.commit()
+            commits = 1
+        except sqlite3.Error:
+            logger.exception("Natijalar partiyasini yozishda xatolik, qatorlar alohida yoziladi")
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                discard_connection()
+                conn = get_connection()
+            for row in rows:
+                try:
+                    conn.execute(INSERT_RESULT, row)
+                    conn.commit()
+                    commits += 1
+                except sqlite3.Error:
+                    logger.exception(f"Natija yozilmadi: {row}")
+                    conn.rollback()
+                    failed += 1
+        now = time.monotonic()
+        with self._lock:
+            for enqueued_at, row in batch:
+                self._latencies.append(now - enqueued_at)
+                left = self._pending.get(row[2], 0) - 1
+                if left > 0:
+                    self._pending[row[2]] = left
+                else:
+                    self._pending.pop(row[2], None)
+            self._written += len(rows) - failed
+            self._failed += failed
+            self._commits += commits
+            self._committed.notify_all()
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write(batch)
+            if stop:
+                break
@@ -0,0 +1,149 @@
+"""Xabar handlerlari uchun indekslangan router.
+
+telebot har bir xabar uchun barcha `message_handler` predikatlarini ro'yxat
+tartibida tekshiradi. Router esa handlerlarni komanda, aniq tugma matni va
+`user_state` dagi step bo'yicha lug'atlarda saqlaydi: xabar kelganda faqat
+shu kalitlarga tegishli nomzodlar va indekslanmagan (faqat func bilan)
+handlerlar ko'riladi. Ro'yxatdan o'tish tartibi saqlanadi - birinchi mos
+kelgan handler ishlaydi, xuddi telebot'dagidek.
+
+    @router.message_handler(text="💰 Balans", func=lambda m: m.from_user.id in ADMIN_IDS)
+    @router.message_handler(step="get_test_name")
+    @router.message_handler(commands=["start"])
+
+Telebot'ga bitta umumiy handler router.install(bot) orqali qo'shiladi.
+"""
+import itertools
+import logging
+import operator
+
+from telebot import util
+
+from config import user_state
+
+logger = logging.getLogger(__name__)
+
+_seq = operator.attrgetter("seq")
+
+def _as_tuple(value):
+    if value is None:
+        return ()
+    if isinstance(value, str):
+        return (value,)
+    return tuple(value)
+
+class Route:
+    __slots__ = ("seq", "callback", "commands", "texts", "steps", "func", "content_types")
+
+    def __init__(self, seq, callback, commands, texts, steps, func, content_types):
+        self.seq = seq
+        self.callback = callback
+        self.commands = commands
+        self.texts = texts
+        self.steps = steps
+        self.func = func
+        self.content_types = content_types
+
+    def matches(self, message, step):
+        if message.content_type not in self.content_types:
+            return False
+        if self.commands and util.extract_command(message.text) not in self.commands:
+            return False
+        if self.texts and message.text not in self.texts:
+            return False
+        if self.steps and step not in self.steps:
+            return False
+        return self.func is None or bool(self.func(message))
+
+    def __repr__(self):
+        return f"<Route {self.seq} {self.callback.__module__}.{self.callback.__name__}>"
+
+class Router:
+    def __init__(self):
+        self._seq = itertools.count()
+        self.routes = []
+        self._by_command = {}
+        self._by_text = {}
+        self._by_step = {}
+        self._generic = {}  # content_type -> indekslanmagan handlerlar
+        self.content_types = set()
+
+    def message_handler(self, commands=None, text=None, step=None, func=None, content_types=None):
+        """telebot.message_handler o'rniga: text/step/commands bo'yicha indekslanadi, func - qo'shimcha shart"""
+        def decorator(callback):
+            route = Route(
+                next(self._seq), callback, _as_tuple(commands), _as_tuple(text), _as_tuple(step), func,
+                _as_tuple(content_types) or ("text",)
+            )
+            self.add(route)
+            return callback
+        return decorator
+
+    def add(self, route):
+        self.routes.append(route)
+        self.content_types.update(route.content_types)
+        # Eng tanlangan kalit bo'yicha bitta indeksga qo'yiladi, qolgan shartlar matches() da.
+        # Step matndan oldin: "⬅️ Orqaga" kabi umumiy tugmalar ko'p step handlerlarida takrorlanadi
+        if route.commands:
+            for command in route.commands:
+                self._by_command.setdefault(command, []).append(route)
+        elif route.steps:
+            for step in route.steps:
+                self._by_step.setdefault(step, []).append(route)
+        elif route.texts:
+            for text in route.texts:
+                self._by_text.setdefault(text, []).append(route)
+        else:
+            for content_type in route.content_types:
+                self._generic.setdefault(content_type, []).append(route)
+
+    def _candidates(self, message, step):
+        lists = []
+        text = message.text
+        if text is not None:
+            if text.startswith("/"):
+                command = util.extract_command(text)
+                if command in self._by_command:
+                    lists.append(self._by_command[command])
+            if text in self._by_text:
+                lists.append(self._by_text[text])
+        if step is not None and step in self._by_step:
+            lists.append(self._by_step[step])
+        generic = self._generic.get(message.content_type)
+        if generic:
+            lists.append(generic)
+        if len(lists) == 1:
+            return lists[0]
+        # Ro'yxatlar kichik (bir necha element) - heapq.merge generatoridan ko'ra sorted() arzon
+        return sorted(itertools.chain.from_iterable(lists), key=_seq)
+
+    def resolve(self, message):
+        """Xabarga mos birinchi Route (yoki None)"""
+        state = user_state.get(message.chat.id)
+        step = state.get("step") if state else None
+        for route in self._candidates(message, step):
+            if route.matches(message, step):
+                return route
+        return None
+
+    def resolve_linear(self, message):
+        """Indekssiz tekshirish (telebot usuli) - benchmark va tekshiruv uchun"""
+        state = user_state.get(message.chat.id)
+        step = state.get("step") if state else None
+        for route in self.routes:
+            if route.matches(message, step):
+                return route
+        return None
+
+    def dispatch(self, message):
+        route = self.resolve(message)
+        if route is not None:
+            route.callback(message)
+
+    def install(self, bot):
+        """Barcha ro'yxatdagi content type'lar uchun telebot'ga bitta handler qo'shadi"""
+        bot.message_handler(func=lambda m: True, content_types=sorted(self.content_types))(self.dispatch)
+        logger.info(f"🧭 Router: {len(self.routes)} ta handler, indekslanmagan: "
+                    f"{sum(len(v) for v in self._generic.values())}")
+
+router = Router()
@@ -0,0 +1,143 @@
+"""Suhbat holatlarini SQLite'da saqlash (STATE_PERSIST=1).
+
+Har deployda restart user_state'ni o'chirib yuborardi: test javoblarini
+yoki to'lov tasdig'ini yuborayotgan o'quvchi boshidan boshlardi, viktorina
+javoblari ham unutilardi. StatePersister user_state va answered_quizzes ni
+state_entries jadvaliga bog'laydi:
+- ishga tushishda hech narsa o'qilmaydi - chat birinchi murojaat qilganda
+  uning yozuvi bitta PK so'rovi bilan yuklanadi;
+- o'zgarishlar xotirada to'planadi va har STATE_FLUSH_INTERVAL soniyada
+  bitta tranzaksiyada (db_executor writer thread'ida) yoziladi - bir chatga
+  oraliqda nechta murojaat bo'lmasin, bitta UPSERT;
+- stop() qolganlarini yozadi (shutdown'da DB yopilishidan oldin).
+Muddati o'tgan qatorlar daqiqada bir idx_state_entries_expires orqali o'chiriladi.
+"""
+import json
+import logging
+import threading
+import time
+
+from config import user_state, answered_quizzes, STATE_FLUSH_INTERVAL
+from database import query_db, transaction
+from db_executor import db_executor
+
+logger = logging.getLogger(__name__)
+
+LOAD_ENTRY = "SELECT value, expires_ts FROM state_entries WHERE store = ? AND key = ?"
+UPSERT_ENTRY = (
+    "INSERT INTO state_entries (store, key, value, expires_ts, updated_ts) VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (store, key) DO UPDATE SET value = excluded.value, expires_ts = excluded.expires_ts, "
+    "updated_ts = excluded.updated_ts"
+)
+DELETE_ENTRY = "DELETE FROM state_entries WHERE store = ? AND key = ?"
+PURGE_EXPIRED = "DELETE FROM state_entries WHERE expires_ts <= ?"
+PURGE_INTERVAL = 60  # o'zgarish bo'lmasa ham shuncha soniyada bir eskirganlar o'chiriladi
+
+class StatePersister:
+    def __init__(self, stores, interval=2.0):
+        self.stores = list(stores)
+        self.interval = max(0.1, float(interval))
+        self._thread = None
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self.loads = 0
+        self.load_hits = 0
+        self.flushes = 0
+        self.written = 0
+        self.deleted = 0
+        self.purged = 0
+        self.last_flush_ms = 0.0
+        self._purged_at = 0.0
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def load(self, store_name, key_json):
+        """StateStore uchun: (value, expires_ts) yoki None"""
+        self.loads += 1
+        rows = query_db(LOAD_ENTRY, (store_name, key_json), fetch=True)
+        if not rows:
+            return None
+        self.load_hits += 1
+        value_json, expires_ts = rows[0]
+        return json.loads(value_json), expires_ts
+
+    def start(self):
+        for store in self.stores:
+            store.persist(self)
+        self._thread = threading.Thread(target=self._run, name="state-persist", daemon=True)
+        self._thread.start()
+        names = ", ".join(store.name for store in self.stores)
+        logger.info(f"💾 Holatlar SQLite'da saqlanadi ({names}), flush har {self.interval}s")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Holatlarni yozishda xatolik")
+
+    @staticmethod
+    def _write(batches, now, purge):
+        with transaction() as conn:
+            for name, rows, deletes in batches:
+                if rows:
+                    conn.executemany(UPSERT_ENTRY, [(name, key, value, expires_ts, now) for key, value, expires_ts in rows])
+                if deletes:
+                    conn.executemany(DELETE_ENTRY, [(name, key) for key in deletes])
+            return conn.execute(PURGE_EXPIRED, (now,)).rowcount if purge else 0
+
+    def flush(self):
+        """Dirty yozuvlarni bitta tranzaksiyada yozadi, yozilganlar sonini qaytaradi"""
+        with self._flush_lock:
+            start = time.perf_counter()
+            batches = [(store.name, *store.take_dirty()) for store in self.stores]
+            now = time.time()
+            purge = now - self._purged_at >= PURGE_INTERVAL
+            if not purge and not any(rows or deletes for _, rows, deletes in batches):
+                return 0
+            try:
+                self.purged += db_executor.call(self._write, batches, now, purge, write=True).result()
+                if purge:
+                    self._purged_at = now
+            except Exception:
+                # Yozilmadi - keyingi flush'da qayta urinamiz
+                for store in self.stores:
+                    store.requeue()
+                raise
+            finally:
+                for store in self.stores:
+                    store.flushed()
+            written = sum(len(rows) for _, rows, _ in batches)
+            self.written += written
+            self.deleted += sum(len(deletes) for _, _, deletes in batches)
+            self.flushes += 1
+            self.last_flush_ms = (time.perf_counter() - start) * 1000
+            return written
+
+    def stop(self):
+        """Fon thread'ini to'xtatib, qolgan o'zgarishlarni yozadi"""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Shutdown'da holatlarni yozib bo'lmadi")
+
+    def stats(self):
+        return {
+            "loads": self.loads,
+            "load_hits": self.load_hits,
+            "flushes": self.flushes,
+            "written": self.written,
+            "deleted": self.deleted,
+            "purged": self.purged,
+            "last_flush_ms": round(self.last_flush_ms, 1),
+        }
+
+# main.py STATE_PERSIST=1 bo'lsa start() qiladi; user_profiles DB'dan o'qiladigan kesh - saqlanmaydi
+state_persister = StatePersister((user_state, answered_quizzes), STATE_FLUSH_INTERVAL)
@@ -0,0 +1,284 @@
+"""Xotiradagi holatlar uchun chegaralangan lug'at: TTL va LRU.
+
+user_state, user_profiles va answered_quizzes oddiy dict edi - yozuvlar faqat
+aniq pop qilinganda o'chardi va bot haftalab ishlaganda xotira o'sib borardi.
+StateStore dict kabi ishlatiladi, lekin:
+- har bir yozuvning muddati bor (set/touch da beriladi, berilmasa - ttl;
+  None - muddatsiz); muddati o'tgan yozuv o'qilganda yo'q deb hisoblanadi,
+  expire() ularni o'chiradi;
+- max_size dan oshsa eng uzoq ishlatilmagan yozuv chiqarib yuboriladi (LRU);
+- stats() - yozuvlar soni, taxminiy hajm, evicted/expired hisoblagichlari.
+
+    answered_quizzes.set(key, True, ttl=3600)
+    if key in answered_quizzes: ...
+
+Barcha amallar lock ostida: handlerlar turli lane thread'larida ishlaydi.
+
+persist(backend) dan keyin (state_persist.py) store restartdan omon qoladi:
+xotirada yo'q kalit birinchi murojaatda backend'dan o'qiladi, o'zgargan
+(yoki o'qilgan - ichidagi dict o'zgargan bo'lishi mumkin) yozuvlar "dirty"
+bo'lib, take_dirty() orqali partiya bilan yoziladi. LRU chiqargan yozuv
+backend'da qoladi va keyin qayta o'qiladi.
+"""
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+_DELETE = object()  # dirty: backend'dan o'chirish
+
+stores = []  # barcha StateStore'lar (/stats va fon tozalash uchun)
+
+class StateStore(MutableMapping):
+    def __init__(self, name, max_size=0, ttl=None):
+        self.name = name
+        self.max_size = max(0, int(max_size or 0))  # 0 - cheklanmagan
+        self.ttl = ttl  # None - muddatsiz
+        self._data = OrderedDict()  # key -> value, LRU tartibida (oxirida - yangisi)
+        self._deadlines = {}  # key -> monotonic muddat (muddatsizlar yo'q)
+        self._lock = threading.RLock()
+        self.evicted = 0
+        self.expired = 0
+        self.backend = None
+        self._dirty = {}  # key -> None (xotiradagi qiymat), _DELETE yoki tayyor (value_json, expires_ts)
+        self._flushing = {}  # take_dirty() bergan, hali yozilmagan yozuvlar
+        self._known = set()  # backend'da tekshirilgan kalitlar (yo'qlari qayta so'ralmaydi)
+        stores.append(self)
+
+    def persist(self, backend):
+        """backend.load(store_name, key) -> (value, expires_ts) yoki None"""
+        self.backend = backend
+
+    def _mark(self, key, how=None):
+        if self.backend is not None:
+            self._dirty[key] = how
+
+    def _row(self, key):
+        """Backend uchun (value_json, expires_ts - epoch yoki None)"""
+        deadline = self._deadlines.get(key)
+        expires_ts = None if deadline is None else time.time() + (deadline - time.monotonic())
+        return json.dumps(self._data[key], ensure_ascii=False), expires_ts
+
+    def _load(self, key):
+        """Xotirada yo'q kalitni backend'dan o'qiydi (lock ostida); topilsa True"""
+        if self.backend is None or key in self._known:
+            return False
+        pending = self._dirty.get(key, self._flushing.get(key, _MISSING))
+        if pending is _DELETE:
+            return False
+        if pending is not _MISSING and pending is not None:
+            value_json, expires_ts = pending
+            row = (json.loads(value_json), expires_ts)
+        else:
+            row = self.backend.load(self.name, json.dumps(key))
+        if len(self._known) >= max(self.max_size, 10000) * 2:
+            self._known.clear()
+        self._known.add(key)
+        if row is None:
+            return False
+        value, expires_ts = row
+        if expires_ts is not None and expires_ts <= time.time():
+            return False
+        self._data[key] = value
+        if expires_ts is not None:
+            self._deadlines[key] = time.monotonic() + (expires_ts - time.time())
+        self._evict()
+        return True
+
+    def _alive(self, key, now=None):
+        """Yozuv bormi; muddati o'tgan bo'lsa o'chiradi (lock ostida chaqiriladi)"""
+        if key not in self._data and not self._load(key):
+            return False
+        deadline = self._deadlines.get(key)
+        if deadline is not None and deadline <= (time.monotonic() if now is None else now):
+            del self._data[key]
+            del self._deadlines[key]
+            self.expired += 1
+            return False
+        return True
+
+    def _deadline(self, key, ttl):
+        ttl = self.ttl if ttl is _MISSING else ttl
+        if ttl is None:
+            self._deadlines.pop(key, None)
+        else:
+            self._deadlines[key] = time.monotonic() + ttl
+
+    def _evict(self):
+        while self.max_size and len(self._data) > self.max_size:
+            old = next(iter(self._data))
+            if self._dirty.get(old, _MISSING) is None:
+                # Hali yozilmagan - qiymatni chiqarishdan oldin olib qolamiz
+                self._dirty[old] = self._row(old)
+            del self._data[old]
+            self._deadlines.pop(old, None)
+            self._known.discard(old)
+            self.evicted += 1
+
+    def set(self, key, value, ttl=_MISSING):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._deadline(key, ttl)
+            self._known.add(key)
+            self._mark(key)
+            self._evict()
+
+    def touch(self, key, ttl=_MISSING):
+        """Muddatni hozirdan boshlab yangilaydi (ttl=None - muddatsiz); yozuv yo'q bo'lsa False"""
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._data.move_to_end(key)
+            self._deadline(key, ttl)
+            self._mark(key)
+            return True
+
+    def __getitem__(self, key):
+        with self._lock:
+            if not self._alive(key):
+                raise KeyError(key)
+            self._data.move_to_end(key)
+            self._mark(key)
+            return self._data[key]
+
+    def __setitem__(self, key, value):
+        self.set(key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if not self._alive(key):
+                raise KeyError(key)
+            del self._data[key]
+            self._deadlines.pop(key, None)
+            self._mark(key, _DELETE)
+
+    def __contains__(self, key):
+        with self._lock:
+            return self._alive(key)
+
+    def __iter__(self):
+        return iter([key for key, _ in self.items()])
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if not self._alive(key):
+                return default
+            self._data.move_to_end(key)
+            self._mark(key)
+            return self._data[key]
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if self._alive(key):
+                self._data.move_to_end(key)
+                self._mark(key)
+                return self._data[key]
+            self.set(key, default)
+            return default
+
+    def pop(self, key, default=_MISSING):
+        with self._lock:
+            if self._alive(key):
+                self._deadlines.pop(key, None)
+                self._mark(key, _DELETE)
+                return self._data.pop(key)
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def items(self):
+        """Tirik yozuvlar nusxasi (LRU tartibiga ta'sir qilmaydi)"""
+        with self._lock:
+            now = time.monotonic()
+            return [(key, value) for key, value in list(self._data.items()) if self._alive(key, now)]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def clear(self):
+        """Faqat xotirani tozalaydi (backend'dagi yozuvlar qoladi)"""
+        with self._lock:
+            self._data.clear()
+            self._deadlines.clear()
+            self._known.clear()
+
+    def take_dirty(self):
+        """Yozilishi kerak bo'lganlar: ([(key_json, value_json, expires_ts)], [key_json]).
+
+        Yozib bo'lingach flushed() chaqiriladi.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+            rows, deletes = [], []
+            for key, how in dirty.items():
+                if how is None:
+                    if key not in self._data:
+                        # Muddati o'tgan - backend'da ham eskirgan
+                        continue
+                    try:
+                        how = self._row(key)
+                    except (TypeError, ValueError):
+                        logger.warning(f"{self.name}: {key!r} qiymati JSON emas, saqlanmadi")
+                        continue
+                if how is _DELETE:
+                    deletes.append(json.dumps(key))
+                else:
+                    rows.append((json.dumps(key), *how))
+                self._flushing[key] = how
+            return rows, deletes
+
+    def requeue(self):
+        """Yozilmay qolgan partiyani qaytaradi (undan keyingi o'zgarishlar ustun)"""
+        with self._lock:
+            for key, how in self._flushing.items():
+                self._dirty.setdefault(key, how)
+
+    def flushed(self):
+        with self._lock:
+            self._flushing.clear()
+
+    def expire(self, now=None):
+        """Muddati o'tgan yozuvlarni o'chiradi, o'chirilganlar sonini qaytaradi"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            before = self.expired
+            for key in [k for k, deadline in self._deadlines.items() if deadline <= now]:
+                self._alive(key, now)
+            return self.expired - before
+
+    def approx_bytes(self):
+        """Taxminiy hajm: kalitlar, qiymatlar va ularning bir darajali ichki elementlari"""
+        with self._lock:
+            total = sys.getsizeof(self._data) + sys.getsizeof(self._deadlines)
+            for key, value in self._data.items():
+                total += sys.getsizeof(key) + sys.getsizeof(value)
+                if isinstance(value, dict):
+                    total += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+                elif isinstance(value, (set, list, tuple)):
+                    total += sum(sys.getsizeof(v) for v in value)
+            return total
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "max_size": self.max_size or "∞",
+            "ttl_s": self.ttl if self.ttl is not None else "∞",
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "approx_kb": round(self.approx_bytes() / 1024, 1),
+            "dirty": len(self._dirty),
+        }
+
+def expire_all(now=None):
+    """Barcha store'lardagi muddati o'tgan yozuvlarni o'chiradi"""
+    return sum(store.expire(now) for store in stores)
@@ -0,0 +1,178 @@
+"""Obunalar uchun jarayon ichidagi kesh (check_subscription).
+
+check_subscription deyarli har bir o'quvchi murojaatida (require_payment,
+test javoblari, ism o'zgartirish, viktorina javobi) SELECT qilardi - ommaviy
+viktorina paytida har bir callback uchun. Kesh user_id bo'yicha obunaning
+tugash vaqtini (end_ts) saqlaydi: faol obuna shu vaqtgacha DB'siz javob
+oladi, muddati o'tgach yozuv o'zi chiqib ketadi va keyingi murojaat DB'ga
+boradi. Obunasizlar SUBSCRIPTION_NEGATIVE_TTL soniya eslab qolinadi.
+
+subscriptions jadvali o'zgarganda (to'lov tasdiqlanishi, yangilash,
+faolsizlantirish) invalidate_subscription(user_id) chaqiriladi; klasterda
+boshqa jarayonlardagi keshlar cache_versions orqali tozalanadi.
+
+Muddati o'tgan obunalarni o'quvchi so'rovi emas, SubscriptionSweeper
+faolsizlantiradi: har SUBSCRIPTION_SWEEP_INTERVAL soniyada bitta UPDATE
+(idx_subscriptions_active_end_ts bo'yicha), klasterda faqat lease egasida.
+"""
+import logging
+import threading
+import time
+
+from telebot import types
+
+from config import (
+    bot, SUBSCRIPTION_CACHE_SIZE, SUBSCRIPTION_NEGATIVE_TTL, SUBSCRIPTION_SWEEP_INTERVAL, SUBSCRIPTION_EXPIRY_NOTIFY
+)
+from cluster import cache_versions
+from database import transaction
+from db_executor import db_executor
+from outbound import outbound, BULK
+from state_store import StateStore
+
+logger = logging.getLogger(__name__)
+
+EXPIRE_DUE = "UPDATE subscriptions SET is_active = 0 WHERE is_active = 1 AND end_ts <= ? RETURNING user_id"
+
+class SubscriptionCache:
+    def __init__(self, max_size=0, negative_ttl=300):
+        self.negative_ttl = negative_ttl
+        self._entries = StateStore("subscriptions", max_size)  # user_id -> (end_ts, end_date); obunasiz - (0, None)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        """{"active": ..., "end_date": ...} yoki None - keshda yo'q, DB'dan o'qish kerak"""
+        entry = self._entries.get(str(user_id))
+        now = time.time()
+        with self._lock:
+            if entry is None or (entry[1] is not None and entry[0] <= now):
+                self.misses += 1
+                return None
+            self.hits += 1
+        end_ts, end_date = entry
+        if end_date is None:
+            return {"active": False, "end_date": None}
+        return {"active": True, "end_date": end_date}
+
+    def generation(self):
+        """DB'dan o'qishdan oldin olinadi: shu orada invalidate bo'lsa put() natijani saqlamaydi"""
+        with self._lock:
+            return self._generation
+
+    def put(self, user_id, end_ts, end_date, generation):
+        """Faol obuna (end_ts, end_date) yoki obunasizlik (None, None)"""
+        with self._lock:
+            if generation != self._generation:
+                return
+            if end_date is None:
+                self._entries.set(str(user_id), (0, None), ttl=self.negative_ttl)
+            else:
+                self._entries.set(str(user_id), (end_ts, end_date), ttl=max(0, end_ts - time.time()))
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(str(user_id), None)
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 3) if total else 0,
+                "invalidations": self.invalidations,
+            }
+
+subscription_cache = SubscriptionCache(SUBSCRIPTION_CACHE_SIZE, SUBSCRIPTION_NEGATIVE_TTL)
+cache_versions.register("subscriptions", subscription_cache.clear)
+
+def invalidate_subscription(*user_ids):
+    """subscriptions jadvalida shu user_id qatorlari o'zgargandan keyin chaqiriladi"""
+    if cache_versions.enabled:
+        # Boshqa jarayonlarda kalit bo'yicha emas, butun kesh tozalanadi - admin amali, kamdan-kam
+        cache_versions.bump("subscriptions")
+    else:
+        for user_id in user_ids:
+            subscription_cache.invalidate(user_id)
+
+def expiry_message():
+    text = "⌛️ <b>Obunangiz muddati tugadi</b>\n\n"
+    text += "💰 Oylik to'lov: 15,000 so'm\n"
+    text += "Xizmatlardan foydalanishni davom ettirish uchun hisobingizni to'ldiring."
+    kb = types.InlineKeyboardMarkup()
+    kb.add(types.InlineKeyboardButton("💳 Hisobni to'ldirish", callback_data="topup_account"))
+    return text, kb
+
+class SubscriptionSweeper:
+    def __init__(self, interval=60, notify=False):
+        self.interval = max(1, interval)
+        self.notify = notify
+        self._thread = None
+        self.runs = 0
+        self.expired = 0
+        self.notified = 0
+        self.last_run_ms = 0.0
+
+    @staticmethod
+    def _expire(now):
+        with transaction() as conn:
+            return [row[0] for row in conn.execute(EXPIRE_DUE, (now,)).fetchall()]
+
+    def sweep(self, now=None):
+        """end_ts o'tgan barcha faol obunalarni faolsizlantiradi, ularning user_id'larini qaytaradi"""
+        start = time.perf_counter()
+        user_ids = db_executor.call(self._expire, time.time() if now is None else now, write=True).result()
+        self.runs += 1
+        self.last_run_ms = (time.perf_counter() - start) * 1000
+        if not user_ids:
+            return user_ids
+        self.expired += len(user_ids)
+        # Keshdagi yozuv end_ts da o'zi eskiradi; baribir darhol tashlaymiz
+        invalidate_subscription(*user_ids)
+        logger.info(f"⌛️ {len(user_ids)} ta obuna muddati tugadi")
+        if self.notify:
+            text, kb = expiry_message()
+            for user_id in user_ids:
+                outbound.post(user_id, bot.send_message, int(user_id), text, parse_mode="HTML", reply_markup=kb, priority=BULK)
+            self.notified += len(user_ids)
+        return user_ids
+
+    def _run(self, lease):
+        while True:
+            if lease is not None:
+                lease.wait()
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Obunalar muddatini tekshirishda xatolik")
+            time.sleep(self.interval)
+
+    def start(self, lease=None):
+        """Fon thread; lease (cluster.Lease) berilsa faqat lider jarayonda ishlaydi"""
+        self._thread = threading.Thread(target=self._run, args=(lease,), name="subscription-sweeper", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stats(self):
+        return {
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "expired": self.expired,
+            "notified": self.notified,
+            "last_run_ms": round(self.last_run_ms, 1),
+        }
+
+subscription_sweeper = SubscriptionSweeper(SUBSCRIPTION_SWEEP_INTERVAL, SUBSCRIPTION_EXPIRY_NOTIFY)
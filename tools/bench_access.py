@@ -0,0 +1,107 @@
+"""Har bir update uchun DB so'rovlari soni (obuna/blok/profil tekshiruvlari).
+
+Soxta Bot API bilan bir nechta o'quvchi odatiy amallarni bajaradi; har bir
+DB ulanishiga trace callback qo'yilib, update davomida bajarilgan SQL
+so'rovlar sanaladi. Birinchi o'tish - keshlar bo'sh (restartdan keyingi
+holat), ikkinchisi - keshlar issiq.
+
+    python tools/bench_access.py
+"""
+import os
+import re
+import threading
+import time
+
+from benchutil import setup_env, report
+from check_webhook import FakeBotAPI, make_update
+from check_async import make_callback
+
+USERS = 20
+GUEST_OFFSET = 10000  # 30000 + i + GUEST_OFFSET - bazada yo'q chat_id
+# Obuna, blok va profil (ism) so'rovlari; balans kabi ish so'rovlari alohida sanalmaydi
+ACCESS_QUERY = re.compile(r"\b(FROM|JOIN)\s+(subscriptions|blocked_users)\b|\bstudent_name\s+FROM\s+users\b|\bJOIN\s+users\b", re.I)
+
+class Counter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.access = 0
+
+    def __call__(self, sql):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            return
+        with self.lock:
+            self.total += 1
+            if head == "SELECT" and ACCESS_QUERY.search(sql):
+                self.access += 1
+
+    def take(self):
+        with self.lock:
+            counts = (self.total, self.access)
+            self.total = self.access = 0
+            return counts
+
+def main():
+    setup_env()
+    api = FakeBotAPI(lambda method, params: 0)
+    os.environ.update({"BOT_API_URL": api.url, "ADMIN_IDS": ""})
+
+    import database
+    counter = Counter()
+    connect = database.connect
+
+    def traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(counter)
+        return conn
+    database.connect = traced
+
+    import main as bot_main  # noqa: F401  handlerlarni ro'yxatdan o'tkazadi
+    from telebot import types
+    from config import bot
+    from database import init_db, query_db, create_quiz, get_unsent_quiz, mark_quiz_as_sent
+
+    init_db()
+    bot.threaded = False
+    create_quiz(None, "photo-file-id", "B")
+    quiz_id = get_unsent_quiz()[0]
+    mark_quiz_as_sent(quiz_id)
+    query_db("INSERT INTO tests (test_id, test_name, correct_answers, created_at, is_homework) VALUES (?, ?, ?, ?, 0)",
+             ("T0001", "Test", "abcde", "2024-01-01 00:00:00"))
+    users = [30000 + i for i in range(USERS)]
+    query_db("INSERT INTO users (chat_id, student_name, balance) VALUES (?, ?, 0)",
+             [(str(u), f"O'quvchi {u}") for u in users], many=True)
+    query_db("INSERT INTO subscriptions (user_id, is_active, end_date, end_ts) VALUES (?, 1, ?, ?)",
+             [(str(u), "2099-01-01 00:00:00", time.time() + 86400) for u in users], many=True)
+
+    update_ids = iter(range(1, 10 ** 6))
+    actions = [
+        ("📝 Test topshirish", lambda u: make_update(next(update_ids), u, "📝 Test topshirish")),
+        ("test javoblari", lambda u: make_update(next(update_ids), u, "T0001 abcde")),
+        ("💰 Balans", lambda u: make_update(next(update_ids), u, "💰 Balans")),
+        ("📝 Uyga vazifa", lambda u: make_update(next(update_ids), u, "📝 Uyga vazifa")),
+        ("viktorina javobi", lambda u: make_callback(next(update_ids), u, f"quiz_answer:{quiz_id}:B")),
+    ]
+
+    # Ro'yxatdan o'tmagan foydalanuvchilar (users qatori yo'q): profilsizlik ham keshlanadi
+    actions.append(("profilsiz: Test topshirish", lambda u: make_update(next(update_ids), u + GUEST_OFFSET, "📝 Test topshirish")))
+
+    def run_pass():
+        rows = []
+        for name, build in actions:
+            total = access = 0
+            for user in users:
+                counter.take()
+                bot.process_new_updates([types.Update.de_json(build(user))])
+                t, a = counter.take()
+                total += t
+                access += a
+            rows.append((name, f"{total / USERS:.2f} so'rov, shundan obuna/blok/profil {access / USERS:.2f}"))
+        return rows
+
+    report(f"Bitta update uchun DB so'rovlari - sovuq keshlar ({USERS} o'quvchi)", run_pass())
+    report("Bitta update uchun DB so'rovlari - issiq keshlar", run_pass())
+
+if __name__ == "__main__":
+    main()
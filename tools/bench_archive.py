@@ -0,0 +1,77 @@
+"""Natijalarni arxivlash: compaction oldidan va keyin issiq so'rovlar.
+
+    python tools/bench_archive.py [qatorlar] [kunlar]
+
+Natijalar `kunlar` ga teng tarixga yoyiladi; 90 kundan eskilari arxivga ko'chadi.
+Ikkala o'lchov ham yangi ulanishdan boshlanadi; ulanishni ochish (ATTACH va
+TEMP view) qizdirish chaqiruvida qoladi, tezlik - 3 ta o'lchovning eng yaxshisi.
+"""
+import os
+import sys
+import time
+
+from benchutil import setup_env, rate, report
+
+setup_env()
+
+import archive  # noqa: E402
+import database  # noqa: E402
+
+def seed(rows, days):
+    now = int(time.time())
+    batch = []
+    for i in range(rows):
+        ts = now - int(days * 86400 * i / rows)
+        date = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(ts))
+        batch.append(("Bench", None, str(i % 500), f"T{i % 40:04d}", 20, 10, date, ts))
+    database.query_db(
+        "INSERT INTO results (student_name, username, tg_id, test_id, correct_count, incorrect_count, date, date_ts) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", batch, many=True
+    )
+
+def best_rate(fn, n=2000, repeat=3):
+    # Birinchi chaqiruv ulanishni ochadi (ATTACH, view, statement cache) - o'lchovga kirmaydi
+    fn()
+    return max(rate(fn, n) for _ in range(repeat))
+
+def measure():
+    today = lambda: database.query_db(
+        "SELECT COUNT(*) FROM results WHERE date_ts >= ? AND date_ts < ?", database.day_range_ts(), fetch=True)
+    history = lambda: database.query_db(
+        "SELECT COUNT(*) FROM all_results WHERE tg_id = ?", ("7",), fetch=True)
+    hot_rows = database.query_db("SELECT COUNT(*) FROM results", fetch=True)[0][0]
+    total = database.query_db("SELECT COUNT(*) FROM all_results", fetch=True)[0][0]
+    return best_rate(today), best_rate(history), hot_rows, total
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 730
+    database.init_db()
+    seed(rows, days)
+    database.close_all_connections()
+
+    before = measure()
+    conn = database.connect()
+    start = time.perf_counter()
+    moved = archive.compact_results(conn, 90, chunk_size=2000, pause=0)
+    took = time.perf_counter() - start
+    conn.execute("VACUUM")
+    conn.close()
+    database.close_all_connections()
+    after = measure()
+
+    report(f"{rows} natija, {days} kunlik tarix", [
+        ("before: today query/sec", before[0]),
+        ("before: history query/sec", before[1]),
+        ("before: hot rows", before[2]),
+        ("compaction: moved rows", moved),
+        ("compaction: seconds", took),
+        ("after: today query/sec", after[0]),
+        ("after: history query/sec", after[1]),
+        ("after: hot rows", after[2]),
+        ("after: main db bytes", os.path.getsize(os.environ["DB_FILE"])),
+        ("history rows preserved", after[3] == before[3]),
+    ])
+
+if __name__ == "__main__":
+    main()
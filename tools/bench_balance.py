@@ -0,0 +1,66 @@
+"""Parallel balans qo'shish: eski o'qish-yozish (SELECT + UPDATE) vs atomar UPSERT + jurnal.
+
+    python tools/bench_balance.py [threadlar] [har_thread_kredit]
+
+Eski usulda yo'qolgan yangilanishlar soni ham ko'rsatiladi; oxirida save_profile
+balansni saqlab qolishi va jurnal bilan mosligi tekshiriladi.
+"""
+import sys
+import threading
+import time
+
+from benchutil import setup_env, report
+
+setup_env()
+
+import database  # noqa: E402
+
+def legacy_credit(chat_id, amount):
+    """Avvalgi update_user_balance: ikki alohida so'rov"""
+    current = database.get_balance(chat_id)
+    database.query_db("UPDATE users SET balance = ? WHERE chat_id = ?", (current + amount, str(chat_id)))
+
+def run(credit, user, threads, per_thread):
+    database.save_profile(user, "Bench")
+
+    def worker():
+        for _ in range(per_thread):
+            credit(user, 100)
+        database.discard_connection()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+    return threads * per_thread / elapsed, database.get_balance(user)
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 250
+    database.init_db()
+    expected = threads * per_thread * 100
+
+    legacy_rate, legacy_balance = run(legacy_credit, "1001", threads, per_thread)
+    atomic_rate, atomic_balance = run(lambda c, a: database.update_user_balance(c, a, "bench"), "1002", threads, per_thread)
+    # Profilni saqlash (ism o'zgartirish) balansga tegmasligi kerak
+    database.save_profile("1002", "Bench (yangi ism)")
+    saved_balance = database.get_balance("1002")
+    # Eski usul jurnalga yozmaydi, shuning uchun faqat atomar foydalanuvchi tekshiriladi
+    mismatches = [m for m in database.find_balance_mismatches() if m[0] == "1002"]
+
+    report(f"{threads} thread x {per_thread} kredit (kutilgan balans {expected})", [
+        ("legacy: credits/sec", legacy_rate),
+        ("legacy: lost updates", (expected - legacy_balance) // 100),
+        ("atomic: credits/sec", atomic_rate),
+        ("atomic: lost updates", (expected - atomic_balance) // 100),
+        ("balance after save_profile", saved_balance),
+        ("ledger mismatches", len(mismatches)),
+    ])
+    if atomic_balance != expected or saved_balance != expected or mismatches:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
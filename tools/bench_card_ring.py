@@ -0,0 +1,61 @@
+"""To'lov kartalari halqasi: o'quvchilar taqsimoti va karta qo'shilganda ko'chish ulushi.
+
+Eski toq/juft usuli bilan solishtiriladi: u faqat birinchi ikki kartani
+ishlatadi, shuning uchun uchinchi karta qo'shilganda hech kim unga o'tmaydi,
+birinchi karta o'chirilganda esa hamma o'quvchi kartasini almashtiradi.
+
+    python tools/bench_card_ring.py
+"""
+from collections import Counter
+
+from benchutil import setup_env, report
+
+USERS = 100000
+
+def odd_even(cards, user_id):
+    """Eski get_card_for_user"""
+    if len(cards) == 1:
+        return cards[0]
+    return cards[0] if user_id % 2 == 1 else cards[1]
+
+def main():
+    setup_env()
+    from config import CARD_RING_REPLICAS
+    from cards import Card, Ring
+
+    def card(card_id, weight=1):
+        return Card(card_id, 0, f"9860 0000 0000 {card_id:04d}", "Egasi", "Bank", weight)
+
+    users = range(7_000_000, 7_000_000 + USERS)
+
+    def ring_of(cards):
+        ring = Ring.build(cards, CARD_RING_REPLICAS)
+        return lambda user_id: ring.lookup(user_id).id
+
+    def old_of(cards):
+        return lambda user_id: odd_even(cards, user_id).id
+
+    def share(cards, route):
+        counts = Counter(route(u) for u in users)
+        return ", ".join(f"#{c.id}: {counts[c.id] / USERS:.1%}" for c in cards)
+
+    def moved(before, after):
+        return sum(1 for u in users if before(u) != after(u)) / USERS
+
+    two, three = [card(1), card(2)], [card(1), card(2), card(3)]
+    weighted = [card(1), card(2), card(3, weight=2)]
+    report(f"Taqsimot ({USERS} o'quvchi, {CARD_RING_REPLICAS} virtual nuqta / vazn)", [
+        ("toq/juft, 3 karta", share(three, old_of(three))),
+        ("halqa, 3 karta", share(three, ring_of(three))),
+        ("halqa, vaznlar 1/1/2", share(weighted, ring_of(weighted))),
+    ])
+    report("Kartasi almashgan o'quvchilar ulushi", [
+        ("toq/juft, 2 -> 3 karta", f"{moved(old_of(two), old_of(three)):.1%}"),
+        ("halqa, 2 -> 3 karta", f"{moved(ring_of(two), ring_of(three)):.1%} (ideal {1 / 3:.1%})"),
+        ("toq/juft, 1-karta o'chirildi", f"{moved(old_of(three), old_of(three[1:])):.1%}"),
+        ("halqa, 1-karta o'chirildi", f"{moved(ring_of(three), ring_of(three[1:])):.1%} (ideal {1 / 3:.1%})"),
+        ("halqa, 3-karta vazni 1 -> 2", f"{moved(ring_of(three), ring_of(weighted)):.1%} (ideal {1 / 2 - 1 / 3:.1%})"),
+    ])
+
+if __name__ == "__main__":
+    main()
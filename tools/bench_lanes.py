@@ -0,0 +1,88 @@
+"""Umumiy worker pool vs chat lane'lari: tartib buzilishi va o'tkazuvchanlik.
+
+Har bir chat ketma-ket N ta update yuboradi (chatlar aralash), har bir
+"handler" qisqa I/O kutishini (Bot API chaqiruvi) taqlid qiladi. Umumiy
+pool'da bir chat update'lari turli thread'larda parallel bajarilib, tartib
+buziladi; lane'larda esa bir chat - bitta navbat.
+
+    python tools/bench_lanes.py [chatlar] [update/chat]
+"""
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchutil import setup_env, report
+
+setup_env()
+
+from lanes import LanePool  # noqa: E402
+
+WORKERS = 8
+HANDLER_SECONDS = 0.002
+
+def make_jobs(chats, per_chat):
+    jobs = [(chat, seq) for chat in range(chats) for seq in range(per_chat)]
+    # Chatlar aralashadi, lekin har bir chat ichida seq o'sib boradi
+    random.seed(7)
+    queues = {chat: [j for j in jobs if j[0] == chat] for chat in range(chats)}
+    mixed = []
+    while queues:
+        chat = random.choice(list(queues))
+        mixed.append(queues[chat].pop(0))
+        if not queues[chat]:
+            del queues[chat]
+    return mixed
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = {}
+        self.violations = 0
+
+    def handle(self, chat, seq):
+        time.sleep(HANDLER_SECONDS * random.random())
+        with self.lock:
+            if self.last.get(chat, -1) > seq:
+                self.violations += 1
+            self.last[chat] = max(self.last.get(chat, -1), seq)
+
+def run_shared(jobs):
+    recorder = Recorder()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(WORKERS) as pool:
+        for chat, seq in jobs:
+            pool.submit(recorder.handle, chat, seq)
+    return recorder.violations, time.perf_counter() - start
+
+def run_lanes(jobs):
+    recorder = Recorder()
+    pool = LanePool(WORKERS, queue_size=len(jobs), name="bench-lane")
+    start = time.perf_counter()
+    for chat, seq in jobs:
+        pool.submit(chat, recorder.handle, chat, seq)
+    pool.join()
+    elapsed = time.perf_counter() - start
+    pool.stop()
+    return recorder.violations, elapsed, pool.stats()
+
+def main():
+    chats = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    per_chat = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    jobs = make_jobs(chats, per_chat)
+
+    shared_violations, shared_time = run_shared(jobs)
+    lane_violations, lane_time, stats = run_lanes(jobs)
+    report(f"{len(jobs)} update ({chats} chat x {per_chat}), {WORKERS} thread", [
+        ("umumiy pool: tartib buzilishi", shared_violations),
+        ("umumiy pool: update/s", len(jobs) / shared_time),
+        ("lane'lar: tartib buzilishi", lane_violations),
+        ("lane'lar: update/s", len(jobs) / lane_time),
+        ("lane'lar: eng chuqur navbat", stats["peak_lane_depth"]),
+        ("lane'lar: o'rtacha kutish, ms", stats["avg_wait_ms"]),
+        ("lane'lar: maksimal kutish, ms", stats["max_wait_ms"]),
+    ])
+
+if __name__ == "__main__":
+    main()
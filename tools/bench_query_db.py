@@ -0,0 +1,62 @@
+"""query_db: har chaqiruvda yangi ulanish vs thread-local pool.
+
+    python tools/bench_query_db.py [chaqiruvlar_soni] [threadlar_soni]
+"""
+import sqlite3
+import sys
+import threading
+
+from benchutil import setup_env, rate, report
+
+setup_env()
+
+import database  # noqa: E402
+from database import init_db, query_db, DB_FILE  # noqa: E402
+
+def query_db_connect_per_call(query, params=(), fetch=False):
+    # Eski xatti-harakat: har chaqiruvda connect + PRAGMA + close
+    conn = sqlite3.connect(DB_FILE, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL;")
+    conn.execute("PRAGMA synchronous=NORMAL;")
+    cur = conn.cursor()
+    cur.execute(query, params)
+    rows = cur.fetchall() if fetch else None
+    conn.commit()
+    conn.close()
+    return rows
+
+def threaded_rate(fn, n, threads):
+    per_thread = max(1, n // threads)
+    results = []
+
+    def worker():
+        results.append(rate(fn, per_thread))
+        database.discard_connection()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(results)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    init_db()
+    query_db("INSERT OR REPLACE INTO users (chat_id, student_name) VALUES (?, ?)", ("1", "Bench"))
+
+    sql = "SELECT student_name FROM users WHERE chat_id = ?"
+    old = lambda: query_db_connect_per_call(sql, ("1",), fetch=True)
+    new = lambda: query_db(sql, ("1",), fetch=True)
+
+    rows = [
+        ("connect-per-call, 1 thread", rate(old, n)),
+        ("pooled, 1 thread", rate(new, n)),
+        (f"connect-per-call, {threads} threads", threaded_rate(old, n, threads)),
+        (f"pooled, {threads} threads", threaded_rate(new, n, threads)),
+    ]
+    report(f"query_db SELECT, calls/sec (n={n})", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Foydalanuvchi natijalari sahifasi: tuple + har test uchun so'rov vs repository (bitta so'rov).
+
+typed list - NamedTuple qatorlar ro'yxati (get_user_results), repository -
+sahifalar ishlatadigan get_user_attempts (kursordan oqim, oddiy tuple).
+
+    python tools/bench_repository.py [testlar] [har_test_urinish] [takror]
+"""
+import sys
+import tracemalloc
+
+from benchutil import setup_env, rate, report
+
+setup_env()
+
+import database  # noqa: E402
+import repository  # noqa: E402
+
+TG_ID = "777"
+
+def tuple_path():
+    """Avvalgi show_homework_results: JOIN + har bir test uchun test_name so'rovi"""
+    all_results = database.query_db(
+        "SELECT r.test_id, r.correct_count, r.incorrect_count, r.date, t.is_homework "
+        "FROM results r LEFT JOIN tests t ON r.test_id = t.test_id "
+        "WHERE (r.username = ? OR r.tg_id = ?) ORDER BY r.date DESC",
+        (None, TG_ID), fetch=True
+    ) or []
+    grouped = {}
+    for r in all_results:
+        test_id = str(r[0])
+        if r[4] == 1 or (len(test_id) == 5 and test_id.isdigit()):
+            grouped.setdefault(r[0], []).append((r[1], r[2], r[3]))
+    names = {}
+    for test_id in grouped:
+        row = database.query_db("SELECT test_name FROM tests WHERE test_id = ?", (test_id,), fetch=True)
+        names[test_id] = row[0][0] if row else "Noma'lum"
+    return names, grouped
+
+def typed_path():
+    """get_user_results: bitta so'rov, lekin butun ro'yxat NamedTuple qatorlar bilan"""
+    grouped = {}
+    for r in repository.get_user_results(TG_ID, None, recent_first=True):
+        if r.is_homework_test:
+            if r.test_id not in grouped:
+                grouped[r.test_id] = (r.test_name or "Noma'lum", [])
+            grouped[r.test_id][1].append((r.correct_count, r.incorrect_count, r.date))
+    return grouped
+
+def repository_path():
+    """Hozirgi show_homework_results: get_user_attempts (kursordan oqim, oddiy tuple)"""
+    return repository.get_user_attempts(TG_ID, None, homework=True, recent_first=True)
+
+def measure(fn, n):
+    statements = []
+    conn = database.get_connection()
+    conn.set_trace_callback(statements.append)
+    fn()
+    conn.set_trace_callback(None)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rate(fn, n), len(statements), peak
+
+def main():
+    tests = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    attempts = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    n = int(sys.argv[3]) if len(sys.argv) > 3 else 500
+    database.init_db()
+    database.query_db(
+        "INSERT INTO tests (test_id, test_name, correct_answers, created_at, is_homework) VALUES (?, ?, ?, ?, 1)",
+        [(f"{10000 + i}", f"Uyga vazifa {i}", "abcd" * 10, "2024-01-01 00:00:00") for i in range(tests)],
+        many=True
+    )
+    database.query_db(
+        "INSERT INTO results (student_name, username, tg_id, test_id, correct_count, incorrect_count, date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [("Bench", None, TG_ID, f"{10000 + i}", 30, 10, f"2024-01-{1 + a:02d} 10:00:00")
+         for i in range(tests) for a in range(attempts)],
+        many=True
+    )
+
+    tuple_rate, tuple_queries, tuple_peak = measure(tuple_path, n)
+    typed_rate, typed_queries, typed_peak = measure(typed_path, n)
+    repo_rate, repo_queries, repo_peak = measure(repository_path, n)
+    report(f"{tests} test x {attempts} urinish, {n} takror", [
+        ("tuple: updates/sec", tuple_rate),
+        ("tuple: queries/update", tuple_queries),
+        ("tuple: peak alloc bytes", tuple_peak),
+        ("typed list: updates/sec", typed_rate),
+        ("typed list: queries/update", typed_queries),
+        ("typed list: peak alloc bytes", typed_peak),
+        ("repository: updates/sec", repo_rate),
+        ("repository: queries/update", repo_queries),
+        ("repository: peak alloc bytes", repo_peak),
+    ])
+
+if __name__ == "__main__":
+    main()
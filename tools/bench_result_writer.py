@@ -0,0 +1,61 @@
+"""Natijalar yozuvi: har topshiriqda commit vs guruhlab yozish (write-behind).
+
+    python tools/bench_result_writer.py [topshiriqlar] [threadlar] [batch] [window]
+"""
+import sys
+import threading
+import time
+
+from benchutil import setup_env, report
+
+setup_env()
+
+import database  # noqa: E402
+from result_writer import ResultWriter  # noqa: E402
+
+def run(writer, n, threads):
+    per_thread = n // threads
+
+    def worker(t):
+        for i in range(per_thread):
+            writer.submit(("Bench", None, f"{t}-{i % 50}", "T0001", 20, 10, "2024-01-01 10:00:00", 1704099600))
+        database.discard_connection()
+
+    start = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    submitted = time.perf_counter() - start
+    writer.stop()
+    total = time.perf_counter() - start
+    return per_thread * threads, submitted, total
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    window = float(sys.argv[4]) if len(sys.argv) > 4 else 0.5
+    database.init_db()
+
+    sync_writer = ResultWriter()  # ishga tushirilmagan: submit() sinxron yozadi
+    count, _, sync_total = run(sync_writer, n, threads)
+
+    batched = ResultWriter(batch, window)
+    batched.start()
+    count, submitted, total = run(batched, n, threads)
+    stats = batched.stats()
+
+    report(f"{count} ta natija, {threads} thread", [
+        ("sync: submissions/sec", count / sync_total),
+        ("batched: submissions/sec (enqueue)", count / submitted),
+        ("batched: submissions/sec (durable)", count / total),
+        ("batched: commits", stats["commits"]),
+        ("batched: avg batch", stats["avg_batch"]),
+        ("batched: latency p50 ms", stats["latency_p50_ms"]),
+        ("batched: latency p95 ms", stats["latency_p95_ms"]),
+    ])
+
+if __name__ == "__main__":
+    main()
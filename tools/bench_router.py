@@ -0,0 +1,79 @@
+"""Xabar dispatch narxi: barcha predikatlarni ketma-ket tekshirish vs router indeksi.
+
+Barcha handlerlar (main.py importi orqali) ro'yxatdan o'tkaziladi va har bir
+tugma matni, har bir step hamda hech narsaga mos kelmaydigan matnlar
+aralashmasida bitta update uchun handler topish vaqti o'lchanadi.
+
+    python tools/bench_router.py [takror]
+"""
+import os
+import sys
+from types import SimpleNamespace
+
+from benchutil import setup_env, rate, report
+
+setup_env()
+os.environ.setdefault("ADMIN_IDS", "1000")
+
+import main  # noqa: E402,F401  handlerlarni ro'yxatdan o'tkazadi
+from config import user_state, ADMIN_IDS  # noqa: E402
+from router import router  # noqa: E402
+
+def make_message(chat_id, user_id, text=None, content_type="text"):
+    return SimpleNamespace(
+        chat=SimpleNamespace(id=chat_id), from_user=SimpleNamespace(id=user_id),
+        text=text, content_type=content_type,
+    )
+
+def build_updates():
+    """(xabar, step) juftliklari: tugmalar, step'dagi erkin matn, komandalar, mos kelmaydiganlar"""
+    admin, user = ADMIN_IDS[0], 2000
+    texts = sorted({t for r in router.routes for t in r.texts})
+    steps = sorted({s for r in router.routes for s in r.steps})
+    updates = []
+    for text in texts:
+        updates.append((make_message(1, user, text), None))
+        updates.append((make_message(2, admin, text), None))
+    for step in steps:
+        updates.append((make_message(3, admin, "javob 123"), step))
+    for command in ("/start", "/help", "/stats"):
+        updates.append((make_message(2, admin, command), None))
+    for text in ("salom", "Ali (5)", "?"):
+        updates.append((make_message(1, user, text), None))
+    updates.append((make_message(2, admin, None, "photo"), None))
+    return updates
+
+def run(resolve, updates):
+    def once():
+        for message, step in updates:
+            if step is None:
+                user_state.pop(message.chat.id, None)
+            else:
+                user_state[message.chat.id] = {"step": step}
+            resolve(message)
+    return once
+
+def main_bench():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    updates = build_updates()
+
+    mismatches = 0
+    for message, step in updates:
+        user_state.pop(message.chat.id, None)
+        if step is not None:
+            user_state[message.chat.id] = {"step": step}
+        if router.resolve(message) is not router.resolve_linear(message):
+            mismatches += 1
+    user_state.clear()
+
+    linear = rate(run(router.resolve_linear, updates), repeat) * len(updates)
+    indexed = rate(run(router.resolve, updates), repeat) * len(updates)
+    report(f"Dispatch: {len(router.routes)} ta handler, {len(updates)} xil update", [
+        ("chiziqli (telebot), us/update", 1e6 / linear),
+        ("router indeksi, us/update", 1e6 / indexed),
+        ("tezlanish", indexed / linear),
+        ("natija farqi", mismatches),
+    ])
+
+if __name__ == "__main__":
+    main_bench()
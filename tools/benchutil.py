@@ -0,0 +1,38 @@
+"""Benchmark skriptlari uchun umumiy yordamchilar.
+
+Skriptlar loyiha ildizidan ishga tushiriladi, masalan:
+    python tools/bench_query_db.py
+"""
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def setup_env(db_name="bench.db"):
+    """config.py import qilinishidan oldin vaqtinchalik DB va soxta token o'rnatadi"""
+    tmp = tempfile.mkdtemp(prefix="bot_bench_")
+    os.environ.setdefault("BOT_TOKEN", "123456:BENCHMARK")
+    os.environ["DB_FILE"] = os.path.join(tmp, db_name)
+    os.environ["VIDEOS_FOLDER"] = os.path.join(tmp, "videos")
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return tmp
+
+def rate(fn, n):
+    """fn ni n marta chaqiradi va sekundiga chaqiruvlar sonini qaytaradi"""
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    elapsed = time.perf_counter() - start
+    return n / elapsed if elapsed > 0 else float("inf")
+
+def report(title, rows):
+    """(nom, qiymat) juftliklarini jadval ko'rinishida chiqaradi"""
+    print(title)
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        if isinstance(value, float):
+            value = f"{value:,.1f}"
+        print(f"  {name.ljust(width)}  {value}")
@@ -0,0 +1,151 @@
+"""asyncio runtime'ni (BOT_ASYNC=1) soxta Bot API bilan tarmoqsiz tekshirish.
+
+Tekshiriladi: sinxron handler (thread pool + loop orqali Bot API), bir chat
+update'lari tartibi, sekin chat boshqalarni to'sib qo'ymasligi, viktorina
+javobining async varianti va ommaviy yuborish parallel, lekin outbound
+limitidan tez emas ketishi.
+aiohttp o'rnatilgan bo'lishi kerak.
+
+    python tools/check_async.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+from benchutil import setup_env
+from check_webhook import FakeBotAPI, make_update
+
+SLOW_CHAT = 111
+SLOW_SECONDS = 2.0
+PHOTO_SECONDS = 0.05
+BROADCAST_USERS = 200
+RATE = 100  # outbound global limiti (xabar/s)
+
+def delay(method, params):
+    if method == "sendMessage" and params.get("chat_id") == str(SLOW_CHAT):
+        return SLOW_SECONDS
+    if method == "sendPhoto":
+        return PHOTO_SECONDS
+    return 0
+
+def make_callback(update_id, chat_id, data, message_id=1):
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id), "chat_instance": "1", "data": data,
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "message": {
+                "message_id": message_id, "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"}, "caption": "🧩",
+            },
+        },
+    }
+
+def main():
+    setup_env()
+    api = FakeBotAPI(delay)
+    os.environ.update({"BOT_API_URL": api.url, "ADMIN_IDS": "", "BOT_ASYNC": "1", "AIO_SEND_CONCURRENCY": "20",
+                       "OUTBOUND_RATE": str(RATE)})
+
+    import main as bot_main  # noqa: F401  handlerlarni ro'yxatdan o'tkazadi
+    import aio
+    from config import bot
+    from database import init_db, query_db, create_quiz, mark_quiz_as_sent, get_unsent_quiz
+    from handlers.quiz_handlers import send_quiz_to_users_async
+    from router import router
+
+    init_db()
+    quiz_user = 444
+    create_quiz(None, "photo-file-id", "B")
+    quiz_id = get_unsent_quiz()[0]
+    mark_quiz_as_sent(quiz_id)
+    query_db("INSERT INTO users (chat_id, student_name, balance) VALUES (?, ?, 0)", (str(quiz_user), "Quiz User"))
+    query_db("INSERT INTO subscriptions (user_id, is_active, end_date, end_ts) VALUES (?, 1, ?, ?)",
+             (str(quiz_user), "2099-01-01", time.time() + 86400))
+    query_db("INSERT INTO users (chat_id, student_name) VALUES (?, ?)",
+             [(str(10000 + i), f"User {i}") for i in range(BROADCAST_USERS)], many=True)
+
+    runtime = aio.AsyncRuntime(bot, router, handler_threads=4)
+    aio.runtime = runtime
+    startup_error = []
+
+    def run():
+        try:
+            runtime.run()
+        except BaseException as e:
+            startup_error.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while runtime.loop is None and thread.is_alive() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    if runtime.loop is None:
+        reason = startup_error[0] if startup_error else "10 soniyada loop ochilmadi"
+        print(f"XATO: asyncio runtime ishga tushmadi: {reason}")
+        sys.exit(1)
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    def replies(chat_id, method="sendMessage"):
+        return [c[1] for c in api.calls if c[0] == method and c[1].get("chat_id") == str(chat_id)]
+
+    print("Asyncio runtime tekshiruvi")
+    check("getUpdates polling", api.wait_for(lambda c: c[0] == "getUpdates") is not None)
+
+    api.push(make_update(1, 222, "/start"))
+    reply = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == "222")
+    check("/start -> sinxron handler, javob loop orqali", reply is not None and "Assalomu" in reply[1].get("text", ""))
+
+    for i, text in enumerate(("/start", "Ali Valiyev", "/help")):
+        api.push(make_update(10 + i, 555, text))
+    api.wait_for(lambda c: len(replies(555)) >= 3)
+    texts = [r.get("text", "") for r in replies(555)]
+    check("bir chat update'lari tartibi saqlanadi", len(texts) == 3
+          and "Ism" in texts[0] and "Ali Valiyev" in texts[1] and "funksiyalari" in texts[2])
+
+    api.push(make_update(20, SLOW_CHAT, "/start"))
+    api.push(make_update(21, 333, "/start"))
+    fast = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == "333", timeout=SLOW_SECONDS * 3)
+    slow = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == str(SLOW_CHAT), timeout=SLOW_SECONDS * 3)
+    check("sekin chat boshqasini to'smaydi", fast is not None and slow is not None and fast[2] < slow[2])
+
+    api.push(make_callback(30, quiz_user, f"quiz_answer:{quiz_id}:B"))
+    answered = api.wait_for(lambda c: c[0] == "answerCallbackQuery" and c[1].get("callback_query_id") == "30")
+    api.wait_for(lambda c: c[0] == "editMessageCaption" and c[1].get("chat_id") == str(quiz_user))
+    balance = query_db("SELECT balance FROM users WHERE chat_id = ?", (str(quiz_user),), fetch=True)[0][0]
+    check("viktorina javobi async variantda", answered is not None and "qabul" in answered[1].get("text", "")
+          and balance == 100 and runtime.async_calls >= 1)
+
+    api.push(make_callback(31, quiz_user, f"quiz_answer:{quiz_id}:B"))
+    again = api.wait_for(lambda c: c[0] == "answerCallbackQuery" and c[1].get("callback_query_id") == "31")
+    check("takroriy javob rad etiladi", again is not None and "allaqachon" in again[1].get("text", ""))
+
+    users = query_db("SELECT COUNT(*) FROM users", fetch=True)[0][0]
+    start = time.monotonic()
+    sent = asyncio.run_coroutine_threadsafe(
+        send_quiz_to_users_async(runtime.abot, quiz_id, "photo-file-id", "B"), runtime.loop
+    ).result(timeout=60)
+    elapsed = time.monotonic() - start
+    serial = users * PHOTO_SECONDS
+    limit = (users - RATE) / RATE  # birinchi soniyadagi portlashdan keyin RATE xabar/s
+    check(f"ommaviy yuborish: {sent} ta, {elapsed:.2f}s (ketma-ket ~{serial:.0f}s, limit >= {limit:.1f}s)",
+          sent == users and limit * 0.9 <= elapsed < serial / 4)
+
+    runtime.stop()
+    thread.join(timeout=30)
+    check("runtime to'xtadi", not thread.is_alive())
+    print(f"  stats: {runtime.stats()}")
+    if failures:
+        print(f"XATO: {len(failures)} ta tekshiruv o'tmadi")
+        sys.exit(1)
+    print("OK: asyncio runtime ishlayapti")
+
+if __name__ == "__main__":
+    main()
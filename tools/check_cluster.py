@@ -0,0 +1,114 @@
+"""Ko'p jarayonli rejimni (CLUSTER_WORKERS=2) soxta Bot API bilan tekshirish.
+
+main.py alohida jarayon sifatida ishga tushadi (polling), u o'zi 2 ta worker
+jarayonini ochadi. Tekshiriladi: ikkala bo'limdagi chatlarga javob, bir chat
+update'lari tartibi, viktorina faqat bir marta (lider worker'dan) yuborilishi,
+yiqilgan worker qayta ishga tushib o'z bo'limini ishlashi va SIGTERM'da
+navbat bo'shab, jarayonlar toza chiqishi.
+
+    python tools/check_cluster.py
+"""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from benchutil import ROOT, setup_env
+from check_webhook import FakeBotAPI, make_update
+
+WORKERS = 2
+USERS = 20
+
+def children(pid):
+    """pid ning bevosita bola jarayonlari (Linux /proc)"""
+    found = []
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                if int(f.read().rsplit(")", 1)[1].split()[1]) == pid:
+                    found.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+    return found
+
+def main():
+    setup_env()
+    api = FakeBotAPI(lambda method, params: 0)
+    os.environ.update({
+        "BOT_API_URL": api.url, "ADMIN_IDS": "", "BOT_POLLING": "1",
+        "CLUSTER_WORKERS": str(WORKERS), "CACHE_SYNC_INTERVAL": "0.2", "LEASE_TTL": "3",
+    })
+
+    from database import init_db, query_db, create_quiz
+    init_db()
+    create_quiz(None, "photo-file-id", "B")
+    query_db("INSERT INTO users (chat_id, student_name) VALUES (?, ?)",
+             [(str(20000 + i), f"User {i}") for i in range(USERS)], many=True)
+
+    proc = subprocess.Popen([sys.executable, "-W", "ignore", os.path.join(ROOT, "main.py")], cwd=ROOT)
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    def replies(chat_id):
+        return [c[1].get("text", "") for c in api.calls if c[0] == "sendMessage" and c[1].get("chat_id") == str(chat_id)]
+
+    try:
+        print(f"Klaster tekshiruvi ({WORKERS} worker)")
+        check("getUpdates polling", api.wait_for(lambda c: c[0] == "getUpdates", timeout=20) is not None)
+
+        chats = (222, 333)  # 222 % 2 == 0, 333 % 2 == 1 - ikki xil worker
+        for i, chat_id in enumerate(chats):
+            api.push(make_update(1 + i, chat_id, "/start"))
+        for chat_id in chats:
+            api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == str(chat_id), timeout=15)
+        check("ikkala bo'limdagi chat javob oldi", all(any("Assalomu" in t for t in replies(c)) for c in chats))
+
+        for i, text in enumerate(("/start", "Ali Valiyev", "/help")):
+            api.push(make_update(10 + i, 555, text))
+        api.wait_for(lambda c: len(replies(555)) >= 3, timeout=15)
+        texts = replies(555)
+        check("bir chat update'lari tartibi saqlanadi", len(texts) == 3
+              and "Ism" in texts[0] and "Ali Valiyev" in texts[1] and "funksiyalari" in texts[2])
+
+        api.wait_for(lambda c: sum(1 for x in api.calls if x[0] == "sendPhoto") >= USERS, timeout=20)
+        time.sleep(2)
+        photos = [c[1]["chat_id"] for c in api.calls if c[0] == "sendPhoto"]
+        check(f"viktorina bir marta yuborildi ({len(photos)} ta sendPhoto)",
+              len(photos) == USERS and len(set(photos)) == USERS)
+
+        workers = children(proc.pid)
+        check(f"{WORKERS} ta worker jarayoni", len(workers) == WORKERS)
+        if workers:
+            os.kill(workers[0], signal.SIGKILL)
+            time.sleep(1.5)
+            api.push(make_update(20, 444, "/start"))
+            api.push(make_update(21, 777, "/start"))
+            api.wait_for(lambda c: replies(444) and replies(777), timeout=20)
+            check("yiqilgan worker qayta ishga tushdi, ikkala bo'lim ishlaydi",
+                  bool(replies(444)) and bool(replies(777)) and len(children(proc.pid)) == WORKERS)
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        try:
+            code = proc.wait(30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            code = None
+    check(f"SIGTERM -> toza chiqish (kod {code})", code == 0)
+
+    from update_queue import update_queue
+    check("navbat bo'sh", not update_queue.depths())
+    print(f"  navbat: {update_queue.stats()}")
+    if failures:
+        print(f"XATO: {len(failures)} ta tekshiruv o'tmadi")
+        sys.exit(1)
+    print("OK: klaster rejimi ishlayapti")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Admin xabarnomalarini (notifications.py) soxta Bot API bilan tarmoqsiz tekshirish.
+
+Tekshiriladi: topshiriq hodisasi darhol qaytishi, oyna ichida adminga hech
+narsa ketmasligi, oyna tugagach har bir adminga bitta digest (har bir
+o'quvchi uchun tugma), to'lov xabari kutmasligi, NOTIFY_DIGEST_MAX ga
+yetganda darhol yuborish va stop() qolganlarini yuborib ketishi.
+
+    python tools/check_notifications.py
+"""
+import json
+import os
+import sys
+import time
+
+from benchutil import setup_env
+from check_webhook import FakeBotAPI
+
+ADMINS = (900, 901)
+WINDOW = 1.0
+STUDENTS = 10
+
+def main():
+    setup_env()
+    api = FakeBotAPI(lambda method, params: 0)
+    os.environ.update({"BOT_API_URL": api.url, "ADMIN_IDS": ",".join(map(str, ADMINS)),
+                       "NOTIFY_DIGEST_WINDOW": str(WINDOW)})
+
+    from notifications import Notifier, notifier
+    from outbound import outbound
+
+    outbound.install()
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    def to_admin(admin_id):
+        return [c for c in api.calls if c[0] == "sendMessage" and c[1].get("chat_id") == str(admin_id)]
+
+    print("Admin xabarnomalari tekshiruvi")
+    start = time.monotonic()
+    for i in range(STUDENTS):
+        name = f"O'quvchi {i}"
+        notifier.submission(5000 + i, name, f"📥 Test topshirildi:\n🧑‍🎓 {name}", f"📝 {name} — T{i}: ✅ 9 | ❌ 1")
+    elapsed = time.monotonic() - start
+    check(f"{STUDENTS} ta topshiriq {elapsed * 1000:.1f} ms da navbatga tushdi", elapsed < 0.1)
+
+    notifier.urgent(ADMINS[0], "💳 To'lov: tasdiqlang")
+    urgent = api.wait_for(lambda c: c[0] == "sendMessage" and "To'lov" in c[1].get("text", ""), timeout=2)
+    early = [c for c in to_admin(ADMINS[1]) if "topshiriq" in c[1].get("text", "")]
+    check("to'lov xabari darhol, digest oyna tugashini kutadi",
+          urgent is not None and urgent[2] - start < WINDOW / 2 and not early)
+
+    digest = api.wait_for(lambda c: c[0] == "sendMessage" and "topshiriq" in c[1].get("text", ""), timeout=WINDOW * 3)
+    time.sleep(0.3)
+    digests = {admin: [c for c in to_admin(admin) if "topshiriq" in c[1].get("text", "")] for admin in ADMINS}
+    ok = digest is not None and digest[2] - start >= WINDOW * 0.9
+    for admin, calls in digests.items():
+        buttons = json.loads(calls[0][1]["reply_markup"])["inline_keyboard"] if len(calls) == 1 else []
+        ok = ok and len(calls) == 1 and calls[0][1]["text"].count("📝") == STUDENTS and len(buttons) == STUDENTS
+    check(f"har bir adminga bitta digest ({STUDENTS} qator, {STUDENTS} tugma)", ok)
+
+    # max_events ga yetganda oyna tugashini kutmaydi; stop() qolganini yuboradi
+    local = Notifier(window=30, max_events=5)
+    for i in range(6):
+        local.submission(6000 + i, f"Talaba {i}", "yakka", f"📚 Talaba {i}", admins=[902])
+    full = api.wait_for(lambda c: c[1].get("chat_id") == "902", timeout=2)
+    check("max_events ga yetgan digest darhol ketdi", full is not None and full[1]["text"].count("📚") == 5)
+    local.stop()
+    rest = api.wait_for(lambda c: c[1].get("chat_id") == "902" and c[1].get("text") == "yakka", timeout=2)
+    check("stop() qolgan hodisani yubordi (bitta hodisa - odatdagi xabar)", rest is not None)
+
+    notifier.stop()
+    outbound.stop()
+    print(f"  stats: {notifier.stats()}")
+    if failures:
+        print(f"XATO: {len(failures)} ta tekshiruv o'tmadi")
+        sys.exit(1)
+    print("OK: admin xabarnomalari ishlayapti")
+
+if __name__ == "__main__":
+    main()
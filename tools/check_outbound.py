@@ -0,0 +1,142 @@
+"""outbound navbatini tarmoqsiz tekshirish: soxta yuborish funksiyasi bilan.
+
+Tekshiriladi: global va chat limitlari (handler javoblari portlashi bilan), chat ichida tartib, prioritetlar,
+429 retry_after dan keyin qayta yuborish va to'la navbatda tashlash.
+
+    python tools/check_outbound.py
+"""
+import sys
+import threading
+import time
+
+from benchutil import setup_env
+
+setup_env()
+
+from telebot.apihelper import ApiTelegramException  # noqa: E402
+
+from outbound import Outbound, DroppedError, INTERACTIVE, NORMAL, BULK  # noqa: E402
+
+class FakeSender:
+    def __init__(self, latency=0.01):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.sent = []  # (chat_id, n, vaqt)
+        self.fail_429 = {}  # (chat_id, n) -> [retry_after, necha marta]
+
+    def send(self, chat_id, n):
+        time.sleep(self.latency)
+        with self.lock:
+            fail = self.fail_429.get((chat_id, n))
+            if fail and fail[1] > 0:
+                fail[1] -= 1
+                raise ApiTelegramException("sendMessage", None, {
+                    "ok": False, "error_code": 429, "description": "Too Many Requests",
+                    "parameters": {"retry_after": fail[0]},
+                })
+            self.sent.append((chat_id, n, time.monotonic()))
+        return n
+
+def main():
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    print("Outbound tekshiruvi")
+
+    # Global limit: 90 ta turli chat, 30/s (30 ta darhol, qolgan 60 ta ~2s)
+    sender = FakeSender()
+    out = Outbound(rate=30, chat_rate=1, chat_burst=3, workers=8)
+    start = time.monotonic()
+    futures = [out.submit(i, sender.send, i, 0) for i in range(90)]
+    for f in futures:
+        f.result()
+    elapsed = time.monotonic() - start
+    check(f"global 30/s: 90 ta xabar {elapsed:.2f}s (>= 2s)", 1.8 <= elapsed < 3.0)
+
+    # Chat limiti (standart portlash 1): bitta chatga 6 ta admin xabari - birinchisi darhol, keyin 1/s, tartib saqlanadi
+    sender = FakeSender()
+    out = Outbound(rate=30, chat_rate=1, workers=8)
+    start = time.monotonic()
+    futures = [out.submit(7, sender.send, 7, n, priority=NORMAL) for n in range(6)]
+    for f in futures:
+        f.result()
+    elapsed = time.monotonic() - start
+    order = [n for _, n, _ in sender.sent]
+    gaps = [b - a for (_, _, a), (_, _, b) in zip(sender.sent, sender.sent[1:])]
+    check(f"chat 1/s: 6 ta xabar {elapsed:.2f}s (>= 5s), tartib {order}",
+          4.8 <= elapsed < 6.0 and order == list(range(6)) and min(gaps) >= 0.9)
+
+    # Handler javobi (standart interaktiv portlash 3): 3 ta xabar darhol, keyingilari 1/s
+    sender = FakeSender()
+    out = Outbound(rate=30, chat_rate=1, workers=8)
+    start = time.monotonic()
+    out.submit(8, sender.send, 8, 0).result()
+    out.submit(8, sender.send, 8, 1).result()
+    out.submit(8, sender.send, 8, 2).result()
+    burst = time.monotonic() - start
+    out.submit(8, sender.send, 8, 3).result()
+    elapsed = time.monotonic() - start
+    check(f"interaktiv portlash: 3 ta xabar {burst * 1000:.0f} ms, 4-si {elapsed:.2f}s da",
+          burst < 0.3 and 0.8 <= elapsed < 1.5)
+
+    # Prioritet: BULK to'planib turganda INTERACTIVE javob navbatni kutmaydi
+    sender = FakeSender()
+    out = Outbound(rate=20, chat_rate=1, chat_burst=1, workers=4)
+    bulk = [out.submit(1000 + i, sender.send, 1000 + i, 0, priority=BULK) for i in range(100)]
+    time.sleep(0.2)
+    start = time.monotonic()
+    out.submit(1, sender.send, 1, 0, priority=INTERACTIVE).result()
+    waited = time.monotonic() - start
+    done_bulk = sum(f.done() for f in bulk)
+    check(f"interaktiv javob {waited * 1000:.0f} ms da, bulk'dan {done_bulk}/100 ta yuborilgan", waited < 0.3 and done_bulk < 50)
+    for f in bulk:
+        f.result()
+
+    # 429: retry_after dan keyin qayta yuboriladi, tartib buzilmaydi
+    sender = FakeSender()
+    sender.fail_429[(9, 0)] = [1, 1]
+    out = Outbound(rate=30, chat_rate=10, chat_burst=10, workers=4)
+    start = time.monotonic()
+    futures = [out.submit(9, sender.send, 9, n) for n in range(3)]
+    results = [f.result() for f in futures]
+    elapsed = time.monotonic() - start
+    order = [n for _, n, _ in sender.sent]
+    stats = out.stats()
+    check(f"429 retry_after=1: {elapsed:.2f}s, tartib {order}, retried={stats['retried_429']}",
+          results == [0, 1, 2] and order == [0, 1, 2] and elapsed >= 0.95 and stats["retried_429"] == 1)
+
+    # Urinishlar tugasa - dropped
+    sender = FakeSender()
+    out = Outbound(rate=30, chat_rate=10, chat_burst=10, workers=2, max_retries=1)
+    sender.fail_429[(5, 0)] = [0.1, 2]
+    future = out.submit(5, sender.send, 5, 0)
+    try:
+        future.result()
+        lost = False
+    except DroppedError:
+        lost = True
+    check(f"429 dan keyin urinishlar tugasa dropped ({out.stats()['dropped']})", lost and out.stats()["dropped"] == 1)
+
+    # To'la navbat: BULK tashlanadi, INTERACTIVE qabul qilinadi
+    sender = FakeSender(latency=0.05)
+    out = Outbound(rate=5, chat_rate=1, chat_burst=1, queue_size=10, workers=1)
+    bulk = [out.submit(2000 + i, sender.send, 2000 + i, 0, priority=BULK) for i in range(30)]
+    interactive = out.submit(3, sender.send, 3, 0)
+    dropped = sum(1 for f in bulk if f.done() and isinstance(f.exception(), DroppedError))
+    check(f"to'la navbat: {dropped} ta bulk tashlandi, interaktiv qabul qilindi",
+          dropped >= 15 and not (interactive.done() and interactive.exception()))
+    interactive.result(timeout=10)
+    out.stop(timeout=0)
+    print(f"  stats: {out.stats()}")
+
+    if failures:
+        print(f"XATO: {len(failures)} ta tekshiruv o'tmadi")
+        sys.exit(1)
+    print("OK: outbound navbati ishlayapti")
+
+if __name__ == "__main__":
+    main()
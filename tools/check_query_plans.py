@@ -0,0 +1,36 @@
+"""Issiq so'rovlar (database.HOT_QUERIES) to'liq jadval skaneriga tushmasligini tekshiradi.
+
+    python tools/check_query_plans.py            # yangi bo'sh DB bilan
+    python tools/check_query_plans.py data.db    # mavjud DB nusxasi bilan
+
+Skaner topilsa 1 kodi bilan chiqadi.
+"""
+import os
+import shutil
+import sys
+
+from benchutil import setup_env
+
+tmp = setup_env()
+if len(sys.argv) > 1:
+    # Asl faylga tegmaslik uchun nusxa ustida ishlaymiz
+    shutil.copy(sys.argv[1], os.environ["DB_FILE"])
+
+import database  # noqa: E402
+
+def main():
+    database.init_db()
+    conn = database.connect()
+    try:
+        conn.execute("ANALYZE")
+        scans = database.find_table_scans(conn)
+    finally:
+        conn.close()
+    if scans:
+        for name, detail in scans:
+            print(f"FAIL {name}: {detail}")
+        sys.exit(1)
+    print(f"OK: {len(database.HOT_QUERIES)} ta so'rov indeks orqali bajariladi")
+
+if __name__ == "__main__":
+    main()
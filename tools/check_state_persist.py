@@ -0,0 +1,96 @@
+"""STATE_PERSIST=1: suhbat holatlari restartdan omon qolishini tekshirish.
+
+Ikki jarayon bitta DB bilan: birinchisi holatlarni yozib to'xtaydi
+(shutdown'dagi kabi stop()), ikkinchisi ularni o'qiydi. Tekshiriladi:
+ko'p o'zgarish bitta yozuvga birlashishi, ishga tushishda hech narsa
+o'qilmasligi (lazy), qiymat va TTL tiklanishi, o'chirilganlar qaytmasligi.
+
+    python tools/check_state_persist.py
+"""
+import os
+import subprocess
+import sys
+import time
+
+from benchutil import setup_env
+
+CHATS = 200
+TOUCHES = 20
+
+def first_run():
+    from config import user_state, answered_quizzes
+    from conversation import conversation
+    from state_persist import state_persister
+
+    state_persister.start()
+    for chat_id in range(1, CHATS + 1):
+        conversation.enter(chat_id, "get_test_answers", student_name=f"O'quvchi {chat_id}")
+        for _ in range(TOUCHES):
+            user_state.get(chat_id)
+            conversation.touch(chat_id)
+    user_state[CHATS]["payment_id"] = 77  # ichki dict o'zgarishi ham saqlanadi
+    user_state.pop(1)
+    answered_quizzes.set("quiz_5_42", True, ttl=3600)
+    answered_quizzes.set("quiz_6_42", True, ttl=0.5)
+    state_persister.stop()
+    stats = state_persister.stats()
+    print(f"  yozildi: {stats['written']} ta qator, {stats['flushes']} ta flush ({CHATS * TOUCHES} ta murojaat)")
+    if stats["written"] > CHATS + 2:
+        sys.exit(1)
+
+def second_run():
+    from config import user_state, answered_quizzes
+    from conversation import conversation
+    from state_persist import state_persister
+
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    start = time.perf_counter()
+    state_persister.start()
+    elapsed = time.perf_counter() - start
+    check(f"ishga tushish {elapsed * 1000:.1f} ms, hech narsa o'qilmadi", state_persister.loads == 0 and len(user_state) == 0)
+    time.sleep(0.6)
+    state = user_state.get(CHATS)
+    check("holat tiklandi (step, ma'lumot, ichki o'zgarish)", state is not None and state["step"] == "get_test_answers"
+          and state["student_name"] == f"O'quvchi {CHATS}" and state.get("payment_id") == 77)
+    left = user_state._deadlines[CHATS] - time.monotonic()
+    timeout = conversation.steps["get_test_answers"].timeout
+    check(f"TTL tiklandi ({left:.0f}s / {timeout}s)", timeout - 60 < left <= timeout)
+    check("o'chirilgan holat qaytmadi", 1 not in user_state)
+    check("viktorina javobi eslab qolindi, muddati o'tgani yo'q",
+          "quiz_5_42" in answered_quizzes and "quiz_6_42" not in answered_quizzes)
+    loads = state_persister.loads
+    for _ in range(10):
+        user_state.get(999999)
+    check("yo'q chat uchun DB bir marta so'raladi", state_persister.loads == loads + 1)
+    state_persister.stop()
+    print(f"  stats: {state_persister.stats()}")
+    if failures:
+        sys.exit(1)
+
+def main():
+    if len(sys.argv) > 1:
+        setup_env()
+        os.environ["DB_FILE"] = sys.argv[2]
+        import main as bot_main  # noqa: F401  step'larni ro'yxatdan o'tkazadi
+        from database import init_db
+        init_db()
+        (first_run if sys.argv[1] == "1" else second_run)()
+        return
+    tmp = setup_env()
+    db_file = os.path.join(tmp, "state.db")
+    print("Holatlarni saqlash tekshiruvi")
+    for phase in ("1", "2"):
+        code = subprocess.call([sys.executable, "-W", "ignore", __file__, phase, db_file])
+        if code:
+            print(f"XATO: {phase}-bosqich o'tmadi")
+            sys.exit(1)
+    print("OK: holatlar restartdan keyin tiklanadi")
+
+if __name__ == "__main__":
+    main()
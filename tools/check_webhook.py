@@ -0,0 +1,213 @@
+"""Webhook rejimini tarmoqsiz tekshirish: soxta Bot API + lokal webhook server.
+
+Soxta Bot API 127.0.0.1 da ishlaydi (BOT_API_URL), bot unga javob yuboradi.
+Tekshiriladi: secret token, noto'g'ri so'rovlar, /start update'i handlergacha
+yetib borishi, sekin handler yangi update'larni qabul qilishni va boshqa
+lane'dagi chatni to'xtatmasligi hamda bir chat update'lari tartibi.
+
+    python tools/check_webhook.py
+"""
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from benchutil import setup_env
+
+SLOW_CHAT = 111
+FAST_CHAT = 334  # UPDATE_LANES=2 da SLOW_CHAT bilan boshqa lane
+SLOW_SECONDS = 2.0
+
+def slow_chat_delay(method, params):
+    return SLOW_SECONDS if method == "sendMessage" and params.get("chat_id") == str(SLOW_CHAT) else 0
+
+class FakeBotAPI:
+    """Bot API'ning kerakli qismi: har bir chaqiruv yoziladi, delay(method, params) soniya kechikadi.
+
+    getUpdates uchun update'lar push() bilan qo'shiladi (tools/check_async.py).
+    """
+
+    def __init__(self, delay=slow_chat_delay):
+        self.calls = []
+        self.cond = threading.Condition()
+        self.pending = []
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _handle(self):
+                url = urlsplit(self.path)
+                method = url.path.rsplit("/", 1)[-1]
+                params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    params.update({k: v[0] for k, v in parse_qs(self.rfile.read(length).decode()).items()})
+                seconds = delay(method, params)
+                if seconds:
+                    time.sleep(seconds)
+                result = True
+                if method == "getUpdates":
+                    result = api.take_updates(int(params.get("offset") or 0))
+                elif method == "getMe":
+                    result = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "test_bot"}
+                elif method in ("sendMessage", "sendPhoto"):
+                    result = {
+                        "message_id": len(api.calls) + 1, "date": int(time.time()),
+                        "chat": {"id": int(params["chat_id"]), "type": "private"}, "text": params.get("text", ""),
+                    }
+                with api.cond:
+                    api.calls.append((method, params, time.monotonic()))
+                    api.cond.notify_all()
+                body = json.dumps({"ok": True, "result": result}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_address[1]}/bot{{0}}/{{1}}"
+
+    def push(self, update):
+        with self.cond:
+            self.pending.append(update)
+            self.cond.notify_all()
+
+    def take_updates(self, offset, wait=1.0):
+        with self.cond:
+            self.cond.wait_for(lambda: any(u["update_id"] >= offset for u in self.pending), wait)
+            updates = [u for u in self.pending if u["update_id"] >= offset]
+            self.pending = updates
+            return updates
+
+    def wait_for(self, predicate, timeout=10):
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                found = [c for c in self.calls if predicate(c)]
+                if found:
+                    return found[0]
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    return None
+                self.cond.wait(left)
+
+def make_update(update_id, chat_id, text):
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id, "date": int(time.time()), "text": text,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}] if text.startswith("/") else [],
+        },
+    }
+
+def post(port, payload, secret, path="/webhook"):
+    data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method="POST")
+    req.add_header("Content-Type", "application/json")
+    if secret is not None:
+        req.add_header("X-Telegram-Bot-Api-Secret-Token", secret)
+    start = time.monotonic()
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            code = resp.status
+    except urllib.error.HTTPError as e:
+        code = e.code
+    return code, time.monotonic() - start
+
+def post_raw_length(port, length, secret, path="/webhook"):
+    """Content-Length sarlavhasini qo'lda beradi (urllib uni o'zi hisoblaydi)"""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        conn.putrequest("POST", path)
+        conn.putheader("Content-Length", length)
+        conn.putheader("X-Telegram-Bot-Api-Secret-Token", secret)
+        conn.endheaders()
+        return conn.getresponse().status
+    finally:
+        conn.close()
+
+def main():
+    setup_env()
+    api = FakeBotAPI()
+    secret = "test-secret"
+    os.environ.update({
+        "BOT_API_URL": api.url, "ADMIN_IDS": "", "BOT_POLLING": "0",
+        "WEBHOOK_URL": "https://bot.example.test", "WEBHOOK_HOST": "127.0.0.1", "WEBHOOK_PORT": "0",
+        "WEBHOOK_SECRET": secret, "UPDATE_LANES": "2",
+    })
+
+    import main as bot_main  # noqa: F401  handlerlarni ro'yxatdan o'tkazadi
+    from config import bot
+    from database import init_db
+    from lanes import update_lanes
+    from webhook import start_webhook
+
+    init_db()
+    server = start_webhook(bot, update_lanes)
+    port = server.port
+    failures = []
+
+    def check(name, ok):
+        print(f"  {'OK ' if ok else 'XATO'} {name}")
+        if not ok:
+            failures.append(name)
+
+    print("Webhook tekshiruvi")
+    hook = api.wait_for(lambda c: c[0] == "setWebhook")
+    check("setWebhook (url + secret_token)", hook is not None and hook[1].get("secret_token") == secret
+          and hook[1].get("url") == "https://bot.example.test/webhook")
+    check("secret'siz -> 403", post(port, make_update(1, 1, "/start"), None)[0] == 403)
+    check("noto'g'ri secret -> 403", post(port, make_update(2, 1, "/start"), "boshqa")[0] == 403)
+    check("noto'g'ri yo'l -> 404", post(port, make_update(3, 1, "/start"), secret, path="/x")[0] == 404)
+    check("buzilgan JSON -> 400", post(port, b"{not json", secret)[0] == 400)
+    check("buzilgan Content-Length -> 400", post_raw_length(port, "abc", secret) == 400)
+
+    code, _ = post(port, make_update(10, 222, "/start"), secret)
+    reply = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == "222")
+    check("/start -> 200 va sendMessage", code == 200 and reply is not None and "Assalomu" in reply[1].get("text", ""))
+
+    # Sekin handler (Bot API javobi SLOW_SECONDS kechikadi) boshqa update'larni to'xtatmasligi kerak
+    slow_code, _ = post(port, make_update(20, SLOW_CHAT, "/start"), secret)
+    fast_code, latency = post(port, make_update(21, FAST_CHAT, "/start"), secret)
+    fast = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == str(FAST_CHAT), timeout=SLOW_SECONDS * 3)
+    slow = api.wait_for(lambda c: c[0] == "sendMessage" and c[1].get("chat_id") == str(SLOW_CHAT), timeout=SLOW_SECONDS * 3)
+    check(f"qabul qilish sekin handlerni kutmaydi ({latency * 1000:.0f} ms)", slow_code == fast_code == 200 and latency < SLOW_SECONDS / 2)
+    check("tez update sekinidan oldin ishlandi", fast is not None and slow is not None and fast[2] < slow[2])
+
+    # Bir chatning ketma-ket update'lari kelgan tartibda ishlanadi (bitta lane):
+    # ism so'rovi -> ism (get_name step) -> /help; tartib buzilsa javoblar boshqacha
+    for i, text in enumerate(("/start", "Ali Valiyev", "/help")):
+        post(port, make_update(30 + i, 555, text), secret)
+    update_lanes.join()
+    replies = [c[1].get("text", "") for c in api.calls if c[0] == "sendMessage" and c[1].get("chat_id") == "555"]
+    check("bir chat update'lari tartibi saqlanadi", len(replies) == 3
+          and "Ism" in replies[0] and "Ali Valiyev" in replies[1] and "funksiyalari" in replies[2])
+
+    server.stop()
+    print(f"  stats: {server.stats()}")
+    print(f"  lanes: {update_lanes.stats()}")
+    if failures:
+        print(f"XATO: {len(failures)} ta tekshiruv o'tmadi")
+        sys.exit(1)
+    print("OK: webhook rejimi ishlayapti")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""Jarayonlar orasidagi update navbati (CLUSTER_WORKERS > 0).
+
+Qabul qiluvchi jarayon (polling yoki webhook) Telegram'dan kelgan xom
+update'larni UPDATE_QUEUE_FILE dagi SQLite jadvaliga yozadi va shu bilan
+tasdiqlaydi - update diskda, worker yiqilsa ham yo'qolmaydi. Har bir update
+chat_id % CLUSTER_WORKERS bo'limiga tushadi: bir chat doim bitta worker
+jarayonida, o'sha jarayon ichida esa lanes.py dagi kabi o'z lane'ida ishlanadi.
+Qator handler tugagandan keyin o'chiriladi (kamida bir marta yetkazish:
+worker qayta ishga tushsa tugallanmaganlarini boshidan oladi).
+
+Boshqaruv yozuvlari ({"_control": ...}) ham shu bo'lim va lane orqali o'tadi,
+masalan boshqa jarayondagi chat holatini o'chirish (cluster.forget_state).
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+from telebot import apihelper, types
+
+from config import UPDATE_QUEUE_FILE, CLUSTER_WORKERS, CLUSTER_POLL_INTERVAL
+from lanes import update_chat_id
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS update_queue (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        partition INTEGER NOT NULL,
+        chat_id INTEGER,
+        payload TEXT NOT NULL,
+        created_ts REAL NOT NULL
+    )
+'''
+INDEX = "CREATE INDEX IF NOT EXISTS idx_update_queue_partition ON update_queue (partition, id)"
+INSERT = "INSERT INTO update_queue (partition, chat_id, payload, created_ts) VALUES (?, ?, ?, ?)"
+FETCH = "SELECT id, payload FROM update_queue WHERE partition = ? AND id > ? ORDER BY id LIMIT ?"
+
+def raw_chat_id(data):
+    """lanes.update_chat_id ning xom (dict) update uchun varianti"""
+    for key in ("message", "edited_message", "channel_post", "edited_channel_post",
+                "my_chat_member", "chat_member", "chat_join_request"):
+        event = data.get(key)
+        if event and event.get("chat"):
+            return event["chat"]["id"]
+    call = data.get("callback_query")
+    if call:
+        message = call.get("message")
+        return message["chat"]["id"] if message and message.get("chat") else call["from"]["id"]
+    for key in ("inline_query", "chosen_inline_result", "shipping_query", "pre_checkout_query", "poll_answer"):
+        event = data.get(key)
+        user = event and (event.get("from") or event.get("user"))
+        if user:
+            return user["id"]
+    return data.get("update_id", 0)
+
+class UpdateQueue:
+    def __init__(self, path, partitions=1):
+        self.path = path
+        self.partitions = max(1, int(partitions))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.enqueued = 0
+        self.acked = 0
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute(SCHEMA)
+            conn.execute(INDEX)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def partition_of(self, chat_id):
+        return int(chat_id) % self.partitions
+
+    def put(self, updates):
+        """Xom update'larni (dict) bitta tranzaksiyada yozadi"""
+        now = time.time()
+        rows = []
+        for data in updates:
+            chat_id = raw_chat_id(data)
+            rows.append((self.partition_of(chat_id), chat_id, json.dumps(data, ensure_ascii=False), now))
+        conn = self._conn()
+        with conn:
+            conn.executemany(INSERT, rows)
+        with self._lock:
+            self.enqueued += len(rows)
+
+    def put_update(self, data):
+        """Webhook uchun: yozildi - True (200), yozib bo'lmadi - False (503)"""
+        try:
+            self.put([data])
+            return True
+        except sqlite3.Error:
+            logger.exception("Update navbatga yozilmadi")
+            return False
+
+    def put_control(self, chat_id, op, **data):
+        """chat_id egasi bo'lgan worker'ga boshqaruv yozuvi (o'sha chat update'lari bilan tartibda)"""
+        self.put([{"_control": op, "chat_id": chat_id, **data}])
+
+    def fetch(self, partition, after_id, limit=200):
+        return self._conn().execute(FETCH, (partition, after_id, limit)).fetchall()
+
+    def ack(self, ids):
+        if not ids:
+            return
+        conn = self._conn()
+        with conn:
+            conn.executemany("DELETE FROM update_queue WHERE id = ?", [(i,) for i in ids])
+        with self._lock:
+            self.acked += len(ids)
+
+    def depths(self):
+        rows = self._conn().execute("SELECT partition, COUNT(*) FROM update_queue GROUP BY partition").fetchall()
+        return dict(rows)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "partitions": self.partitions,
+                "enqueued": self.enqueued,
+                "acked": self.acked,
+                "depth": self.depths(),
+            }
+
+def run_polling_intake(bot, queue, stop):
+    """Qabul qiluvchi: getUpdates -> navbat. Offset faqat navbatga yozilgandan keyin suriladi."""
+    offset = None
+    logger.info(f"📥 Update'lar navbatga yoziladi: {queue.path} ({queue.partitions} bo'lim)")
+    while not stop.is_set():
+        try:
+            updates = apihelper.get_updates(bot.token, offset, 100, timeout=20, long_polling_timeout=20)
+        except Exception as e:
+            logger.warning(f"getUpdates xatosi: {e}, 5 soniyadan so'ng qayta urinish...")
+            stop.wait(5)
+            continue
+        if not updates:
+            continue
+        try:
+            queue.put(updates)
+        except sqlite3.Error as e:
+            # Offset surilmaydi: Telegram shu update'larni keyingi getUpdates'da qayta beradi
+            logger.error(f"Update'lar navbatga yozilmadi: {e}, 5 soniyadan so'ng qayta urinish...")
+            stop.wait(5)
+            continue
+        offset = updates[-1]["update_id"] + 1
+
+class QueueWorker:
+    """Bitta bo'lim update'larini o'qib, jarayon ichidagi lane'larda ishlaydi"""
+
+    def __init__(self, bot, queue, partition, lanes, controls=None, poll_interval=CLUSTER_POLL_INTERVAL):
+        self.bot = bot
+        self.queue = queue
+        self.partition = partition
+        self.lanes = lanes
+        self.controls = controls or {}  # op -> fn(data)
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._done = []  # ishlangan, hali o'chirilmagan qator id'lari
+        self.processed = 0
+
+    def _finish(self, row_id):
+        with self._lock:
+            self._done.append(row_id)
+            self.processed += 1
+
+    def _process(self, row_id, update):
+        try:
+            self.bot.process_new_updates([update])
+        finally:
+            self._finish(row_id)
+
+    def _control(self, row_id, data):
+        try:
+            fn = self.controls.get(data["_control"])
+            if fn is None:
+                logger.warning(f"Noma'lum boshqaruv yozuvi: {data['_control']}")
+            else:
+                fn(data)
+        finally:
+            self._finish(row_id)
+
+    def _ack(self):
+        with self._lock:
+            done, self._done = self._done, []
+        try:
+            self.queue.ack(done)
+        except sqlite3.Error:
+            logger.exception("Ishlangan update'larni o'chirib bo'lmadi")
+            with self._lock:
+                self._done.extend(done)
+
+    def run(self):
+        """stop() gacha bo'limni o'qiydi (chaqirgan thread'da)"""
+        self.bot.threaded = False
+        self.lanes.start()
+        last_id = 0
+        logger.info(f"👷 Worker {self.partition}: {len(self.lanes.lanes)} lane")
+        while not self._stop.is_set():
+            self._ack()
+            try:
+                rows = self.queue.fetch(self.partition, last_id)
+            except sqlite3.Error:
+                logger.exception("Navbatdan o'qishda xatolik")
+                self._stop.wait(1)
+                continue
+            if not rows:
+                self._stop.wait(self.poll_interval)
+                continue
+            for row_id, payload in rows:
+                last_id = row_id
+                data = json.loads(payload)
+                if "_control" in data:
+                    self.lanes.submit(data.get("chat_id"), self._control, row_id, data)
+                    continue
+                update = types.Update.de_json(data)
+                self.lanes.submit(update_chat_id(update), self._process, row_id, update)
+
+    def stop(self):
+        """O'qishni to'xtatadi, lane'lardagilarni tugatib, ularni navbatdan o'chiradi"""
+        self._stop.set()
+        self.lanes.stop()
+        self._ack()
+
+    def stats(self):
+        with self._lock:
+            return {"partition": self.partition, "processed": self.processed, "unacked": len(self._done)}
+
+update_queue = UpdateQueue(UPDATE_QUEUE_FILE, max(1, CLUSTER_WORKERS))
@@ -1,6 +1,7 @@
 import random
 import re
 from telebot import types
+from catalog import test_catalog
 from database import query_db
 
 def generate_test_id():
@@ -40,12 +41,11 @@ def back_button():
     return m
 
 def generate_tests_menu():
-    tests = query_db("SELECT test_id, test_name FROM tests WHERE is_homework = 0 OR is_homework IS NULL ORDER BY created_at ASC", fetch=True) or []
     m = types.ReplyKeyboardMarkup(resize_keyboard=True)
     # Add 3 tests per row
     row = []
-    for test_id, test_name in tests:
-        button_text = f"{test_name} ({test_id})"
+    for test in test_catalog.list():
+        button_text = f"{test.test_name} ({test.test_id})"
         row.append(button_text)
         if len(row) == 3:
             m.row(*row)
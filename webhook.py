@@ -0,0 +1,136 @@
+"""Webhook rejimi: lokal HTTP server, update'lar chat lane'larida ishlanadi.
+
+Telegram update'ni POST qiladi, server X-Telegram-Bot-Api-Secret-Token
+sarlavhasini tekshiradi, update'ni chat lane'iga (lanes.py) qo'yadi va darhol
+200 qaytaradi. Sekin handler (PDF generatsiya va h.k.) faqat o'z lane'ini
+band qiladi - yangi update'larni qabul qilish va boshqa chatlar to'xtamaydi.
+Lane to'lsa 503 - Telegram update'ni keyinroq qayta yuboradi.
+Ko'p jarayonli rejimda (cluster.py) lane o'rniga intake - xom update
+jarayonlar orasidagi navbatga yoziladi (update_queue.py).
+
+Tarmoqsiz tekshirish: tools/check_webhook.py (soxta Bot API bilan).
+"""
+import hmac
+import json
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+from config import WEBHOOK_URL, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from lanes import update_chat_id
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+MAX_BODY = 1024 * 1024
+
+class WebhookServer:
+    def __init__(self, bot, host, port, path, secret, lanes, intake=None):
+        self.bot = bot
+        self.path = path
+        self.secret = secret
+        self.lanes = lanes
+        self.intake = intake  # intake(xom dict) -> bool; berilsa lane'lar ishlatilmaydi
+        self._lock = threading.Lock()
+        self.received = 0
+        self.rejected = 0
+        self.dropped = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def port(self):
+        return self.httpd.server_address[1]
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != server.path:
+                    return self._reply(404)
+                token = self.headers.get(SECRET_HEADER, "")
+                if not hmac.compare_digest(token.encode(), server.secret.encode()):
+                    server._count("rejected")
+                    return self._reply(403)
+                try:
+                    length = int(self.headers.get("Content-Length") or 0)
+                except ValueError:
+                    return self._reply(400)
+                if length <= 0 or length > MAX_BODY:
+                    return self._reply(413 if length else 400)
+                try:
+                    data = json.loads(self.rfile.read(length))
+                    update = None if server.intake else types.Update.de_json(data)
+                except (ValueError, KeyError, TypeError):
+                    return self._reply(400)
+                if server.intake:
+                    accepted = server.intake(data)
+                else:
+                    accepted = server.lanes.submit(update_chat_id(update), server.process, [update], block=False)
+                if not accepted:
+                    server._count("dropped")
+                    return self._reply(503)
+                server._count("received")
+                self._reply(200)
+
+            def _reply(self, code):
+                self.send_response(code)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, fmt, *args):
+                logger.debug("webhook: " + fmt, *args)
+
+        return Handler
+
+    def process(self, updates):
+        self.bot.process_new_updates(updates)
+
+    def start(self):
+        """Lane'larni ishga tushiradi (HTTP server serve_forever() da)"""
+        if self.intake:
+            logger.info(f"🌐 Webhook {self.httpd.server_address[0]}:{self.port}{self.path} (navbatga)")
+            return
+        # Handlerlar lane thread'larida bajariladi - telebot'ning ichki pool'i kerak emas
+        self.bot.threaded = False
+        self.lanes.start()
+        logger.info(f"🌐 Webhook {self.httpd.server_address[0]}:{self.port}{self.path} ({len(self.lanes.lanes)} lane)")
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self, wait=True):
+        """Yangi update'larni qabul qilishni to'xtatadi, navbatdagilarni ishlab bo'ladi"""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.lanes is not None:
+            self.lanes.stop(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "received": self.received,
+                "rejected": self.rejected,
+                "dropped": self.dropped,
+            }
+
+server = None  # ishlayotgan WebhookServer (/stats uchun)
+
+def start_webhook(bot, lanes, intake=None):
+    """config bo'yicha serverni ishga tushiradi va Telegram'da webhook'ni o'rnatadi"""
+    global server
+    if not WEBHOOK_URL:
+        raise RuntimeError("WEBHOOK_URL .env da topilmadi (BOT_POLLING=0 uchun kerak)")
+    server = WebhookServer(bot, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET, lanes, intake)
+    server.start()
+    threading.Thread(target=server.serve_forever, name="webhook-http", daemon=True).start()
+    # Server tinglay boshlagandan keyin - birinchi update'lar yo'qolmasin
+    bot.set_webhook(url=WEBHOOK_URL + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET)
+    return server